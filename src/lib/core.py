@@ -0,0 +1,398 @@
+# MODULE: ufoRig / lib / core
+# -----------------------------------------------------------
+# (C) Vassil Kateliev, 2021 		(http://www.kateliev.com)
+# ------------------------------------------------------------
+# https://github.com/kateliev
+
+__version__ = 1.7
+
+# - Dependencies --------------------------------------------
+import os
+import stat
+import json
+import pathlib
+import tempfile
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+
+from .func import xml_string
+from .objects import dictextractor, plist_converter
+from .trace import span
+from .cache import parse_cache
+from .parsers import get_backend
+
+# - Config ----------------------------
+cfg_folder_patterns = ('*.plist',)
+cfg_address_separator = '/'
+cfg_attribute_separator = '@'
+
+# - Init ------------------------------
+_parse_cache = None
+
+# - Functions -----------------------------------------------
+# NOTE: Nothing here may depend on Qt, functions are run in worker processes
+def collect_files(folder, patterns=cfg_folder_patterns):
+	'''Collect all files matching patterns below folder, sorted by path'''
+	found = set()
+
+	for pattern in patterns:
+		found.update(pathlib.Path(folder).rglob(pattern))
+
+	return sorted(found)
+
+def get_parse_cache():
+	'''Parse cache of this process, created on first use'''
+	global _parse_cache
+
+	if _parse_cache is None:
+		_parse_cache = parse_cache()
+
+	return _parse_cache
+
+# - Reading and writing goes through the parser backend, see parsers.py
+def xml_parse(raw):
+	return get_backend().xml_parse(raw)
+
+def plist_loads(raw):
+	return get_backend().plist_loads(raw)
+
+def read_bytes(file_path):
+	with open(file_path, 'rb') as raw_file:
+		return raw_file.read()
+
+def plist_load(file_path, cached=True):
+	if cached:
+		return get_parse_cache().load(file_path, 'plist', plist_loads)
+
+	return plist_loads(read_bytes(file_path))
+
+def xml_load(file_path, cached=True):
+	'''Parsed designspace or GLIF XML as an ElementTree'''
+	if cached:
+		return get_parse_cache().load(file_path, 'xml', xml_parse)
+
+	return xml_parse(read_bytes(file_path))
+
+designspace_load = xml_load
+
+def atomic_write(file_path, writer):
+	'''Write through writer(file) into a temporary file next to file_path, then rename it over the original'''
+	file_path = os.path.abspath(file_path)
+
+	with span('write', file=file_path):
+		handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(file_path), prefix='.{}.'.format(os.path.basename(file_path)), suffix='.tmp')
+
+		try:
+			with os.fdopen(handle, 'wb') as temp_file:
+				writer(temp_file)
+				temp_file.flush()
+				os.fsync(temp_file.fileno())
+
+			if os.path.exists(file_path):
+				os.chmod(temp_path, stat.S_IMODE(os.stat(file_path).st_mode))
+
+			os.replace(temp_path, file_path)
+
+		except BaseException:
+			if os.path.exists(temp_path):
+				os.remove(temp_path)
+			raise
+
+def plist_save(file_path, data):
+	atomic_write(file_path, lambda plist_file: get_backend().plist_dump(data, plist_file))
+
+def xml_save(file_path, root, wrapped=True):
+	'''Write an element (or ElementTree) as indented XML, streamed straight from the tree'''
+	if isinstance(root, ET.ElementTree):
+		root = root.getroot()
+
+	atomic_write(file_path, lambda xml_file: get_backend().xml_dump(root, xml_file, wrapped))
+
+def json_dumps(data, **kwdargs):
+	'''JSON text of plist data, bytes and dates are written in their plist text form'''
+	return json.dumps(data, default=plist_converter.format, ensure_ascii=False, **kwdargs)
+
+def collect_targets(paths):
+	'''Expand paths into documents: .ufo folders, .plist and .designspace files.
+	Any other folder is searched for UFOs and designspaces below it.
+	'''
+	targets = []
+
+	for path in map(pathlib.Path, paths):
+		if path.is_dir() and path.suffix.lower() != '.ufo':
+			found = [item for item in path.rglob('*') if (item.is_dir() and item.suffix.lower() == '.ufo') or item.suffix.lower() == '.designspace']
+			targets += sorted(str(item) for item in found if not any(parent.suffix.lower() == '.ufo' for parent in item.parents))
+		else:
+			targets.append(str(path))
+
+	return targets
+
+# - Objects -------------------------------------------------
+class document(object):
+	'''Headless document: a UFO folder (all of its plists), a single plist or a designspace.
+	
+	Values are addressed by a "/" separated path. For UFOs it starts with the
+	file path inside the UFO (fontinfo.plist/familyName). For designspaces it
+	is an ElementTree path, optionally ending in @attribute (sources/source@filename).
+	'''
+	def __init__(self, path):
+		self.path = str(path)
+		self.files = {}
+		self.dirty = set()
+
+		if os.path.isdir(self.path):
+			self.kind = 'ufo'
+			
+			for file_path in collect_files(self.path):
+				self.files[file_path.relative_to(self.path).as_posix()] = plist_load(file_path)
+
+		elif self.path.lower().endswith('.designspace'):
+			self.kind = 'designspace'
+			self.files[os.path.basename(self.path)] = designspace_load(self.path)
+
+		else:
+			self.kind = 'plist'
+			self.files[os.path.basename(self.path)] = plist_load(self.path)
+
+	def file_path(self, file_name):
+		if self.kind == 'ufo':
+			return os.path.join(self.path, *file_name.split(cfg_address_separator))
+
+		return self.path
+
+	# - Addressing ------------------------
+	def __split_address(self, address):
+		'''Split address into (file name, rest of the path)'''
+		if self.kind != 'ufo':
+			return list(self.files.keys())[0], address
+
+		for file_name in sorted(self.files.keys(), key=len, reverse=True):
+			if address == file_name or address.startswith(file_name + cfg_address_separator):
+				return file_name, address[len(file_name) + 1:]
+
+		raise KeyError('No such file: {}'.format(address))
+
+	@staticmethod
+	def __step(container, key):
+		if isinstance(container, list):
+			return int(key)
+
+		return key
+
+	def get(self, address):
+		file_name, rest = self.__split_address(address)
+		data = self.files[file_name]
+
+		if self.kind == 'designspace':
+			element, attribute = self.__element(data, rest)
+			return element.get(attribute) if attribute is not None else (element.text or '').strip()
+
+		for key in filter(len, rest.split(cfg_address_separator)):
+			data = data[self.__step(data, key)]
+
+		return data
+
+	def set(self, address, text, data_type=None):
+		'''Set the value at address from text, parsed as data_type or as the type of the current value'''
+		file_name, rest = self.__split_address(address)
+		data = self.files[file_name]
+
+		if self.kind == 'designspace':
+			element, attribute = self.__element(data, rest)
+
+			if attribute is not None:
+				element.set(attribute, text)
+			else:
+				element.text = text
+
+			self.dirty.add(file_name)
+			return text
+
+		keys = [key for key in rest.split(cfg_address_separator) if len(key)]
+
+		if not len(keys):
+			raise KeyError('Address points at a whole file: {}'.format(address))
+
+		for key in keys[:-1]:
+			data = data[self.__step(data, key)]
+
+		key = self.__step(data, keys[-1])
+
+		if data_type is None:
+			exists = key < len(data) if isinstance(data, list) else key in data
+			data_type = type(data[key]).__name__ if exists else 'str'
+
+		value = plist_converter.parse(text, data_type)
+
+		if isinstance(data, list) and key == len(data):
+			data.append(value)
+		else:
+			data[key] = value
+
+		self.dirty.add(file_name)
+		return value
+
+	@staticmethod
+	def __element(tree, rest):
+		element_path, _, attribute = rest.partition(cfg_attribute_separator)
+		element = tree.getroot() if element_path in ('', '.') else tree.getroot().find(element_path)
+
+		if element is None:
+			raise KeyError('No such element: {}'.format(element_path))
+
+		return element, attribute or None
+
+	# - Queries ---------------------------
+	def query(self, operation, search, search_key=None):
+		'''Run a dictextractor query (extract, find, where, contains) per file.
+		On designspaces xpath runs an ElementTree findall instead.
+		'''
+		results = {}
+
+		for file_name, data in self.files.items():
+			if self.kind == 'designspace':
+				if operation != 'xpath':
+					raise ValueError('Designspaces support the xpath query only')
+
+				root = data.getroot()
+				results[file_name] = [dict(tag=element.tag, text=(element.text or '').strip(), attrib=dict(element.attrib)) for element in root.iterfind(search)]
+				continue
+
+			if operation == 'contains':
+				results[file_name] = dictextractor.contains(data, search)
+
+			elif operation == 'where':
+				results[file_name] = list(dictextractor.where(data, search, search_key))
+
+			elif operation in ('extract', 'find'):
+				results[file_name] = list(getattr(dictextractor, operation)(data, search))
+
+			else:
+				raise ValueError('Unknown query: {}'.format(operation))
+
+		return results
+
+	def dump(self):
+		if self.kind == 'designspace':
+			return dict((file_name, xml_string(tree.getroot(), wrapped=False)) for file_name, tree in self.files.items())
+
+		return dict(self.files)
+
+	# - Saving ----------------------------
+	def save(self, everything=False):
+		'''Write edited files (or all of them) back atomically, returns the written paths'''
+		saved = []
+
+		for file_name in (self.files.keys() if everything else sorted(self.dirty)):
+			data, file_path = self.files[file_name], self.file_path(file_name)
+
+			if self.kind == 'designspace':
+				xml_save(file_path, data.getroot())
+			else:
+				plist_save(file_path, data)
+
+			saved.append(file_path)
+
+		self.dirty.clear()
+		return saved
+
+# - Search --------------------------------------------------
+def element_matches(root, path, pattern, columns=(0, 1), data_types=None):
+	'''Matches in an element tree as text_finder collects them from xml_node rows:
+	(row path, column, text, occurrences). Attributes are the first child rows of an element.
+	'''
+	matches = []
+	stack = [(root, path)]
+
+	while len(stack):
+		element, path = stack.pop()
+		rows = [(path, (element.tag, element.text.strip() if element.text is not None else ''), 'tag')]
+		rows += [(path + (row,), item, 'attribute') for row, item in enumerate(element.attrib.items())]
+
+		for row_path, cells, data_type in rows:
+			if data_types is not None and data_type not in data_types:
+				continue
+
+			for col in columns:
+				count = sum(1 for match in pattern.finditer(cells[col]))
+
+				if count:
+					matches.append((row_path, col, cells[col], count))
+
+		offset = len(element.attrib)
+		stack.extend((child, path + (offset + row,)) for row, child in reversed(list(enumerate(element))))
+
+	return matches
+
+def glif_matches(task):
+	'''Matches in GLIF files that are not parsed in the tree, in a worker process.
+	task = (pattern, columns, data types, [(glyph row path, file path)]), unreadable files match nothing.
+	'''
+	pattern, columns, data_types, entries = task
+	matches = []
+
+	for path, file_path in entries:
+		try:
+			root = xml_load(file_path).getroot()
+		except Exception:
+			continue
+
+		matches += element_matches(root, path + (0,), pattern, columns, data_types)
+
+	return matches
+
+# - Batch ---------------------------------------------------
+def batch_job(job):
+	'''Run one batch job on one document, in a worker process.
+	job = (path, operation, options), returns a result dict, never raises.
+	'''
+	path, operation, options = job
+
+	try:
+		doc = document(path)
+
+		if operation == 'dump':
+			result = doc.dump()
+
+		elif operation == 'query':
+			search = options['search']
+
+			if options.get('type') is not None:
+				search = plist_converter.parse(search, options['type'])
+
+			result = doc.query(options['query'], search, options.get('key'))
+
+		elif operation == 'set':
+			result = dict((address, doc.set(address, text, options.get('type'))) for address, text in options['values'])
+
+			if not options.get('dry_run'):
+				doc.save()
+
+		elif operation == 'save':
+			result = doc.save(everything=True)
+
+		else:
+			raise ValueError('Unknown operation: {}'.format(operation))
+
+		return {'target':path, 'ok':True, 'result':result}
+
+	except Exception as error:
+		return {'target':path, 'ok':False, 'error':'{}: {}'.format(type(error).__name__, error)}
+
+def batch_run(paths, operation, options=None, workers=None):
+	'''Run operation over many documents on a process pool, one worker per document.
+	Yields result dicts in the order of paths.
+	'''
+	jobs = [(path, operation, options or {}) for path in paths]
+
+	if not len(jobs):
+		return
+
+	if len(jobs) == 1 or workers == 1:
+		for job in jobs:
+			yield batch_job(job)
+		return
+
+	with ProcessPoolExecutor(max_workers=min(workers or os.cpu_count(), len(jobs))) as executor:
+		for result in executor.map(batch_job, jobs):
+			yield result
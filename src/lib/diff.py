@@ -0,0 +1,299 @@
+# MODULE: ufoRig / lib / diff
+# -----------------------------------------------------------
+# (C) Vassil Kateliev, 2021 		(http://www.kateliev.com)
+# ------------------------------------------------------------
+# https://github.com/kateliev
+
+__version__ = 1.0
+
+# - Dependencies --------------------------------------------
+import os
+import difflib
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+
+from . import core
+from .objects import plist_converter
+
+# - Config ----------------------------
+cfg_list_item = 'List Item'			# Row key of list items, as the models build them
+cfg_glif_index = 'contents.plist'	# Glyph layer file, its glyphs are compared file by file
+
+# - Init ------------------------------
+# NOTE: Paths are tuples of (key, n-th sibling with that key) pairs, as trw_tree_explorer.key_path() makes them.
+# NOTE: Removed entries only have a left path, added ones only a right path.
+diff_entry = namedtuple('diff_entry', 'kind left_path right_path left right')
+
+# - Functions -----------------------------------------------
+# NOTE: Nothing here may depend on Qt
+def is_branch(value):
+	return isinstance(value, (dict, list, ET.Element))
+
+def value_text(value):
+	'''Short text of a compared value'''
+	if value is None:
+		return ''
+
+	if isinstance(value, dict):
+		return '{} keys'.format(len(value))
+
+	if isinstance(value, list):
+		return '{} items'.format(len(value))
+
+	if isinstance(value, ET.Element):
+		return '<{}>'.format(value.tag)
+
+	return plist_converter.format(value)
+
+def leaf_digest(value):
+	try:
+		return hash((type(value).__name__, value))
+	except TypeError:
+		return hash((type(value).__name__, repr(value)))
+
+def element_steps(element):
+	'''Path steps of the child elements, attribute rows come first and share the count'''
+	seen, steps = {}, []
+
+	for child in element:
+		nth = seen.get(child.tag, int(child.tag in element.attrib))
+		seen[child.tag] = nth + 1
+		steps.append((child.tag, nth))
+
+	return steps
+
+def element_text(element):
+	return element.text.strip() if element.text is not None else ''
+
+# - Objects -------------------------------------------------
+class subtree_hasher(object):
+	'''Digests of plist data and XML elements. Dict keys and attributes are
+	compared regardless of order, list items and child elements in order.
+	Digests of containers are kept for the life of the hasher, so every
+	subtree is hashed once however often it is compared.
+	'''
+	def __init__(self):
+		self.memo = {}
+
+	def __call__(self, value):
+		if not is_branch(value):
+			return leaf_digest(value)
+
+		memo = self.memo
+		stack = [(value, False)]
+
+		# - Post order without recursion, documents may nest deep
+		while len(stack):
+			item, ready = stack.pop()
+
+			if id(item) in memo:
+				continue
+
+			if ready:
+				memo[id(item)] = self.__combine(item)
+				continue
+
+			stack.append((item, True))
+			children = item.values() if isinstance(item, dict) else item
+			stack.extend((child, False) for child in children if is_branch(child) and id(child) not in memo)
+
+		return memo[id(value)]
+
+	def __get(self, value):
+		return self.memo[id(value)] if is_branch(value) else leaf_digest(value)
+
+	def __combine(self, item):
+		if isinstance(item, dict):
+			return hash(('dict', frozenset((key, self.__get(value)) for key, value in item.items())))
+
+		if isinstance(item, list):
+			return hash(('list', tuple(map(self.__get, item))))
+
+		return hash((item.tag, element_text(item), frozenset(item.attrib.items()), tuple(map(self.__get, item))))
+
+class structure_diff(object):
+	'''Added, removed and changed keys, list items, elements and attributes
+	between two documents. Branches with equal digests are skipped whole.
+	'''
+	def __init__(self):
+		self.digest = subtree_hasher()
+		self.entries = []
+
+	def __len__(self):
+		return len(self.entries)
+
+	def compare(self, left, right, left_path=(), right_path=()):
+		'''Add the differences of two values, plist data or XML elements'''
+		stack = [('compare', left, right, left_path, right_path)]
+
+		# - Tasks are pushed in reverse, so entries come in document order
+		while len(stack):
+			task, left, right, left_path, right_path = stack.pop()
+
+			if task != 'compare':
+				self.entries.append(diff_entry(task, left_path, right_path, left, right))
+				continue
+
+			if self.digest(left) == self.digest(right):
+				continue
+
+			if isinstance(left, dict) and isinstance(right, dict):
+				tasks = self.__mapping(left, right, left_path, right_path)
+
+			elif isinstance(left, list) and isinstance(right, list):
+				step = lambda index: (cfg_list_item, index)
+				tasks = self.__sequence(left, right, step, step, left_path, right_path, lambda a, b: True)
+
+			elif isinstance(left, ET.Element) and isinstance(right, ET.Element) and left.tag == right.tag:
+				tasks = self.__element(left, right, left_path, right_path)
+
+			else:
+				tasks = [('changed', left, right, left_path, right_path)]
+
+			stack.extend(reversed(tasks))
+
+	def __mapping(self, left, right, left_path, right_path):
+		tasks = []
+
+		for key, value in left.items():
+			if key in right:
+				tasks.append(('compare', value, right[key], left_path + ((key, 0),), right_path + ((key, 0),)))
+			else:
+				tasks.append(('removed', value, None, left_path + ((key, 0),), None))
+
+		tasks += [('added', None, value, None, right_path + ((key, 0),)) for key, value in right.items() if key not in left]
+		return tasks
+
+	def __sequence(self, left, right, left_step, right_step, left_path, right_path, pairable):
+		'''Items matched by digest: the unmatched runs are removed and added, a replaced run is compared item by item'''
+		left_digests, right_digests = list(map(self.digest, left)), list(map(self.digest, right))
+		start, end = 0, 0
+		shortest = min(len(left), len(right))
+
+		# - Common ends first, the matcher only gets what is left between them
+		while start < shortest and left_digests[start] == right_digests[start]:
+			start += 1
+
+		while end < shortest - start and left_digests[-end - 1] == right_digests[-end - 1]:
+			end += 1
+
+		matcher = difflib.SequenceMatcher(None, left_digests[start:len(left) - end], right_digests[start:len(right) - end], autojunk=False)
+		tasks = []
+
+		for opcode, i1, i2, j1, j2 in matcher.get_opcodes():
+			if opcode == 'equal':
+				continue
+
+			i1, i2, j1, j2 = i1 + start, i2 + start, j1 + start, j2 + start
+			paired = 0
+
+			if opcode == 'replace':
+				while paired < min(i2 - i1, j2 - j1) and pairable(left[i1 + paired], right[j1 + paired]):
+					i, j = i1 + paired, j1 + paired
+					tasks.append(('compare', left[i], right[j], left_path + (left_step(i),), right_path + (right_step(j),)))
+					paired += 1
+
+			tasks += [('removed', left[i], None, left_path + (left_step(i),), None) for i in range(i1 + paired, i2)]
+			tasks += [('added', None, right[j], None, right_path + (right_step(j),)) for j in range(j1 + paired, j2)]
+
+		return tasks
+
+	def __element(self, left, right, left_path, right_path):
+		tasks = []
+
+		if element_text(left) != element_text(right):
+			tasks.append(('changed', element_text(left), element_text(right), left_path, right_path))
+
+		for name, value in left.attrib.items():
+			if name not in right.attrib:
+				tasks.append(('removed', value, None, left_path + ((name, 0),), None))
+
+			elif right.attrib[name] != value:
+				tasks.append(('changed', value, right.attrib[name], left_path + ((name, 0),), right_path + ((name, 0),)))
+
+		tasks += [('added', None, value, None, right_path + ((name, 0),)) for name, value in right.attrib.items() if name not in left.attrib]
+
+		left_steps, right_steps = element_steps(left), element_steps(right)
+		tasks += self.__sequence(list(left), list(right), left_steps.__getitem__, right_steps.__getitem__, left_path, right_path, lambda a, b: a.tag == b.tag)
+		return tasks
+
+	def compare_layers(self, left_contents, right_contents, left_folder, right_folder, left_path, right_path):
+		'''Glyph layers: the glyph lists by name, then the GLIF files. Files
+		with the same bytes are not parsed, the others are compared as XML.
+		'''
+		for name, left_file in left_contents.items():
+			right_file = right_contents.get(name)
+
+			if right_file is None:
+				self.entries.append(diff_entry('removed', left_path + ((name, 0),), None, left_file, None))
+				continue
+
+			glyph_left, glyph_right = left_path + ((name, 0),), right_path + ((name, 0),)
+
+			if left_file != right_file:
+				self.entries.append(diff_entry('changed', glyph_left, glyph_right, left_file, right_file))
+
+			if left_folder is None or right_folder is None:
+				continue
+
+			raw = []
+
+			for folder, file_name in ((left_folder, left_file), (right_folder, right_file)):
+				try:
+					with open(os.path.join(folder, file_name), 'rb') as glif_file:
+						raw.append(glif_file.read())
+				except OSError:
+					raw.append(None)
+
+			if raw[0] == raw[1]:
+				continue
+
+			if None in raw:
+				self.entries.append(diff_entry('changed', glyph_left, glyph_right, left_file if raw[0] is not None else 'Missing file', right_file if raw[1] is not None else 'Missing file'))
+				continue
+
+			try:
+				left_root, right_root = core.xml_parse(raw[0]).getroot(), core.xml_parse(raw[1]).getroot()
+			except ET.ParseError as error:
+				self.entries.append(diff_entry('changed', glyph_left, glyph_right, left_file, 'Not readable: {}'.format(error)))
+				continue
+
+			self.compare(left_root, right_root, glyph_left + ((left_root.tag, 0),), glyph_right + ((right_root.tag, 0),))
+
+		for name, value in right_contents.items():
+			if name not in left_contents:
+				self.entries.append(diff_entry('added', None, right_path + ((name, 0),), None, value))
+
+def diff_documents(left, right):
+	'''Differences between two documents given as (key, data, path) file
+	entries, plist data or the root element of an XML file. Files are
+	matched by key, two single file documents with each other.
+	'''
+	differ = structure_diff()
+	single = len(left) == 1 and len(right) == 1
+	right_files = dict((key, (data, path)) for key, data, path in right)
+	is_layer = lambda data, path: isinstance(data, dict) and path is not None and os.path.basename(path) == cfg_glif_index
+
+	for left_key, left_data, left_path in left:
+		if single:
+			right_key, right_data, right_path = right[0]
+
+		elif left_key in right_files:
+			right_key, (right_data, right_path) = left_key, right_files[left_key]
+
+		else:
+			differ.entries.append(diff_entry('removed', ((left_key, 0),), None, left_data, None))
+			continue
+
+		left_step, right_step = ((left_key, 0),), ((right_key, 0),)
+
+		if is_layer(left_data, left_path) and is_layer(right_data, right_path):
+			differ.compare_layers(left_data, right_data, os.path.dirname(left_path), os.path.dirname(right_path), left_step, right_step)
+		else:
+			differ.compare(left_data, right_data, left_step, right_step)
+
+	if not single:
+		left_keys = set(key for key, data, path in left)
+		differ.entries += [diff_entry('added', None, ((key, 0),), None, data) for key, data, path in right if key not in left_keys]
+
+	return differ.entries
@@ -4,18 +4,167 @@
 # ------------------------------------------------------------
 # https://github.com/kateliev
 
-__version__ = 1.0
+__version__ = 1.3
+
+# - Dependencies --------------------------------------------
+import io
+import copy
+import xml.etree.ElementTree as ET
+
+from .trace import span
+
+# - Config ----------------------------
+cfg_xml_indent = '  '
+cfg_xml_declaration = "<?xml version='1.0' encoding='utf-8'?>\n"	# As ElementTree.write(encoding='utf-8', xml_declaration=True)
+cfg_xml_chunk = 1024 		# Pieces joined per write
 
 # - Functions -----------------------------------------------
-def xml_pretty_print(current, parent=None, index=-1, depth=0, indent='  '):
-	''' Adapted from: https://stackoverflow.com/questions/28813876/how-do-i-get-pythons-elementtree-to-pretty-print-to-an-xml-file'''
-	for i, node in enumerate(current):
-		xml_pretty_print(node, current, i, depth + 1)
-	
-	if parent is not None:
-		if index == 0:
-			parent.text = '\n' + (indent * depth)
+def xml_pretty_print(root, depth=0, indent=cfg_xml_indent):
+	''' Indent the tree in place: every element with children gets its text, and its children their tails, set
+	to a new line and the indent of the next row. Walks the tree with a stack, deep documents do not recurse.
+	'''
+	stack = [(root, depth)]
+
+	while len(stack):
+		element, depth = stack.pop()
+
+		if len(element):
+			element.text = '\n' + indent * (depth + 1)
+
+			for child in element:
+				child.tail = element.text
+				stack.append((child, depth + 1))
+
+			element[-1].tail = '\n' + indent * depth
+
+def xml_serialize(root, write, wrapped=True, indent=cfg_xml_indent):
+	''' Write root through write(text) formatted as xml_prepare and ElementTree.write would, without
+	touching or copying the tree. Only the open ancestors of the current element are kept on a stack.
+	'''
+	# - ElementTree's own escaping, so text and attributes come out exactly as tree.write gives them
+	escape_text, escape_attrib = ET._escape_cdata, ET._escape_attrib
+	depth = 1 if wrapped else 0
+	stack = []
+	pieces = []
+	element, tail = root, '\n' if wrapped else root.tail
+
+	if wrapped:
+		pieces.append('\n' + indent)
+
+	while True:
+		if element is not None:
+			tag = element.tag
+			text = (element.text or '').strip() or None
+
+			if tag is ET.Comment:
+				pieces.append('<!--%s-->' % text)
+
+			elif tag is ET.ProcessingInstruction:
+				pieces.append('<?%s?>' % text)
+
+			else:
+				pieces.append('<' + tag)
+
+				for key, value in element.items():
+					pieces.append(' %s="%s"' % (key, escape_attrib(value)))
+
+				if len(element):
+					# - Open: children follow, the closing tag is written once they are done
+					pieces.append('>\n' + indent * (depth + 1))
+					stack.append((tag, tail, depth, iter(element), len(element)))
+					depth += 1
+					element = None
+					continue
+
+				elif text:
+					pieces.append('>%s</%s>' % (escape_text(text), tag))
+
+				else:
+					pieces.append(' />')
+
+			if tail:
+				pieces.append(escape_text(tail))
+
+		if len(pieces) >= cfg_xml_chunk:
+			write(''.join(pieces))
+			del pieces[:]
+
+		# - Next sibling, or close parents that are done
+		while len(stack):
+			tag, parent_tail, parent_depth, children, count = stack[-1]
+			element = next(children, None)
+
+			if element is not None:
+				count -= 1
+				stack[-1] = (tag, parent_tail, parent_depth, children, count)
+				tail = '\n' + indent * (parent_depth + (1 if count else 0))
+				depth = parent_depth + 1
+				break
+
+			stack.pop()
+			pieces.append('</%s>' % tag)
+
+			if parent_tail:
+				pieces.append(escape_text(parent_tail))
+
 		else:
-			parent[index - 1].tail = '\n' + (indent * depth)
-		if index == len(parent) - 1:
-			current.tail = '\n' + (indent * (depth - 1))
\ No newline at end of file
+			break
+
+	write(''.join(pieces))
+
+def xml_write(xml_file, root, wrapped=True, indent=cfg_xml_indent):
+	''' Stream root into a binary file as UTF-8 XML with declaration, byte for byte what
+	xml_prepare(root, wrapped).write(xml_file, encoding='utf-8', xml_declaration=True) writes.
+	'''
+	if xml_qualified(root):
+		xml_prepare(copy.deepcopy(root), wrapped).write(xml_file, encoding='utf-8', xml_declaration=True)
+		return
+
+	text_file = io.TextIOWrapper(xml_file, encoding='utf-8', errors='xmlcharrefreplace', newline='\n')
+
+	try:
+		text_file.write(cfg_xml_declaration)
+		xml_serialize(root, text_file.write, wrapped, indent)
+		text_file.flush()
+
+	finally:
+		text_file.detach()
+
+def xml_string(root, wrapped=True, indent=cfg_xml_indent):
+	''' Indented XML text of root without declaration, as ET.tostring(encoding='unicode') of a prepared tree'''
+	if xml_qualified(root):
+		return ET.tostring(xml_prepare(copy.deepcopy(root), wrapped).getroot(), encoding='unicode')
+
+	pieces = []
+	xml_serialize(root, pieces.append, wrapped, indent)
+	return ''.join(pieces)
+
+def xml_qualified(root):
+	''' Does the tree use {namespace} names. Those need prefixes made up by ElementTree, it writes them'''
+	for element in root.iter():
+		if isinstance(element.tag, str) and element.tag[:1] == '{' or any(key[:1] == '{' for key in element.attrib):
+			return True
+
+	return False
+
+def xml_prepare(root, wrapped=True):
+	''' Normalize element texts the way cells show them and indent the tree in place, ready to write.
+	Wrapped trees are indented under a nameless element, the way ufoRig always wrote designspaces.
+	'''
+	with span('pretty_print') as record:
+		record['items'] = 0
+
+		for element in root.iter():
+			record['items'] += 1
+
+			if element.text is not None:
+				element.text = element.text.strip() or None
+
+		if not wrapped:
+			xml_pretty_print(root)
+			return ET.ElementTree(root)
+
+		wrapper = ET.Element(None)
+		wrapper.append(root)
+		xml_pretty_print(wrapper)
+		return ET.ElementTree(wrapper)
@@ -0,0 +1,130 @@
+# MODULE: ufoRig / lib / history
+# -----------------------------------------------------------
+# (C) Vassil Kateliev, 2021 		(http://www.kateliev.com)
+# ------------------------------------------------------------
+# https://github.com/kateliev
+
+__version__ = 1.0
+
+# - Dependencies --------------------------------------------
+from collections import deque
+
+# - Config ----------------------------
+cfg_history_memory_cap = 64 * 1024 ** 2	# Bytes, approximate
+cfg_history_node_size = 400				# Bytes per retained node, approximate
+cfg_history_record_size = 100			# Bytes per record, approximate
+
+# - Functions -----------------------------------------------
+def retained_size(nodes):
+	'''Approximate memory held by given subtrees. Unbuilt branches are
+	counted by their item count, their raw data is all that is kept.
+	'''
+	count, stack = 0, list(nodes)
+
+	while len(stack):
+		node = stack.pop()
+		count += 1
+
+		if node.fetched:
+			stack.extend(node.children)
+		else:
+			count += node.child_count()
+
+	return count * cfg_history_node_size
+
+# - Objects -------------------------------------------------
+class history_step(object):
+	'''One undoable user action: a list of records applied in order'''
+	def __init__(self, label):
+		self.label = label
+		self.records = []
+		self.size = 0
+
+	def __len__(self):
+		return len(self.records)
+
+class undo_history(object):
+	'''Undo/redo stacks of history steps.
+
+	Records are opaque to the history, they hold references to the nodes
+	they touch. Nothing is copied: a removed subtree lives on in its record
+	and everything unchanged is shared with the live document. The oldest
+	steps are dropped once the retained size goes over memory_cap.
+	'''
+	def __init__(self, memory_cap=cfg_history_memory_cap):
+		self.memory_cap = memory_cap
+		self.undo_stack = deque()
+		self.redo_stack = []
+		self.size = 0
+		self.__group = None
+		self.__depth = 0
+
+	# - Recording -------------------------
+	def begin_group(self, label):
+		'''Collect all records until the matching end_group into one step'''
+		if not self.__depth:
+			self.__group = history_step(label)
+
+		self.__depth += 1
+
+	def end_group(self):
+		self.__depth -= 1
+
+		if not self.__depth:
+			step, self.__group = self.__group, None
+
+			if len(step):
+				self.__push(step)
+
+	def record(self, label, record, size=cfg_history_record_size):
+		step = self.__group if self.__group is not None else history_step(label)
+		step.records.append(record)
+		step.size += size
+
+		if step is not self.__group:
+			self.__push(step)
+
+	def __push(self, step):
+		self.undo_stack.append(step)
+		self.size += step.size - sum(redo.size for redo in self.redo_stack)
+		self.redo_stack = []
+		self.trim()
+
+	def trim(self):
+		while self.size > self.memory_cap and len(self.undo_stack) > 1:
+			self.size -= self.undo_stack.popleft().size
+
+	def clear(self):
+		self.undo_stack.clear()
+		self.redo_stack = []
+		self.size = 0
+
+	# - Stepping --------------------------
+	def can_undo(self):
+		return bool(len(self.undo_stack))
+
+	def can_redo(self):
+		return bool(len(self.redo_stack))
+
+	def undo_label(self):
+		return self.undo_stack[-1].label if self.can_undo() else ''
+
+	def redo_label(self):
+		return self.redo_stack[-1].label if self.can_redo() else ''
+
+	def take_undo(self):
+		'''Step to undo, it moves over to the redo stack'''
+		if not self.can_undo():
+			return None
+
+		step = self.undo_stack.pop()
+		self.redo_stack.append(step)
+		return step
+
+	def take_redo(self):
+		if not self.can_redo():
+			return None
+
+		step = self.redo_stack.pop()
+		self.undo_stack.append(step)
+		return step
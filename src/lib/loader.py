@@ -0,0 +1,224 @@
+# MODULE: ufoRig / lib / loader
+# -----------------------------------------------------------
+# (C) Vassil Kateliev, 2021 		(http://www.kateliev.com)
+# ------------------------------------------------------------
+# https://github.com/kateliev
+
+__version__ = 1.3
+
+# - Dependencies --------------------------------------------
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from PyQt5 import QtCore
+from . import core
+from .trace import tracer, timed_call
+
+# - Config ----------------------------
+cfg_preload_workers = 2 		# Processes parsing referenced UFOs ahead of time
+cfg_preload_capacity = 4 		# Parsed UFOs kept ready, the oldest are dropped
+cfg_preload_nice = 10 			# Priority decrease of preload workers, where the OS has nice
+
+# - Functions -----------------------------------------------
+def lower_priority():
+	'''Worker initializer: background work should not slow the GUI or a load the user asked for'''
+	if hasattr(os, 'nice'):
+		try:
+			os.nice(cfg_preload_nice)
+		except OSError:
+			pass
+
+# - Objects -------------------------------------------------
+class file_loader(QtCore.QObject):
+	'''Parses a list of files on a process pool and reports every
+	result back on the GUI thread as soon as it is ready.
+	'''
+	file_loaded = QtCore.pyqtSignal(int, object)
+	file_failed = QtCore.pyqtSignal(int, str)
+	progress = QtCore.pyqtSignal(int, int)
+	finished = QtCore.pyqtSignal()
+
+	# - Crosses from the executor thread to the GUI thread
+	__future_done = QtCore.pyqtSignal(int, object)
+
+	def __init__(self, file_list, load_func=core.plist_load, workers=None, low_priority=False, span_names=('load', 'parse')):
+		super(file_loader, self).__init__()
+
+		# - Init
+		# -- Anything picklable can be loaded by a custom load_func, only paths are turned to str
+		self.file_list = [str(file_path) if isinstance(file_path, os.PathLike) else file_path for file_path in file_list]
+		self.load_func = load_func
+		self.span_names = span_names
+		self.workers = workers or os.cpu_count()
+		self.low_priority = low_priority
+		self.executor = None
+		self.futures = []
+		self.done = 0
+		self.cancelled = False
+		self.span = None
+
+		self.__future_done.connect(self.__on_done)
+		self.finished.connect(self.__on_finished)
+
+	def start(self):
+		self.span = tracer.begin(self.span_names[0], files=len(self.file_list))
+		self.executor = ProcessPoolExecutor(max_workers=min(self.workers, max(len(self.file_list), 1)), initializer=lower_priority if self.low_priority else None)
+
+		for index, file_path in enumerate(self.file_list):
+			future = self.executor.submit(timed_call, self.span_names[1], self.load_func, file_path)
+			future.add_done_callback(partial(self.__emit_done, index))
+			self.futures.append(future)
+
+		# - Let pending work run out, do not block
+		self.executor.shutdown(wait=False)
+
+		if not len(self.file_list):
+			self.finished.emit()
+
+	def cancel(self):
+		if self.cancelled or self.done == len(self.file_list):
+			return
+
+		self.cancelled = True
+
+		for future in self.futures:
+			future.cancel()
+
+		if self.executor is not None:
+			self.executor.shutdown(wait=False, cancel_futures=True)
+
+		self.finished.emit()
+
+	def __emit_done(self, index, future):
+		if not future.cancelled():
+			self.__future_done.emit(index, future)
+
+	@QtCore.pyqtSlot(int, object)
+	def __on_done(self, index, future):
+		if self.cancelled:
+			return
+
+		try:
+			file_data, record = future.result()
+			tracer.add(record)
+			self.file_loaded.emit(index, file_data)
+		except Exception as error:
+			self.file_failed.emit(index, str(error))
+
+		self.done += 1
+		self.progress.emit(self.done, len(self.file_list))
+
+		if self.done == len(self.file_list):
+			self.finished.emit()
+
+	def __on_finished(self):
+		if self.span is not None:
+			tracer.end(self.span, self.done)
+			self.span = None
+
+class ufo_preloader(QtCore.QObject):
+	'''Parses UFOs that may be opened soon, like the masters of a designspace,
+	one after the other on a small low priority pool. Parsed UFOs are kept
+	ready as file entries for a tab until taken.
+	'''
+	ufo_ready = QtCore.pyqtSignal(str)
+
+	def __init__(self, workers=cfg_preload_workers, capacity=cfg_preload_capacity):
+		super(ufo_preloader, self).__init__()
+
+		# - Init
+		self.workers = workers
+		self.capacity = capacity
+		self.queue = []
+		self.ready = OrderedDict()
+		self.loader = None
+		self.loading = None
+		self.__entries = []
+		self.__stats = {}
+
+	def request(self, ufo_paths):
+		'''Queue UFO folders for preloading, ones that are loading or ready already are skipped'''
+		for ufo_path in map(os.path.abspath, ufo_paths):
+			if os.path.isdir(ufo_path) and ufo_path not in self.queue and ufo_path not in self.ready and ufo_path != self.loading:
+				self.queue.append(ufo_path)
+
+		self.__next()
+
+	def is_ready(self, ufo_path):
+		return os.path.abspath(ufo_path) in self.ready
+
+	def take(self, ufo_path):
+		'''Hand over the parsed (file name, data, path) entries of a UFO, None if it is not ready
+		or its files changed since. The data goes to one tab only, a second open parses again.
+		'''
+		ufo_path = os.path.abspath(ufo_path)
+
+		if ufo_path in self.queue:
+			self.queue.remove(ufo_path)
+
+		# - It is opened the usual way now, no need to parse it twice at once
+		if ufo_path == self.loading:
+			self.loader.cancel()
+
+		entries, stats = self.ready.pop(ufo_path, (None, None))
+
+		if entries is None or stats != self.__stat_files(map(str, core.collect_files(ufo_path))):
+			return None
+
+		return entries
+
+	@staticmethod
+	def __stat_files(file_paths):
+		stats = {}
+
+		for file_path in file_paths:
+			try:
+				file_stat = os.stat(file_path)
+			except OSError:
+				continue
+
+			stats[file_path] = (file_stat.st_mtime_ns, file_stat.st_size)
+
+		return stats
+
+	def cancel(self):
+		self.queue = []
+
+		if self.loader is not None:
+			self.loader.cancel()
+
+	def __next(self):
+		if self.loader is not None or not len(self.queue):
+			return
+
+		self.loading = self.queue.pop(0)
+		file_list = core.collect_files(self.loading)
+		self.__entries = [None] * len(file_list)
+		self.__stats = self.__stat_files(map(str, file_list))	# Taken before parsing, a later change shows as a mismatch
+
+		self.loader = file_loader(file_list, workers=self.workers, low_priority=True)
+		self.loader.file_loaded.connect(lambda index, file_data, file_list=file_list, folder=self.loading: self.__on_loaded(index, file_data, file_list, folder))
+		self.loader.file_failed.connect(lambda index, error: self.__entries.__setitem__(index, False))
+		self.loader.finished.connect(self.__on_finished)
+		self.loader.start()
+
+	def __on_loaded(self, index, file_data, file_list, folder):
+		file_path = file_list[index]
+		self.__entries[index] = (file_path.relative_to(folder).as_posix(), file_data, str(file_path))
+
+	def __on_finished(self):
+		loader, ufo_path, self.loader, self.loading = self.loader, self.loading, None, None
+
+		# - A UFO with files that failed is not kept, opening it the usual way reports them
+		if not loader.cancelled and all(self.__entries):
+			self.ready[ufo_path] = (self.__entries, self.__stats)
+
+			while len(self.ready) > self.capacity:
+				self.ready.popitem(last=False)
+
+			self.ufo_ready.emit(ufo_path)
+
+		self.__entries, self.__stats = [], {}
+		self.__next()
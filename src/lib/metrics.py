@@ -0,0 +1,256 @@
+# MODULE: ufoRig / lib / metrics
+# -----------------------------------------------------------
+# (C) Vassil Kateliev, 2021 		(http://www.kateliev.com)
+# ------------------------------------------------------------
+# https://github.com/kateliev
+
+__version__ = 1.01
+
+# - Dependencies --------------------------------------------
+import math
+
+from . import core
+
+try:
+	import numpy as np
+
+except ImportError:
+	# - Without NumPy the columns are plain lists: same results, slower on big fonts
+	np = None
+
+# - Config ----------------------------
+cfg_metric_columns = ('name', 'unicode', 'advance', 'contours', 'points', 'anchors')
+cfg_outlier_range = 1.5		# Advances further than this many interquartile ranges out of the middle half are outliers
+cfg_unicode_prefix = 'U+'
+
+# - Functions -----------------------------------------------
+# NOTE: Nothing here may depend on Qt, glyph_metrics runs in worker processes
+def glif_metrics(root):
+	'''(unicode, advance, contours, points, anchor names) of a GLIF root element.
+	No code point is -1, an advance that is not a number NaN.
+	'''
+	unicode_value, advance = -1, 0.
+	contours, points, anchors = 0, 0, []
+
+	for element in root:
+		if element.tag == 'unicode' and unicode_value < 0:
+			try:
+				unicode_value = int(element.get('hex', ''), 16)
+			except ValueError:
+				pass
+
+		elif element.tag == 'advance':
+			try:
+				advance = float(element.get('width', 0))
+			except ValueError:
+				advance = math.nan
+
+		elif element.tag == 'outline':
+			for contour in element.iterfind('contour'):
+				contours += 1
+				points += len(contour.findall('point'))
+
+		elif element.tag == 'anchor':
+			anchors.append(element.get('name', ''))
+
+	return unicode_value, advance, contours, points, tuple(anchors)
+
+def glyph_metrics(task):
+	'''Metrics of a chunk of glyphs given as (name, file path) pairs. Unreadable glyphs get None'''
+	rows = []
+
+	for name, file_path in task:
+		try:
+			rows.append(glif_metrics(core.xml_load(file_path).getroot()))
+		except Exception:
+			rows.append(None)
+
+	return rows
+
+def unicode_text(value):
+	return '{}{:04X}'.format(cfg_unicode_prefix, value) if value >= 0 else ''
+
+def percentile(values, q):
+	'''Linear interpolated percentile, as numpy.percentile computes it by default'''
+	ordered = sorted(values)
+	position = (len(ordered) - 1) * q / 100.
+	lower = int(math.floor(position))
+	upper = min(lower + 1, len(ordered) - 1)
+	return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+# - Objects -------------------------------------------------
+class metrics_table(object):
+	'''Glyph metrics kept by column, as NumPy arrays when NumPy is installed.
+	Rows come in any order as glyphs are parsed, rows not filled yet sort
+	last and are left out of the statistics.
+	'''
+	def __init__(self, names):
+		count = len(names)
+		self.names = list(names)
+		self.anchors = [()] * count
+
+		if np is not None:
+			self.name_keys = np.array([name.lower() for name in self.names], dtype=str)
+			self.columns = {	'unicode':np.full(count, -1, dtype=np.int64),
+								'advance':np.full(count, np.nan),
+								'contours':np.zeros(count, dtype=np.int32),
+								'points':np.zeros(count, dtype=np.int32),
+								'anchors':np.zeros(count, dtype=np.int32) }
+			self.filled = np.zeros(count, dtype=bool)
+		else:
+			self.name_keys = [name.lower() for name in self.names]
+			self.columns = {	'unicode':[-1] * count,
+								'advance':[math.nan] * count,
+								'contours':[0] * count,
+								'points':[0] * count,
+								'anchors':[0] * count }
+			self.filled = [False] * count
+
+	def __len__(self):
+		return len(self.names)
+
+	def set_row(self, index, metrics):
+		'''Set the metrics of a row from glif_metrics(), None for an unreadable glyph'''
+		unicode_value, advance, contours, points, anchors = metrics if metrics is not None else (-1, math.nan, 0, 0, ())
+
+		for column, value in (('unicode', unicode_value), ('advance', advance), ('contours', contours), ('points', points), ('anchors', len(anchors))):
+			self.columns[column][index] = value
+
+		self.anchors[index] = anchors
+		self.filled[index] = True
+
+	def fill(self, start, rows):
+		for index, metrics in enumerate(rows, start):
+			self.set_row(index, metrics)
+
+	def filled_count(self):
+		return int(np.count_nonzero(self.filled)) if np is not None else sum(self.filled)
+
+	def cell(self, index, column):
+		'''Value of a cell, None if the row is not filled yet'''
+		if column == 'name':
+			return self.names[index]
+
+		if not self.filled[index]:
+			return None
+
+		if column == 'anchors':
+			return self.anchors[index]
+
+		return self.columns[column][index].item() if np is not None else self.columns[column][index]
+
+	# - Views -----------------------------
+	def select(self, text='', outliers=False):
+		'''Rows whose name contains text (or with the code point U+XXXX), outliers only if set'''
+		text = text.strip().lower()
+		code_point = None
+
+		if text.startswith(cfg_unicode_prefix.lower()):
+			try:
+				code_point = int(text[len(cfg_unicode_prefix):], 16)
+			except ValueError:
+				pass
+
+		if np is not None:
+			mask = np.ones(len(self), dtype=bool)
+
+			if code_point is not None:
+				mask &= self.columns['unicode'] == code_point
+
+			elif len(text):
+				mask &= np.char.find(self.name_keys, text) >= 0
+
+			if outliers:
+				mask &= self.outlier_mask()
+
+			return np.flatnonzero(mask)
+
+		rows = range(len(self))
+
+		if code_point is not None:
+			rows = [row for row in rows if self.columns['unicode'][row] == code_point]
+
+		elif len(text):
+			rows = [row for row in rows if text in self.name_keys[row]]
+
+		if outliers:
+			mask = self.outlier_mask()
+			rows = [row for row in rows if mask[row]]
+
+		return list(rows)
+
+	def order(self, rows, column, descending=False):
+		'''Rows sorted by a column, stable. Rows not filled yet stay last either way'''
+		if np is not None:
+			rows = np.asarray(rows, dtype=np.intp)
+
+			if column == 'name':
+				# - Descending: sort the reversed rows and reverse back, ties keep their order
+				rows = rows[::-1] if descending else rows
+				ordered = rows[np.argsort(self.name_keys[rows], kind='stable')]
+				return ordered[::-1] if descending else ordered
+
+			values = self.columns[column][rows].astype(np.float64)
+			values[~self.filled[rows]] = np.nan
+			ordered = rows[np.argsort(-values if descending else values, kind='stable')]
+			return ordered
+
+		if column == 'name':
+			return sorted(rows, key=self.name_keys.__getitem__, reverse=descending)
+
+		values, sign = self.columns[column], -1 if descending else 1
+		is_missing = lambda row: not self.filled[row] or values[row] != values[row]
+		return sorted(rows, key=lambda row: (is_missing(row), 0 if is_missing(row) else sign * values[row]))
+
+	# - Statistics ------------------------
+	def __advances(self):
+		'''Rows and values of the known advances'''
+		if np is not None:
+			rows = np.flatnonzero(self.filled & ~np.isnan(self.columns['advance']))
+			return rows, self.columns['advance'][rows]
+
+		rows = [row for row in range(len(self)) if self.filled[row] and not math.isnan(self.columns['advance'][row])]
+		return rows, [self.columns['advance'][row] for row in rows]
+
+	def outlier_mask(self):
+		'''Rows with an advance far from the rest, by the interquartile range'''
+		rows, values = self.__advances()
+
+		if np is not None:
+			mask = np.zeros(len(self), dtype=bool)
+
+			if len(values) >= 4:
+				low, high = np.percentile(values, (25, 75))
+				spread = cfg_outlier_range * (high - low)
+				mask[rows[(values < low - spread) | (values > high + spread)]] = True
+
+			return mask
+
+		mask = [False] * len(self)
+
+		if len(values) >= 4:
+			low, high = percentile(values, 25), percentile(values, 75)
+			spread = cfg_outlier_range * (high - low)
+
+			for row, value in zip(rows, values):
+				mask[row] = value < low - spread or value > high + spread
+
+		return mask
+
+	def stats(self):
+		'''Advance statistics of the filled rows: count, min, max, mean, median, std and outliers'''
+		rows, values = self.__advances()
+		result = {'glyphs':len(self), 'filled':self.filled_count(), 'count':len(values)}
+
+		if not len(values):
+			return result
+
+		if np is not None:
+			result.update(min=float(values.min()), max=float(values.max()), mean=float(values.mean()), median=float(np.median(values)), std=float(values.std()))
+			result['outliers'] = int(self.outlier_mask().sum())
+			return result
+
+		mean = math.fsum(values) / len(values)
+		result.update(min=min(values), max=max(values), mean=mean, median=percentile(values, 50), std=math.sqrt(math.fsum((value - mean) ** 2 for value in values) / len(values)))
+		result['outliers'] = sum(self.outlier_mask())
+		return result
@@ -0,0 +1,1504 @@
+# MODULE: ufoRig / lib / models
+# -----------------------------------------------------------
+# (C) Vassil Kateliev, 2021 		(http://www.kateliev.com)
+# ------------------------------------------------------------
+# https://github.com/kateliev
+
+__version__ = 1.19
+
+# - Dependencies --------------------------------------------
+import os
+import copy
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from PyQt5 import QtCore
+from . import core
+from .history import undo_history, retained_size, cfg_history_node_size
+from .metrics import cfg_metric_columns, unicode_text
+from .objects import plist_converter
+from .trace import span
+
+# - Config ----------------------------
+cfg_list_item = 'List Item'
+cfg_container_types = ('dict', 'list')
+cfg_glif_index = 'contents.plist'
+cfg_glif_cache_size = 256
+cfg_no_children = ()		# Shared by all leaves, they never get children of their own
+cfg_link_attributes = {'source':'filename', 'instance':'filename'}	# Designspace element: attribute holding a UFO path
+cfg_bulk_runs = 16			# Scattered row changes above this many runs are done as one layout change
+cfg_preview_length = 120	# Characters of a value shown in its cell, longer values are edited in full apart
+cfg_preview_ellipsis = '\u2026'
+
+# - Helper functions ----------------------------------------
+def convert_text(text, data_type):
+	'''Turn an edited cell text into a value of given plist type, raises ValueError on bad input'''
+	return plist_converter.parse(text, data_type)
+
+def text_preview(text, limit=cfg_preview_length):
+	'''First line of text cut to limit characters. Returns (preview, is_cut)'''
+	cut = text.find('\n', 0, limit + 1)
+	cut = limit if cut < 0 and len(text) > limit else cut
+
+	if cut < 0:
+		return text, False
+
+	return text[:cut].rstrip() + cfg_preview_ellipsis, True
+
+# - Nodes ---------------------------------------------------
+class tree_node(object):
+	'''Base lazy node: children are built on demand by fetch().
+	Nodes with a path are source files that can be saved on their own.
+	Nodes carry no styling, the model derives it from their type. All
+	node classes use __slots__, large lib and kerning files make many.
+	'''
+	__slots__ = ('parent', 'children', 'fetched', 'path', '__row')
+	state_fields = ('children', 'fetched')
+
+	def __init__(self, parent=None):
+		self.parent = parent
+		self.children = []
+		self.fetched = True
+		self.path = None
+		self.__row = 0
+
+	def row(self):
+		'''Position within parent, cached and verified on access'''
+		if self.parent is None:
+			return 0
+
+		siblings = self.parent.children
+
+		if self.__row >= len(siblings) or siblings[self.__row] is not self:
+			self.__row = siblings.index(self)
+
+		return self.__row
+
+	def is_container(self):
+		return False
+
+	def is_branch(self):
+		return self.is_container()
+
+	def has_children(self):
+		return bool(len(self.children))
+
+	def child_count(self):
+		return len(self.children)
+
+	def raw_size(self):
+		'''Items held as raw data until the node is fetched'''
+		return 0 if self.fetched else self.child_count()
+
+	def preview_text(self, col, limit=cfg_preview_length):
+		'''Cell text bounded to limit characters, returns (preview, is_cut)'''
+		return text_preview(self.text(col), limit)
+
+	def text(self, col):
+		return ''
+
+	def set_text(self, col, text):
+		return False
+
+	def is_editable(self, col):
+		return True
+
+	def set_type(self, data_type):
+		pass
+
+	def check_type(self, data_type):
+		'''Raise ValueError if the node can not be retyped to data_type'''
+		pass
+
+	def converted(self, data_type):
+		'''Return a replacement node of other kind for data_type, or None if retyping is done in place'''
+		return None
+
+	def sync(self):
+		'''Write structural changes of children back to the wrapped data'''
+		pass
+
+	def preview(self):
+		'''Children as fetch() would build them, without loading anything new or changing the node'''
+		return self.children if self.fetched else []
+
+	def fetch(self):
+		self.fetched = True
+		return []
+
+	def unload(self):
+		pass
+
+	def save(self):
+		pass
+
+	def export(self):
+		return None
+
+	def clone(self):
+		return None
+
+	def snapshot(self):
+		'''Shallow state for undo, children are shared not copied'''
+		return dict((field, getattr(self, field)) for field in self.state_fields)
+
+	def restore(self, state):
+		for field, value in state.items():
+			setattr(self, field, value)
+
+class plist_node(tree_node):
+	'''Plist node wrapping parsed plist data. Containers keep their raw
+	data until fetched, and rebuild it from children once they are.
+	'''
+	__slots__ = ('key', 'type', 'data')
+	state_fields = ('key', 'type', 'data', 'children', 'fetched')
+
+	def __init__(self, key, data, parent=None):
+		super(plist_node, self).__init__(parent)
+		self.key = str(key)
+		self.type = type(data).__name__
+		self.data = data
+		self.fetched = not self.is_container()
+
+		if self.fetched:
+			self.children = cfg_no_children
+
+	def is_container(self):
+		return self.type in cfg_container_types
+
+	def has_children(self):
+		return bool(self.child_count())
+
+	def child_count(self):
+		if self.fetched:
+			return len(self.children)
+
+		return len(self.data)
+
+	def raw_size(self):
+		if self.fetched:
+			return 0
+
+		count, stack = 0, [self.data]
+
+		while len(stack):
+			data = stack.pop()
+			count += len(data)
+			stack.extend(value for value in (data.values() if isinstance(data, dict) else data) if isinstance(value, (dict, list)))
+
+		return count
+
+	def preview_text(self, col, limit=cfg_preview_length):
+		'''Containers show their size, long values only their start. Nothing
+		is formatted past limit, so painting a cell never walks a subtree.
+		'''
+		if col != 1:
+			return super(plist_node, self).preview_text(col, limit)
+
+		if self.is_container():
+			count = self.child_count()
+			return ('{} {}'.format(count, ('key' if self.type == 'dict' else 'item') + ('' if count == 1 else 's')), False)
+
+		if isinstance(self.data, (str, bytes)) and len(self.data) > limit:
+			# - Whole base64 groups only, so the start reads the same as the full text
+			text = plist_converter.format(self.data[:limit - limit % 3] if isinstance(self.data, bytes) else self.data[:limit])
+			preview, is_cut = text_preview(text, limit)
+			return (preview if is_cut else preview + cfg_preview_ellipsis), True
+
+		return super(plist_node, self).preview_text(col, limit)
+
+	def text(self, col):
+		if col == 0:
+			return self.key
+
+		elif col == 1:
+			return '' if self.is_container() else plist_converter.format(self.data)
+
+		elif col == 2:
+			return self.type
+
+		return ''
+
+	def set_text(self, col, text):
+		if col == 0:
+			self.key = text
+			return True
+
+		elif col == 1 and not self.is_container():
+			self.data = convert_text(text, self.type)
+			return True
+
+		return False
+
+	def check_type(self, data_type):
+		if not (self.is_container() and data_type in cfg_container_types):
+			convert_text(self.text(1), data_type)
+
+	def set_type(self, data_type):
+		if self.is_container() and data_type in cfg_container_types:
+			value = self.export()
+
+			if data_type == 'list':
+				self.data = list(value.values()) if isinstance(value, dict) else value
+			else:
+				self.data = dict((str(i), item) for i, item in enumerate(value)) if isinstance(value, list) else value
+		else:
+			self.data = convert_text(self.text(1), data_type)
+
+		self.type = type(self.data).__name__
+		self.children = []
+		self.fetched = not self.is_container()
+
+	def preview(self):
+		if self.fetched:
+			return self.children
+
+		if self.type == 'dict':
+			items = self.data.items()
+		else:
+			items = ((cfg_list_item, value) for value in self.data)
+
+		return [plist_node(key, value, self) for key, value in items]
+
+	def fetch(self):
+		children = self.preview()
+		self.data = None
+		self.fetched = True
+		return children
+
+	def export(self):
+		if not self.fetched:
+			return self.data
+
+		if self.type == 'dict':
+			return {child.key: child.export() for child in self.children}
+
+		elif self.type == 'list':
+			return [child.export() for child in self.children]
+
+		return self.data
+
+	def clone(self):
+		return plist_node(self.key, copy.deepcopy(self.export()))
+
+	def save(self):
+		core.plist_save(self.path, self.export())
+
+class xml_node(tree_node):
+	'''XML node wrapping an ET.Element. Attributes are exposed as virtual
+	child rows and all edits are written straight back into the element.
+	'''
+	__slots__ = ('element', 'type')
+
+	def __init__(self, element, parent=None):
+		super(xml_node, self).__init__(parent)
+		self.element = element
+		self.type = 'tag'
+		self.fetched = False
+
+	@property
+	def key(self):
+		return self.element.tag
+
+	def is_container(self):
+		return True
+
+	def is_branch(self):
+		return self.has_children()
+
+	def has_children(self):
+		return bool(self.child_count())
+
+	def child_count(self):
+		if self.fetched:
+			return len(self.children)
+
+		return len(self.element) + len(self.element.attrib)
+
+	def raw_size(self):
+		if self.fetched:
+			return 0
+
+		return sum(1 + len(element.attrib) for element in self.element.iter()) - 1
+
+	def text(self, col):
+		if col == 0:
+			return self.element.tag
+
+		elif col == 1:
+			return self.element.text.strip() if self.element.text is not None else ''
+
+		elif col == 2:
+			return self.type
+
+		return ''
+
+	def set_text(self, col, text):
+		if col == 0 and len(text):
+			self.element.tag = text
+			return True
+
+		elif col == 1:
+			self.element.text = text if len(text) else None
+			return True
+
+		return False
+
+	def converted(self, data_type):
+		if data_type == 'attribute':
+			return xml_attrib_node(self.text(0), self.text(1))
+
+		return None
+
+	def sync(self):
+		if not self.fetched:
+			return
+
+		self.element[:] = [child.element for child in self.children if child.type == 'tag']
+		self.element.attrib.clear()
+		self.element.attrib.update((child.key, child.value) for child in self.children if child.type == 'attribute')
+
+	def preview(self):
+		if self.fetched:
+			return self.children
+
+		children = [xml_attrib_node(name, value, self) for name, value in self.element.attrib.items()]
+		children += [xml_node(element, self) for element in self.element]
+		return children
+
+	def fetch(self):
+		children = self.preview()
+		self.fetched = True
+		return children
+
+	def export(self):
+		return self.element
+
+	def clone(self):
+		return xml_node(copy.deepcopy(self.element))
+
+	def save(self):
+		core.xml_save(self.path, self.element)
+
+class xml_attrib_node(tree_node):
+	'''Virtual row for a single attribute of the parent element'''
+	__slots__ = ('key', 'value', 'type')
+
+	def __init__(self, key, value, parent=None):
+		super(xml_attrib_node, self).__init__(parent)
+		self.children = cfg_no_children
+		self.key = key
+		self.value = value
+		self.type = 'attribute'
+
+	def text(self, col):
+		return (self.key, self.value, self.type)[col] if col < 3 else ''
+
+	def set_text(self, col, text):
+		if col == 0 and len(text):
+			self.key = text
+
+		elif col == 1:
+			self.value = text
+
+		else:
+			return False
+
+		if self.parent is not None:
+			self.parent.sync()
+
+		return True
+
+	def converted(self, data_type):
+		if data_type == 'tag':
+			element = ET.Element(self.key)
+			element.text = self.value if len(self.value) else None
+			return xml_node(element)
+
+		return None
+
+	def export(self):
+		return (self.key, self.value)
+
+	def clone(self):
+		return xml_attrib_node(self.key, self.value)
+
+class glif_layer_node(plist_node):
+	'''A glyph layer contents.plist: every entry becomes a glyph node
+	that parses its .glif file only when expanded.
+	'''
+	__slots__ = ('cache',)
+
+	def __init__(self, key, data, path, cache, parent=None):
+		super(glif_layer_node, self).__init__(key, data, parent)
+		self.path = path
+		self.cache = cache
+
+	def preview(self):
+		if self.fetched or self.type != 'dict':
+			return super(glif_layer_node, self).preview()
+
+		folder = os.path.dirname(self.path)
+		return [glif_node(name, file_name, os.path.join(folder, file_name), self.cache, self) for name, file_name in self.data.items()]
+
+class glif_node(plist_node):
+	'''Glyph entry of a layer: exports as its file name, expands to the parsed GLIF XML'''
+	__slots__ = ('cache',)
+
+	def __init__(self, key, file_name, path, cache, parent=None):
+		super(glif_node, self).__init__(key, file_name, parent)
+		self.type = 'glif'
+		self.path = path
+		self.cache = cache
+		self.fetched = False
+		self.children = []
+
+	def is_branch(self):
+		return True
+
+	def has_children(self):
+		return True
+
+	def child_count(self):
+		return len(self.children) if self.fetched else 1
+
+	def raw_size(self):
+		return 0
+
+	def set_text(self, col, text):
+		# - The file name is not editable: saving would leave contents.plist pointing at a file that does not exist
+		if col == 1:
+			return False
+
+		return super(glif_node, self).set_text(col, text)
+
+	def is_editable(self, col):
+		return col != 1
+
+	def set_type(self, data_type):
+		pass
+
+	def preview(self):
+		return self.children if self.fetched else []
+
+	def fetch(self):
+		tree = self.cache.load(self)
+		self.fetched = True
+		return [xml_node(tree.getroot(), self)]
+
+	def unload(self):
+		self.children = []
+		self.fetched = False
+
+	def export(self):
+		return self.data
+
+	def clone(self):
+		return glif_node(self.key, self.data, self.path, self.cache)
+
+	def save(self):
+		if self.fetched and len(self.children):
+			core.xml_save(self.path, self.children[0].element, wrapped=False)
+
+# - Search --------------------------------------------------
+class search_index(object):
+	'''Flat index of the Key, Value and Type texts of every row below root, with
+	the row path to each. Branches that are not built yet are indexed from their
+	raw data, glyphs that are not parsed yet only by name and file.
+
+	Kept per file (row of root): after an edit only the edited file is stale,
+	refresh() indexes it again, the other files are left as they are.
+	'''
+	def __init__(self, root):
+		self.root = root
+		self.files = {}		# id(file node): (file node, row, paths, columns)
+		self.stale = True
+		self.refresh()
+
+	def __len__(self):
+		return sum(len(paths) for node, row, paths, columns in self.files.values())
+
+	def invalidate(self, node=None):
+		'''Index the file holding node again on refresh, all files if node is None'''
+		while node is not None and node.parent is not self.root:
+			node = node.parent
+
+		if node is None:
+			self.files = {}
+		else:
+			self.files.pop(id(node), None)
+
+		self.stale = True
+
+	def refresh(self):
+		'''Index the files that are new, moved or edited since last time'''
+		if not self.stale:
+			return
+
+		files = {}
+
+		for row, node in enumerate(self.root.preview()):
+			entry = self.files.get(id(node))
+
+			if entry is None or entry[0] is not node or entry[1] != row:
+				entry = (node, row) + self.__index(node, row)
+
+			files[id(node)] = entry
+
+		self.files, self.stale = files, False
+
+	@staticmethod
+	def __index(top, top_row):
+		paths, columns = [], ([], [], [])
+		stack = [(top, (top_row,))]
+
+		# - Pre-order, so matches come in the order rows are shown
+		while len(stack):
+			node, path = stack.pop()
+			paths.append(path)
+
+			for col, column in enumerate(columns):
+				column.append(node.text(col).lower())
+
+			if node.has_children():
+				stack.extend((child, path + (row,)) for row, child in reversed(list(enumerate(node.preview()))))
+
+		return paths, columns
+
+	def match(self, text, columns=(0, 1, 2)):
+		'''Row paths with text in any of the given columns, case insensitive'''
+		self.refresh()
+		text = text.lower()
+		found = []
+
+		for node, row, paths, file_columns in sorted(self.files.values(), key=lambda entry: entry[1]):
+			hits = set()
+
+			for col in columns:
+				hits.update(i for i, cell in enumerate(file_columns[col]) if text in cell)
+
+			found += [paths[i] for i in sorted(hits)]
+
+		return found
+
+class text_finder(object):
+	'''Every match of a compiled pattern in the Key and Value texts below root,
+	as (row path, column, text, occurrences). File rows and list item keys are
+	left out. Glyphs not parsed yet are listed in unparsed as (row path, file
+	path), core.glif_matches() searches their files and add() takes the result.
+	'''
+	def __init__(self, root, pattern, columns=(0, 1), data_types=None):
+		self.pattern = pattern
+		self.columns = columns
+		self.data_types = data_types
+		self.matches = []
+		self.unparsed = []
+		stack = [(child, (row,)) for row, child in reversed(list(enumerate(root.preview())))]
+
+		while len(stack):
+			node, path = stack.pop()
+
+			if len(path) > 1 and (data_types is None or node.text(2) in data_types):
+				for col in columns:
+					if col == 0 and getattr(node.parent, 'type', None) == 'list':
+						continue
+
+					if col == 1 and getattr(node, 'type', None) == 'glif':
+						continue
+
+					text = node.text(col)
+					count = sum(1 for match in pattern.finditer(text))
+
+					if count:
+						self.matches.append((path, col, text, count))
+
+			if node.has_children():
+				stack.extend((child, path + (row,)) for row, child in reversed(list(enumerate(node.preview()))))
+
+			if getattr(node, 'type', None) == 'glif' and not node.fetched:
+				self.unparsed.append((path, node.path))
+
+	def __len__(self):
+		return len(self.matches)
+
+	def add(self, matches):
+		self.matches += matches
+
+	def rows(self):
+		return len(set(path for path, col, text, count in self.matches))
+
+	def occurrences(self):
+		return sum(count for path, col, text, count in self.matches)
+
+# - Caches --------------------------------------------------
+class glif_cache(object):
+	'''Size limited LRU of parsed glyphs. When over capacity the least
+	recently loaded glyph node is handed to on_evict to drop its tree.
+	'''
+	def __init__(self, capacity=cfg_glif_cache_size, on_evict=None, is_pinned=None):
+		self.capacity = capacity
+		self.on_evict = on_evict
+		self.is_pinned = is_pinned
+		self.__nodes = OrderedDict()
+
+	def __len__(self):
+		return len(self.__nodes)
+
+	def load(self, node):
+		tree = core.xml_load(node.path)
+		self.__nodes[id(node)] = node
+		self.__nodes.move_to_end(id(node))
+
+		while len(self.__nodes) > self.capacity:
+			# - Edited glyphs stay loaded until saved
+			for old_id, old_node in self.__nodes.items():
+				if old_node is not node and (self.is_pinned is None or not self.is_pinned(old_node)):
+					break
+			else:
+				break
+
+			del self.__nodes[old_id]
+			
+			if self.on_evict is not None:
+				self.on_evict(old_node)
+
+		return tree
+
+	def release(self, node):
+		self.__nodes.pop(id(node), None)
+
+# - Models --------------------------------------------------
+class tree_model(QtCore.QAbstractItemModel):
+	'''Lazy item model over a tree of nodes'''
+	node_unloading = QtCore.pyqtSignal(QtCore.QModelIndex)
+	dirty_changed = QtCore.pyqtSignal(bool)
+	edited = QtCore.pyqtSignal()
+	source_edited = QtCore.pyqtSignal(object)	# Source file node of an edit, None for the root rows
+	error_raised = QtCore.pyqtSignal(str)
+	history_changed = QtCore.pyqtSignal()
+
+	def __init__(self, root, headers, styles=None):
+		super(tree_model, self).__init__()
+		self.root = root
+		self.headers = headers
+		self.styles = styles if styles is not None else {}
+		self.dirty = set()
+		self.marks = {}		# Node: mark name, painted with the brush_<mark> style
+		self.history = undo_history()
+		self.__replaying = False
+
+	# - Helpers ---------------------------
+	def node(self, index):
+		if index.isValid():
+			return index.internalPointer()
+
+		return self.root
+
+	def index_of(self, node, col=0):
+		if node is None or node is self.root:
+			return QtCore.QModelIndex()
+
+		return self.createIndex(node.row(), col, node)
+
+	def fetch(self, node):
+		if not node.fetched:
+			self.fetchMore(self.index_of(node))
+
+	def node_at(self, path):
+		'''Node at a row path, building the branches along the way'''
+		node = self.root
+
+		for row in path:
+			self.fetch(node)
+			node = node.children[row]
+
+		return node
+
+	def attached(self, node):
+		'''Is the node still part of this model'''
+		while node is not self.root:
+			if node.parent is None:
+				return False
+
+			try:
+				node.row()
+			except ValueError:
+				return False
+
+			node = node.parent
+
+		return True
+
+	def link_of(self, node):
+		'''Path of the file or folder the node refers to, None if it is no link'''
+		return None
+
+	def unload(self, node):
+		'''Drop the built children of a node, they are built again on next expand'''
+		if not self.attached(node) or not node.fetched:
+			return
+
+		self.node_unloading.emit(self.index_of(node))
+
+		if len(node.children):
+			self.beginRemoveRows(self.index_of(node), 0, len(node.children) - 1)
+			node.unload()
+			self.endRemoveRows()
+		else:
+			node.unload()
+
+	# - Dirty tracking ---------------------
+	def source_of(self, node):
+		'''Nearest source file node that holds given node'''
+		while node is not None and node is not self.root:
+			if node.path is not None:
+				return node
+			node = node.parent
+
+		return None
+
+	def mark_dirty(self, node, own=False):
+		'''Mark the source file of node as edited. The own row of a plist or
+		GLIF file (its name, its file name) belongs to the parent's source
+		unless own is set. The root element of an XML file is in the file itself.
+		'''
+		self.edited.emit()
+
+		if not own and node.path is not None and not isinstance(node, xml_node):
+			node = node.parent
+
+		source = self.source_of(node)
+		self.source_edited.emit(source)
+
+		if source is not None and source not in self.dirty:
+			self.dirty.add(source)
+
+			if len(self.dirty) == 1:
+				self.dirty_changed.emit(True)
+
+	def is_dirty(self, node):
+		return node in self.dirty
+
+	def has_dirty_within(self, node):
+		'''Is node or any source file below it edited'''
+		for source in self.dirty:
+			while source is not None:
+				if source is node:
+					return True
+				source = source.parent
+
+		return False
+
+	def save_dirty(self):
+		'''Write every edited source file back to its path, returns the written paths'''
+		saved = []
+
+		with span('save') as record:
+			for node in list(self.dirty):
+				if self.attached(node):
+					node.save()
+					saved.append(node.path)
+
+				self.dirty.discard(node)
+
+			record['items'] = len(saved)
+
+		self.dirty_changed.emit(False)
+		return saved
+
+	def unload_later(self, node):
+		'''Unload once control is back in the event loop, safe to call from within fetchMore'''
+		QtCore.QTimer.singleShot(0, lambda: self.unload(node))
+
+	# - Qt model interface ----------------
+	def index(self, row, col, parent=QtCore.QModelIndex()):
+		parent_node = self.node(parent)
+
+		if 0 <= row < len(parent_node.children) and 0 <= col < len(self.headers):
+			return self.createIndex(row, col, parent_node.children[row])
+
+		return QtCore.QModelIndex()
+
+	def parent(self, index):
+		if not index.isValid():
+			return QtCore.QModelIndex()
+
+		return self.index_of(index.internalPointer().parent)
+
+	def rowCount(self, parent=QtCore.QModelIndex()):
+		if parent.column() > 0:
+			return 0
+
+		return len(self.node(parent).children)
+
+	def columnCount(self, parent=QtCore.QModelIndex()):
+		return len(self.headers)
+
+	def hasChildren(self, parent=QtCore.QModelIndex()):
+		return self.node(parent).has_children()
+
+	def canFetchMore(self, parent):
+		return not self.node(parent).fetched
+
+	def fetchMore(self, parent):
+		node = self.node(parent)
+
+		if node.fetched:
+			return
+
+		try:
+			with span('fetch') as record:
+				children = node.fetch()
+				record['items'] = len(children)
+
+		except (OSError, ET.ParseError) as error:
+			# - Unreadable glyph file: the node stays unfetched, expanding it tries again
+			reason = error.strerror if isinstance(error, OSError) and error.strerror else error
+			self.error_raised.emit('Could not read {}: {}'.format(node.path, reason))
+			return
+
+		if len(children):
+			self.beginInsertRows(parent, 0, len(children) - 1)
+			node.children = children
+			self.endInsertRows()
+
+	def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+		if orientation == QtCore.Qt.Horizontal and role == QtCore.Qt.DisplayRole:
+			return self.headers[section]
+
+		return None
+
+	def data(self, index, role=QtCore.Qt.DisplayRole):
+		if not index.isValid():
+			return None
+
+		node, col = index.internalPointer(), index.column()
+
+		if role == QtCore.Qt.DisplayRole:
+			return node.preview_text(col)[0]
+
+		if role == QtCore.Qt.EditRole:
+			return node.text(col)
+
+		if col == 1 and role in (QtCore.Qt.FontRole, QtCore.Qt.ForegroundRole, QtCore.Qt.ToolTipRole):
+			link = self.link_of(node)
+
+			if link is not None:
+				if role == QtCore.Qt.FontRole:
+					return self.styles.get('font_link')
+
+				elif role == QtCore.Qt.ForegroundRole:
+					return self.styles.get('brush_link' if os.path.isdir(link) else 'brush_missing')
+
+				return link if os.path.isdir(link) else '{} (not found)'.format(link)
+
+		if col == 1 and role == QtCore.Qt.ToolTipRole and node.preview_text(col)[1]:
+			return 'Long value, shown cut. Double click to edit it in full'
+
+		is_meta = col == 2 or (col == 0 and node.parent is not self.root and getattr(node.parent, 'type', None) == 'list')
+		is_meta = is_meta or (col == 1 and isinstance(node, plist_node) and node.is_container())
+
+		if role == QtCore.Qt.FontRole and is_meta:
+			return self.styles.get('font_meta')
+
+		elif role == QtCore.Qt.ForegroundRole and is_meta:
+			return self.styles.get('brush_meta')
+
+		elif role == QtCore.Qt.BackgroundRole and node in self.marks:
+			return self.styles.get('brush_' + self.marks[node])
+
+		elif role == QtCore.Qt.DecorationRole and col == 0:
+			return self.styles.get('icon_parent' if node.is_branch() else 'icon_child')
+
+		return None
+
+	def setData(self, index, value, role=QtCore.Qt.EditRole):
+		if not index.isValid() or role != QtCore.Qt.EditRole:
+			return False
+
+		node = index.internalPointer()
+		old_text = node.text(index.column())
+
+		try:
+			changed = node.set_text(index.column(), value)
+		except ValueError as error:
+			self.error_raised.emit(str(error))
+			return False
+
+		if changed:
+			self.record('Edit', ('text', node, index.column(), old_text, node.text(index.column())))
+			self.mark_dirty(node)
+			self.node_changed(node)
+			return True
+
+		return False
+
+	def flags(self, index):
+		if not index.isValid():
+			return QtCore.Qt.ItemIsDropEnabled
+
+		flags = QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsSelectable | QtCore.Qt.ItemIsDragEnabled
+
+		if index.internalPointer().is_editable(index.column()):
+			flags |= QtCore.Qt.ItemIsEditable
+
+		if index.internalPointer().is_container():
+			flags |= QtCore.Qt.ItemIsDropEnabled
+
+		return flags
+
+	def supportedDropActions(self):
+		return QtCore.Qt.MoveAction | QtCore.Qt.CopyAction
+
+	# - Tree operations -------------------
+	def node_changed(self, node):
+		self.dataChanged.emit(self.index_of(node, 0), self.index_of(node, len(self.headers) - 1))
+
+	def insert_nodes(self, parent, row, nodes, undoable=True):
+		self.fetch(parent)
+		row = min(max(row, 0), len(parent.children))
+		self.insert_pairs(parent, [(row + offset, node) for offset, node in enumerate(nodes)], undoable)
+
+	def insert_pairs(self, parent, pairs, undoable=True):
+		'''Insert (row, node) pairs at once, rows are positions after insertion, ascending. Parent is synced once'''
+		self.fetch(parent)
+		runs = self.__runs(pairs)
+
+		for row, node in pairs:
+			node.parent = parent
+
+		if len(runs) > cfg_bulk_runs:
+			children = list(parent.children)
+
+			for row, node in pairs:
+				children.insert(row, node)
+
+			self.__swap_children(parent, children)
+
+		else:
+			for first, last in runs:
+				self.beginInsertRows(self.index_of(parent), pairs[first][0], pairs[last][0])
+				parent.children[pairs[first][0]:pairs[first][0]] = [node for row, node in pairs[first:last + 1]]
+				self.endInsertRows()
+
+		parent.sync()
+		self.mark_dirty(parent, True)
+
+		if undoable:
+			self.record('Insert', ('insert', parent, list(pairs)))
+
+	def duplicate_nodes(self, nodes):
+		'''Insert a clone right after each node, grouped by parent. Returns the clones'''
+		groups, clones = OrderedDict(), []
+
+		for node in nodes:
+			if node.parent is not None and node.parent.is_container():
+				groups.setdefault(id(node.parent), (node.parent, []))[1].append(node.row())
+
+		for parent, rows in groups.values():
+			rows.sort()
+			pairs = [(row + offset + 1, parent.children[row].clone()) for offset, row in enumerate(rows)]
+			self.insert_pairs(parent, pairs)
+			clones += [node for row, node in pairs]
+
+		return clones
+
+	def remove_node(self, node):
+		parent, row = node.parent, node.row()
+		self.remove_nodes([node])
+		return parent, row
+
+	def remove_nodes(self, nodes, undoable=True):
+		'''Remove many nodes, every parent is synced once and every run of adjacent rows is removed at once'''
+		groups = OrderedDict()
+
+		for node in nodes:
+			groups.setdefault(id(node.parent), (node.parent, []))[1].append((node.row(), node))
+
+		for parent, pairs in groups.values():
+			pairs.sort(key=lambda pair: pair[0])
+			runs = self.__runs(pairs)
+
+			if len(runs) > cfg_bulk_runs:
+				removed = set(id(node) for row, node in pairs)
+				self.__swap_children(parent, [child for child in parent.children if id(child) not in removed])
+
+			else:
+				for first, last in reversed(runs):
+					self.beginRemoveRows(self.index_of(parent), pairs[first][0], pairs[last][0])
+					del parent.children[pairs[first][0]:pairs[last][0] + 1]
+					self.endRemoveRows()
+
+			parent.sync()
+			self.mark_dirty(parent, True)
+
+			if undoable:
+				self.record('Remove', ('remove', parent, pairs), retained_size(node for row, node in pairs))
+
+	def replace_node(self, node, new_node):
+		'''Swap a node for a freshly loaded one, outside of the undo history'''
+		parent, row = node.parent, node.row()
+		self.remove_nodes([node], undoable=False)
+		self.insert_nodes(parent, row, [new_node], undoable=False)
+
+	def __swap_children(self, parent, children):
+		'''Replace all children of parent in one layout change. Every row signal
+		makes Qt walk all persistent indexes, so scattered edits are done at once.
+		'''
+		self.layoutAboutToBeChanged.emit()
+		old_indexes = self.persistentIndexList()
+		parent.children[:] = children		# In place, undo snapshots share the list
+		new_indexes = []
+
+		for index in old_indexes:
+			node = index.internalPointer()
+
+			if node is not None and self.attached(node):
+				new_indexes.append(self.createIndex(node.row(), index.column(), node))
+			else:
+				new_indexes.append(QtCore.QModelIndex())
+
+		self.changePersistentIndexList(old_indexes, new_indexes)
+		self.layoutChanged.emit()
+
+	@staticmethod
+	def __runs(pairs):
+		'''(first, last) positions of runs of consecutive rows in sorted (row, node) pairs'''
+		runs, first = [], 0
+
+		for position in range(1, len(pairs) + 1):
+			if position == len(pairs) or pairs[position][0] != pairs[position - 1][0] + 1:
+				runs.append((first, position - 1))
+				first = position
+
+		return runs
+
+	def move_node(self, node, new_parent, row):
+		self.fetch(new_parent)
+		old_parent, old_row = node.parent, node.row()
+		row = min(max(row, 0), len(new_parent.children))
+
+		if old_parent is new_parent and row in (old_row, old_row + 1):
+			return
+
+		if not self.beginMoveRows(self.index_of(old_parent), old_row, old_row, self.index_of(new_parent), row):
+			return
+
+		del old_parent.children[old_row]
+
+		if old_parent is new_parent and row > old_row:
+			row -= 1
+
+		node.parent = new_parent
+		new_parent.children.insert(row, node)
+		old_parent.sync()
+		new_parent.sync()
+		self.endMoveRows()
+		self.mark_dirty(old_parent, True)
+		self.mark_dirty(new_parent, True)
+		self.record('Move', ('move', node, old_parent, old_row, new_parent, row))
+
+	def __place(self, node, parent, row):
+		'''Move node so it ends up at row of parent'''
+		if node.parent is parent and row > node.row():
+			row += 1
+
+		self.move_node(node, parent, row)
+
+	def replace_matches(self, finder, replacement, expand=True):
+		'''Replace every match of a text_finder as one step. With expand, group references
+		like \\1 in replacement are filled in. Returns (replaced, failed) cell counts
+		'''
+		substitute = replacement if expand else (lambda match: replacement)
+		replaced, failed = 0, 0
+
+		with self.history_group('Replace'):
+			for path, col, text, count in finder.matches:
+				try:
+					node = self.node_at(path)
+				except IndexError:
+					failed += 1
+					continue
+
+				# - Changed since the matches were collected
+				if node.text(col) != text:
+					failed += 1
+					continue
+
+				try:
+					changed = node.set_text(col, finder.pattern.sub(substitute, text))
+				except ValueError:
+					failed += 1
+					continue
+
+				if changed:
+					self.record('Replace', ('text', node, col, text, node.text(col)))
+					self.mark_dirty(node)
+					self.node_changed(node)
+					replaced += 1
+
+		return replaced, failed
+
+	def set_nodes_type(self, nodes, data_type):
+		'''Retype many nodes as one step. Nodes that can not be converted are skipped and reported once'''
+		failed = []
+
+		with self.history_group('Set Type'):
+			# - Ancestors first: retyping a container rebuilds its rows, selected ones among them are gone then
+			for node in sorted(nodes, key=self.__depth):
+				if not self.attached(node):
+					continue
+
+				if not self.set_node_type(node, data_type, report=False):
+					failed.append(node)
+
+		if len(failed):
+			self.error_raised.emit('Could not convert {} of {} items to {}'.format(len(failed), len(nodes), data_type))
+
+		return len(nodes) - len(failed)
+
+	@staticmethod
+	def __depth(node):
+		depth = 0
+
+		while node.parent is not None:
+			depth += 1
+			node = node.parent
+
+		return depth
+
+	def set_node_type(self, node, data_type, report=True):
+		if node.type == data_type:
+			return True
+
+		try:
+			node.check_type(data_type)
+		except ValueError as error:
+			if report:
+				self.error_raised.emit(str(error))
+			return False
+
+		replacement = node.converted(data_type)
+
+		if replacement is not None:
+			self.begin_group('Set Type')
+			parent, row = self.remove_node(node)
+			self.insert_nodes(parent, row, [replacement])
+			self.end_group()
+			return True
+
+		before = node.snapshot()
+
+		if node.is_container() and node.fetched and len(node.children):
+			self.beginRemoveRows(self.index_of(node), 0, len(node.children) - 1)
+			node.set_type(data_type)
+			self.endRemoveRows()
+		else:
+			node.set_type(data_type)
+
+		self.mark_dirty(node)
+		self.node_changed(node)
+		self.fetch(node)
+		self.record('Set Type', ('state', node, before, node.snapshot()), retained_size(before['children']))
+		return True
+
+	def __restore(self, node, state):
+		'''Bring node back to a snapshot, swapping its rows'''
+		state = dict(state)
+		children = state.pop('children')
+
+		if node.fetched and len(node.children):
+			self.beginRemoveRows(self.index_of(node), 0, len(node.children) - 1)
+			node.children = []
+			self.endRemoveRows()
+
+		node.restore(state)
+
+		if len(children):
+			self.beginInsertRows(self.index_of(node), 0, len(children) - 1)
+			node.children = children
+			self.endInsertRows()
+		else:
+			node.children = children
+
+		if node.parent is not None:
+			node.parent.sync()
+
+		self.mark_dirty(node)
+		self.node_changed(node)
+
+	# - Undo and redo ---------------------
+	def record(self, label, record, size=None):
+		if self.__replaying:
+			return
+
+		if size is None:
+			self.history.record(label, record)
+		else:
+			self.history.record(label, record, size)
+
+		self.history_changed.emit()
+
+	def begin_group(self, label):
+		self.history.begin_group(label)
+
+	def end_group(self):
+		self.history.end_group()
+		self.history_changed.emit()
+
+	@contextmanager
+	def history_group(self, label):
+		'''Record everything done within as a single undo step'''
+		self.begin_group(label)
+
+		try:
+			yield
+		finally:
+			self.end_group()
+
+	@staticmethod
+	def __anchors(record, undo):
+		'''Nodes a record acts on that must still be in the tree to replay it'''
+		kind = record[0]
+
+		if kind == 'insert':
+			return [record[1]] + ([node for row, node in record[2]] if undo else [])
+
+		elif kind == 'remove':
+			return [record[1]] + ([] if undo else [node for row, node in record[2]])
+
+		elif kind == 'move':
+			return [record[1], record[2], record[4]]
+
+		return [record[1]]
+
+	def __replay(self, step, undo):
+		if not all(self.attached(node) for record in step.records for node in self.__anchors(record, undo)):
+			self.history.clear()
+			self.history_changed.emit()
+			self.error_raised.emit('History cleared, the edited nodes were reloaded')
+			return False
+
+		self.__replaying = True
+
+		try:
+			for record in (reversed(step.records) if undo else step.records):
+				kind = record[0]
+
+				if kind == 'insert':
+					parent, pairs = record[1:]
+
+					if undo:
+						self.remove_nodes([node for row, node in pairs])
+					else:
+						self.insert_pairs(parent, pairs)
+
+				elif kind == 'remove':
+					parent, pairs = record[1:]
+
+					if undo:
+						self.insert_pairs(parent, pairs)
+					else:
+						self.remove_nodes([node for row, node in pairs])
+
+				elif kind == 'move':
+					node, old_parent, old_row, new_parent, new_row = record[1:]
+
+					if undo:
+						self.__place(node, old_parent, old_row)
+					else:
+						self.__place(node, new_parent, new_row)
+
+				elif kind == 'text':
+					node, col, old_text, new_text = record[1:]
+					node.set_text(col, old_text if undo else new_text)
+					self.mark_dirty(node)
+					self.node_changed(node)
+
+				elif kind == 'state':
+					node, before, after = record[1:]
+					self.__restore(node, before if undo else after)
+
+		finally:
+			self.__replaying = False
+
+		self.history_changed.emit()
+		return True
+
+	def undo(self):
+		step = self.history.take_undo()
+		return step is not None and self.__replay(step, True)
+
+	def redo(self):
+		step = self.history.take_redo()
+		return step is not None and self.__replay(step, False)
+
+	def export(self):
+		return [(child.key, child.export()) for child in self.root.children]
+
+	def memory_estimate(self):
+		'''Approximate bytes held by the document: built nodes, raw data of
+		unbuilt branches counted item by item, and the undo history.
+		'''
+		count, stack = 0, list(self.root.children)
+
+		while len(stack):
+			node = stack.pop()
+			count += 1 + node.raw_size()
+
+			if node.fetched:
+				stack.extend(node.children)
+
+		return count * cfg_history_node_size + self.history.size
+
+class plist_model(tree_model):
+	'''Item model over one or many (file_name, plist_data[, file_path]) entries'''
+	def __init__(self, data, headers, styles=None):
+		if isinstance(data, tuple):
+			data = [data]
+
+		self.glif_cache = glif_cache(on_evict=self.unload_later, is_pinned=self.is_dirty)
+		root = tree_node()
+		root.children = [self.new_file_node(*entry) for entry in data]
+
+		for child in root.children:
+			child.parent = root
+
+		super(plist_model, self).__init__(root, headers, styles)
+
+	def new_file_node(self, file_name, file_data, file_path=None):
+		if file_path is not None and os.path.basename(file_path) == cfg_glif_index:
+			return glif_layer_node(file_name, file_data, file_path, self.glif_cache)
+
+		new_node = plist_node(file_name, file_data)
+		new_node.path = file_path
+		return new_node
+
+class xml_model(tree_model):
+	'''Item model over a parsed ET.ElementTree'''
+	def __init__(self, data, headers, styles=None, file_path=None):
+		root = tree_node()
+
+		if data is not None:
+			root.children = [xml_node(data.getroot(), root)]
+			root.children[0].path = file_path
+
+		super(xml_model, self).__init__(root, headers, styles)
+
+	def link_of(self, node):
+		'''Absolute UFO path of a designspace source or instance filename attribute'''
+		if not isinstance(node, xml_attrib_node) or not isinstance(node.parent, xml_node):
+			return None
+
+		if cfg_link_attributes.get(node.parent.element.tag) != node.key or not len(node.value):
+			return None
+
+		source = self.source_of(node)
+
+		if source is None or source.path is None:
+			return None
+
+		return os.path.normpath(os.path.join(os.path.dirname(source.path), node.value))
+
+	def links(self, tag=None):
+		'''UFO paths referenced by the document in order, sources first. Read from the XML, nothing is built'''
+		paths = []
+
+		for source in self.root.children:
+			if source.path is None:
+				continue
+
+			folder = os.path.dirname(source.path)
+
+			for link_tag, attribute in cfg_link_attributes.items():
+				if tag is not None and link_tag != tag:
+					continue
+
+				for element in source.element.iter(link_tag):
+					if len(element.get(attribute, '')):
+						path = os.path.normpath(os.path.join(folder, element.get(attribute)))
+
+						if path not in paths:
+							paths.append(path)
+
+		return paths
+
+class metrics_model(QtCore.QAbstractTableModel):
+	'''Read only table over a metrics_table: the rows the filter leaves, in sort order'''
+	def __init__(self, table, headers, styles=None):
+		super(metrics_model, self).__init__()
+		self.table = table
+		self.headers = headers
+		self.styles = styles if styles is not None else {}
+		self.sort_column, self.descending = 0, False
+		self.filter_text, self.outliers_only = '', False
+		self.rows = table.select()
+		self.outliers = table.outlier_mask()
+
+	def set_table(self, table):
+		self.table = table
+		self.refresh()
+
+	def set_filter(self, text, outliers_only=False):
+		self.filter_text, self.outliers_only = text, outliers_only
+		self.refresh()
+
+	def refresh(self):
+		'''Filter and sort again, after rows were filled or changed'''
+		self.beginResetModel()
+		self.outliers = self.table.outlier_mask()
+		rows = self.table.select(self.filter_text, self.outliers_only)
+		self.rows = self.table.order(rows, cfg_metric_columns[self.sort_column], self.descending)
+		self.endResetModel()
+
+	def table_row(self, index):
+		return int(self.rows[index.row()])
+
+	# - Qt model --------------------------
+	def rowCount(self, parent=QtCore.QModelIndex()):
+		return 0 if parent.isValid() else len(self.rows)
+
+	def columnCount(self, parent=QtCore.QModelIndex()):
+		return len(cfg_metric_columns)
+
+	def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+		if orientation == QtCore.Qt.Horizontal and role == QtCore.Qt.DisplayRole:
+			return self.headers[section]
+
+		return None
+
+	def sort(self, column, order=QtCore.Qt.AscendingOrder):
+		self.sort_column, self.descending = column, order == QtCore.Qt.DescendingOrder
+		self.refresh()
+
+	def data(self, index, role=QtCore.Qt.DisplayRole):
+		if not index.isValid():
+			return None
+
+		row, column = self.table_row(index), cfg_metric_columns[index.column()]
+
+		if role == QtCore.Qt.DisplayRole:
+			value = self.table.cell(row, column)
+
+			if value is None:
+				return ''
+
+			if column == 'unicode':
+				return unicode_text(value)
+
+			if column == 'advance':
+				return '{:g}'.format(value)
+
+			if column == 'anchors':
+				return ', '.join(value)
+
+			return str(value)
+
+		if role == QtCore.Qt.TextAlignmentRole and column not in ('name', 'anchors'):
+			return int(QtCore.Qt.AlignRight | QtCore.Qt.AlignVCenter)
+
+		if role == QtCore.Qt.BackgroundRole and self.outliers[row]:
+			return self.styles.get('brush_outlier')
+
+		return None
@@ -4,18 +4,112 @@
 # ------------------------------------------------------------
 # https://github.com/kateliev
 
+import re
+import ast
+import base64
+import weakref
+import datetime
 from collections import defaultdict
 
-__version__ = 1.53
+__version__ = 1.63
 
 # - Objects -------------------------------------------------
+class value_converter(object):
+	'''Registry of text parsers and formatters keyed by type name (the Type column).
+	Parsers raise ValueError on bad input instead of guessing.
+	'''
+	def __init__(self):
+		self.__parsers = {}
+		self.__formatters = {}
+		self.__aliases = {}
+
+	def register(self, type_names, parser, formatter=str):
+		'''Register parser(text) and formatter(value) for type names. The first name is the canonical one'''
+		type_names = [type_names] if isinstance(type_names, str) else list(type_names)
+		self.__parsers[type_names[0]] = parser
+		self.__formatters[type_names[0]] = formatter
+
+		for type_name in type_names:
+			self.__aliases[type_name] = type_names[0]
+
+	def __contains__(self, type_name):
+		return type_name in self.__aliases
+
+	@property
+	def types(self):
+		return list(self.__parsers.keys())
+
+	def parse(self, text, type_name):
+		try:
+			parser = self.__parsers[self.__aliases[type_name]]
+		except KeyError:
+			raise ValueError('Unknown type: {}'.format(type_name))
+
+		try:
+			return parser(text)
+		except (ValueError, TypeError, SyntaxError, MemoryError, RecursionError):
+			raise ValueError('Cannot convert "{}" to {}'.format(text, type_name))
+
+	def format(self, value):
+		formatter = self.__formatters.get(type(value).__name__, str)
+		return formatter(value)
+
+# -- Plist value parsers
+_re_int = re.compile(r'^\s*[+-]?\d+\s*$')
+_bool_values = {'true':True, 'yes':True, '1':True, 'false':False, 'no':False, '0':False}
+_date_format = '%Y-%m-%dT%H:%M:%SZ'
+
+def _parse_int(text):
+	if _re_int.match(text) is None:
+		raise ValueError(text)
+	return int(text)
+
+def _parse_bool(text):
+	key = text.strip().lower()
+
+	if key not in _bool_values:
+		raise ValueError(text)
+
+	return _bool_values[key]
+
+def _parse_date(text):
+	text = text.strip()
+
+	try:
+		return datetime.datetime.strptime(text, _date_format)
+	except ValueError:
+		return datetime.datetime.fromisoformat(text)
+
+def _parse_container(container_type):
+	def parser(text):
+		if not len(text.strip()):
+			return container_type()
+
+		value = ast.literal_eval(text)
+
+		if not isinstance(value, container_type):
+			raise ValueError(text)
+
+		return value
+	return parser
+
+plist_converter = value_converter()
+plist_converter.register(('str', 'string'), str)
+plist_converter.register(('int', 'integer'), _parse_int)
+plist_converter.register(('float', 'real'), float)
+plist_converter.register('bool', _parse_bool)
+plist_converter.register(('bytes', 'data'), lambda text: base64.b64decode(text.encode('ascii'), validate=True), lambda value: base64.b64encode(value).decode('ascii'))
+plist_converter.register(('datetime', 'date'), _parse_date, lambda value: value.strftime(_date_format))
+plist_converter.register('list', _parse_container(list))
+plist_converter.register('dict', _parse_container(dict))
+
 class data_collector(object):
 	'''Table parser that turns string values into actual datatypes'''
 
 	def __init__(self, var_name, var_value=None, export_type=None):
 		self.name = var_name
 		self.value = var_value
-		self.__export_type = export_type if not isinstance(export_type, str) else (eval(export_type))
+		self.__export_type = export_type.__name__ if isinstance(export_type, type) else export_type
 		self.__data = []
 
 	def __smart_return(self, value):
@@ -29,17 +123,20 @@ class data_collector(object):
 		self.__data.append(data)
 
 	def export(self, evaluate=False):
-		'''Overly complicated string evaluator'''
+		'''Build the value: containers from collected data, anything else by parsing the
+		text value with the converter of its type. Values without a type are returned as they are.
+		Raises ValueError on text that does not parse. (evaluate is kept for compatibility)
+		'''
 		if len(self.__data) and self.__export_type is not None:
-			return self.__smart_return(self.__export_type(self.__data))
-		else:
-			if self.__export_type is None or evaluate:
-				try:
-					return self.__smart_return(eval(self.value))
-				except (NameError, SyntaxError):
-					return self.__smart_return(self.value)
-			else:
-				return self.__smart_return(self.__export_type(self.value))
+			if self.__export_type == 'dict':
+				return self.__smart_return(dict(self.__data))
+
+			return self.__smart_return(list(self.__data))
+		
+		if self.__export_type is None or not isinstance(self.value, str):
+			return self.__smart_return(self.value)
+
+		return self.__smart_return(plist_converter.parse(self.value, self.__export_type))
 
 class dictextractor:
 	'''A collection of dicionary value extractors'''
@@ -173,11 +270,208 @@ class dictextractor:
 			
 		return any(list(contains_helper(obj, search)))
 
+class dictindex(object):
+	'''Inverted key/value index over nested dict/list data. Built once,
+	it answers the dictextractor queries without rescanning the data.
+	
+	Keys (of dicts) and hashable values (of dicts) map to the paths where
+	they occur together with their parent container. Results come in the
+	order the data was indexed. Use update() to edit the data so that only
+	the touched branch is reindexed.
+	'''
+	def __init__(self, obj):
+		self.obj = obj
+		self.rebuild()
+
+	# - Internals -------------------------
+	@staticmethod
+	def walk(obj, base=()):
+		'''Pre-order walk yielding (path, parent, key, value) for every item below obj'''
+		if not isinstance(obj, (dict, list)):
+			return
+
+		stack = [(obj, base, iter(obj.items() if isinstance(obj, dict) else enumerate(obj)))]
+
+		while len(stack):
+			parent, path, items = stack[-1]
+
+			for key, value in items:
+				sub_path = path + (key,)
+				yield sub_path, parent, key, value
+
+				if isinstance(value, (dict, list)):
+					stack.append((value, sub_path, iter(value.items() if isinstance(value, dict) else enumerate(value))))
+					break
+			else:
+				stack.pop()
+
+	@staticmethod
+	def __hashable(value):
+		try:
+			hash(value)
+			return True
+		except TypeError:
+			return False
+
+	def __add_entry(self, path, parent, key, value):
+		if isinstance(parent, dict):
+			self.__keys[key][path] = parent
+
+			if self.__hashable(value):
+				self.__values[value][path] = parent
+
+	def __remove_entry(self, path, parent, key, value):
+		if isinstance(parent, dict):
+			self.__discard(self.__keys, key, path)
+
+			if self.__hashable(value):
+				self.__discard(self.__values, value, path)
+
+	def __add(self, obj, base=()):
+		for entry in self.walk(obj, base):
+			self.__add_entry(*entry)
+
+	def __remove(self, obj, base=()):
+		for entry in self.walk(obj, base):
+			self.__remove_entry(*entry)
+
+	@staticmethod
+	def __discard(table, entry, path):
+		paths = table.get(entry)
+
+		if paths is not None:
+			paths.pop(path, None)
+
+			if not len(paths):
+				del table[entry]
+
+	def __shadowed(self, path, search, search_type=None):
+		'''Is there an ancestor with key search (and value of search_type) along path.
+		The recursive extractors do not descend into such values.
+		'''
+		current = self.obj
+
+		for key in path[:-1]:
+			if isinstance(current, dict) and key == search and (search_type is None or isinstance(current[key], search_type)):
+				return True
+
+			current = current[key]
+
+		return False
+
+	# - Maintenance -----------------------
+	def rebuild(self):
+		self.__keys = defaultdict(dict)
+		self.__values = defaultdict(dict)
+		self.__add(self.obj)
+
+	def resolve(self, path):
+		'''Item of the indexed data at path'''
+		current = self.obj
+
+		for key in path:
+			current = current[key]
+
+		return current
+
+	def update(self, path, value=None, remove=False):
+		'''Set the item at path to value (or remove it) and reindex only that branch'''
+		path = tuple(path)
+		parent = self.resolve(path[:-1])
+		key = path[-1]
+
+		if isinstance(parent, list) and (remove or key >= len(parent)):
+			# - Removing or appending list items renumbers the siblings, reindex the list
+			self.__remove(parent, path[:-1])
+
+			if remove:
+				del parent[key]
+			else:
+				parent.append(value)
+
+			self.__add(parent, path[:-1])
+			return
+
+		if isinstance(parent, list) or key in parent:
+			self.__remove_entry(path, parent, key, parent[key])
+			self.__remove(parent[key], path)
+
+		if remove:
+			del parent[key]
+			return
+
+		parent[key] = value
+		self.__add_entry(path, parent, key, value)
+		self.__add(value, path)
+
+	# - Queries ---------------------------
+	def paths(self, search):
+		'''All paths of dict items with key search'''
+		return list(self.__keys.get(search, {}).keys())
+
+	def value_paths(self, search_value):
+		'''All paths of dict items with value search_value'''
+		return list(self.__values.get(search_value, {}).keys())
+
+	def extract(self, search):
+		'''Pull all values of specified key (search)'''
+		for path, parent in list(self.__keys.get(search, {}).items()):
+			if not self.__shadowed(path, search):
+				yield parent[search]
+
+	def find(self, search, search_type=None):
+		'''Pull all objects that contain keys of specified search.'''
+		for path, parent in list(self.__keys.get(search, {}).items()):
+			if (search_type is None or isinstance(parent[search], search_type)) and not self.__shadowed(path, search, search_type):
+				yield parent
+
+	def where(self, search_value, search_key=None):
+		'''Pull all objects that contain values of specified search.'''
+		if not self.__hashable(search_value):
+			for result in dictextractor.where(self.obj, search_value, search_key):
+				yield result
+			return
+
+		for path, parent in list(self.__values.get(search_value, {}).items()):
+			if search_key is None or path[-1] == search_key:
+				yield parent
+
+	def contains(self, search, search_type=None):
+		'''Does the object contain ANY value or nested object with given name (search)'''
+		for key, paths in self.__keys.items():
+			if isinstance(key, str) and search in key:
+				if search_type is None:
+					return True
+
+				if any(isinstance(parent[key], search_type) for parent in paths.values()):
+					return True
+
+		return False
+
 class attribdict(defaultdict):
-	'''	Default dictionary where keys can be accessed as attributes	'''
+	'''	Default dictionary where keys can be accessed as attributes.
+
+	Hashing is Merkle style: every attribdict caches one hash term per key
+	and a running sum of them. A mutation marks the key stale here and in
+	all attribdict parents up to the root, so rehashing after an edit only
+	recomputes the stale path. Keys holding plain lists, dicts or sets can
+	change unseen, so they are hashed again every time. An attribdict hashes
+	as a plain dict with the same items would.
+	'''
+	__index = None
+	__parents = None
+	__terms = None
+	__stale = None
+	__volatile = None
+	__hash_sum = 0
+	__hash_mask = (1 << 64) - 1
+
 	def __init__(self, *args, **kwdargs):
 		super(attribdict, self).__init__(attribdict, *args, **kwdargs)
 
+		for key, value in dict.items(self):
+			self.__link(key, value)
+
 	def __getattribute__(self, name):
 		try:
 			return object.__getattribute__(self, name)
@@ -203,24 +497,179 @@ class attribdict(defaultdict):
 	def __repr__(self):
 		return '<%s: %s>' %(self.__class__.__name__, len(self.keys()))
 
-	def __hash__(self):
-		import copy
-		
-		def hash_helper(obj):
-			if isinstance(obj, (set, tuple, list)):
-				return tuple([hash_helper(element) for element in obj])    
+	# - Mutation tracking -----------------
+	def __link(self, key, value):
+		'''Register self as parent of attribdicts held under key'''
+		if isinstance(value, attribdict):
+			if value.__parents is None:
+				value.__parents = []
+
+			value.__parents.append((weakref.ref(self), key))
+
+		elif isinstance(value, (list, tuple)):
+			for item in value:
+				self.__link(key, item)
+
+	def __unlink(self, key, value):
+		if isinstance(value, attribdict):
+			if value.__parents is not None:
+				value.__parents = [(parent, parent_key) for parent, parent_key in value.__parents if parent() is not self or parent_key != key]
 
-			elif not isinstance(obj, dict):
-				return hash(obj)
+		elif isinstance(value, (list, tuple)):
+			for item in value:
+				self.__unlink(key, item)
 
-			new_obj = {}
+	def invalidate(self, key=None):
+		'''Mark key (or every key) stale here and along all parent chains'''
+		if self.__terms is None:
+			pass
 
-			for key, value in obj.items():
-				new_obj[key] = hash_helper(value)
+		elif key is None:
+			self.__stale.update(self.__terms.keys())
+			self.__stale.update(dict.keys(self))
 
-			return hash(tuple(frozenset(sorted(new_obj.items()))))
+		elif key in self.__stale:
+			return
 
-		return hash_helper(self)
+		else:
+			self.__stale.add(key)
+
+		if self.__parents is not None:
+			for parent, parent_key in self.__parents:
+				parent = parent()
+
+				if parent is not None:
+					parent.invalidate(parent_key)
+
+	def __setitem__(self, key, value):
+		if dict.__contains__(self, key):
+			self.__unlink(key, dict.__getitem__(self, key))
+
+		dict.__setitem__(self, key, value)
+		self.__link(key, value)
+		self.invalidate(key)
+
+	def __delitem__(self, key):
+		value = dict.__getitem__(self, key)
+		dict.__delitem__(self, key)
+		self.__unlink(key, value)
+		self.invalidate(key)
+
+	def pop(self, key, *default):
+		if not dict.__contains__(self, key):
+			return dict.pop(self, key, *default)
+
+		value = dict.__getitem__(self, key)
+		del self[key]
+		return value
+
+	def popitem(self):
+		key, value = dict.popitem(self)
+		self.__unlink(key, value)
+		self.invalidate(key)
+		return key, value
+
+	def setdefault(self, key, default=None):
+		if not dict.__contains__(self, key):
+			self[key] = default
+
+		return dict.__getitem__(self, key)
+
+	def update(self, *args, **kwdargs):
+		for key, value in dict(*args, **kwdargs).items():
+			self[key] = value
+
+	def __ior__(self, other):
+		self.update(other)
+		return self
+
+	def clear(self):
+		for key in list(dict.keys(self)):
+			del self[key]
+
+	# - Hashing ---------------------------
+	@staticmethod
+	def value_hash(obj):
+		'''Hash of any nested value, attribdicts use their cached subtree hash'''
+		if isinstance(obj, attribdict):
+			return obj.subtree_hash()
+
+		elif isinstance(obj, (set, tuple, list)):
+			return hash(tuple([attribdict.value_hash(element) for element in obj]))
+
+		elif isinstance(obj, dict):
+			return attribdict.items_hash([hash((key, attribdict.value_hash(value))) for key, value in obj.items()])
+
+		return hash(obj)
+
+	@staticmethod
+	def items_hash(terms, hash_sum=None):
+		'''Hash of a dict from the hash terms of its items, order does not matter'''
+		if hash_sum is None:
+			hash_sum = sum(terms) & attribdict.__hash_mask
+
+		return hash((len(terms), hash_sum))
+
+	@staticmethod
+	def is_settled(obj):
+		'''Can the hash of a value change only through attribdict mutations'''
+		if isinstance(obj, attribdict):
+			obj.subtree_hash()
+			return not len(obj.__volatile)
+
+		elif isinstance(obj, (set, list, dict)):
+			return False
+
+		elif isinstance(obj, tuple):
+			return all(attribdict.is_settled(element) for element in obj)
+
+		return True
+
+	def subtree_hash(self):
+		'''Hash of this subtree, recomputing only the keys that changed since last time'''
+		if self.__terms is None:
+			self.__terms = {}
+			self.__stale = set(dict.keys(self))
+			self.__volatile = set()
+
+		if len(self.__stale) or len(self.__volatile):
+			terms, hash_sum = self.__terms, self.__hash_sum
+
+			for key in self.__stale | self.__volatile:
+				old_term = terms.pop(key, None)
+				self.__volatile.discard(key)
+
+				if old_term is not None:
+					hash_sum -= old_term
+
+				if dict.__contains__(self, key):
+					value = dict.__getitem__(self, key)
+					term = hash((key, self.value_hash(value)))
+					terms[key] = term
+					hash_sum += term
+
+					if not self.is_settled(value):
+						self.__volatile.add(key)
+
+			self.__hash_sum = hash_sum & self.__hash_mask
+			self.__stale.clear()
+
+		return self.items_hash(self.__terms, self.__hash_sum)
+
+	def item_hash(self, key):
+		'''Cached hash term of a single key'''
+		self.subtree_hash()
+		return self.__terms[key]
+
+	def same_as(self, other):
+		'''Fast equality: differing subtree hashes settle it without comparing the data'''
+		if isinstance(other, attribdict) and self.subtree_hash() != other.subtree_hash():
+			return False
+
+		return self == other
+
+	def __hash__(self):
+		return self.subtree_hash()
 
 	def dir(self):
 		tree_map = ['   .%s\t%s' %(key, type(value)) for key, value in self.items()]
@@ -232,6 +681,20 @@ class attribdict(defaultdict):
 	def lock(self):
 		self.default_factory = None
 
+	def attach_index(self, index=None):
+		'''Attach a dictindex (built over self if not given) to answer the queries below.
+		Edit through index.update() afterwards to keep it current.
+		'''
+		self.__index = index if index is not None else dictindex(self)
+		return self.__index
+
+	def detach_index(self):
+		self.__index = None
+
+	@property
+	def index(self):
+		return self.__index
+
 	def extract(self, search):
 		'''Pull all values of specified key (search)
 		
@@ -241,6 +704,9 @@ class attribdict(defaultdict):
 		Returns:
 			generator
 		'''
+		if self.__index is not None:
+			return self.__index.extract(search)
+
 		return dictextractor.extract(self, search)
 				
 	def find(self, search, search_type=None):
@@ -252,6 +718,9 @@ class attribdict(defaultdict):
 		Returns:
 			generator
 		'''
+		if self.__index is not None:
+			return self.__index.find(search, search_type)
+
 		return dictextractor.find(self, search, search_type)
 
 	def where(self, search_value, search_key=None):
@@ -263,6 +732,9 @@ class attribdict(defaultdict):
 		Returns:
 			generator
 		'''
+		if self.__index is not None:
+			return self.__index.where(search_value, search_key)
+
 		return dictextractor.where(self, search_value, search_key)
 
 	def contains(self, search, search_type=None):
@@ -275,6 +747,9 @@ class attribdict(defaultdict):
 		Returns:
 			Bool
 		'''
+		if self.__index is not None:
+			return self.__index.contains(search, search_type)
+
 		return dictextractor.contains(self, search, search_type)
 
 if __name__ == "__main__":
@@ -0,0 +1,317 @@
+# MODULE: ufoRig / lib / parsers
+# -----------------------------------------------------------
+# (C) Vassil Kateliev, 2021 		(http://www.kateliev.com)
+# ------------------------------------------------------------
+# https://github.com/kateliev
+
+__version__ = 1.0
+
+# - Dependencies --------------------------------------------
+import io
+import os
+import re
+import time
+import binascii
+import datetime
+import plistlib
+import xml.etree.ElementTree as ET
+
+from .func import xml_write
+
+# - Config ----------------------------
+cfg_parser_env = 'UFORIG_PARSER'					# Backend name, or auto for the fastest one installed
+cfg_parser_default = 'stdlib'
+cfg_parser_preference = ('lxml', 'etree', 'stdlib')	# Fastest first, auto takes the first available
+cfg_plist_date = re.compile(r'(?P<year>\d\d\d\d)(?:-(?P<month>\d\d)(?:-(?P<day>\d\d)(?:T(?P<hour>\d\d)(?::(?P<minute>\d\d)(?::(?P<second>\d\d))?)?)?)?)?Z', re.ASCII)
+cfg_plist_headers = (b'<?xml', b'<plist')			# XML plists as plistlib detects them, anything else is left to it
+
+# - Init ------------------------------
+_backend = None
+
+# - Functions -----------------------------------------------
+# NOTE: Nothing here may depend on Qt, backends are used in worker processes
+def plist_date(text):
+	'''Date of a plist <date>, as plistlib reads it'''
+	parts = []
+
+	for value in cfg_plist_date.match(text).groups():
+		if value is None:
+			break
+		parts.append(int(value))
+
+	return datetime.datetime(*parts)
+
+def plist_integer(text):
+	return int(text, 16) if text.startswith(('0x', '0X')) else int(text)
+
+plist_leaf_readers = {	'string':lambda text: text,
+						'integer':plist_integer,
+						'real':float,
+						'true':lambda text: True,
+						'false':lambda text: False,
+						'date':plist_date,
+						'data':lambda text: binascii.a2b_base64(text.encode('utf-8')) }
+
+def plist_is_plain(raw):
+	'''XML plist without entity declarations, the fast readers take only these'''
+	return raw.startswith(cfg_plist_headers) and b'<!ENTITY' not in raw
+
+def plist_value(element):
+	'''Plist data of a parsed <plist> value element, ElementTree or lxml'''
+	tag = element.tag
+
+	if tag == 'dict':
+		children = list(element)
+
+		if len(children) % 2 or any(key.tag != 'key' for key in children[::2]):
+			raise ValueError('Malformed dict')
+
+		return dict((key.text or '', plist_value(value)) for key, value in zip(children[::2], children[1::2]))
+
+	if tag == 'array':
+		return [plist_value(child) for child in element]
+
+	if len(element):
+		raise ValueError('Unexpected children in <{}>'.format(tag))
+
+	return plist_leaf_readers[tag](element.text or '')
+
+def get_backend():
+	'''Backend of this process, chosen by the UFORIG_PARSER environment variable'''
+	global _backend
+
+	if _backend is None:
+		try:
+			_backend = find_backend(os.environ.get(cfg_parser_env, cfg_parser_default))
+		except ValueError:
+			_backend = cfg_backends[cfg_parser_default]
+
+	return _backend
+
+def find_backend(name):
+	'''Available backend by name, auto for the fastest available'''
+	if name == 'auto':
+		return next(cfg_backends[name] for name in cfg_parser_preference if cfg_backends[name].available())
+
+	if name not in cfg_backends or not cfg_backends[name].available():
+		raise ValueError('Parser backend not available: {}'.format(name))
+
+	return cfg_backends[name]
+
+def set_backend(name):
+	'''Use a backend from now on, here and in worker processes started later'''
+	global _backend
+
+	_backend = find_backend(name)
+	os.environ[cfg_parser_env] = name
+	return _backend
+
+def self_test(file_paths):
+	'''Read the files with every backend and compare with the stdlib.
+	Returns a result dict per backend: available, identical, mismatching files and timings.
+	'''
+	reference = cfg_backends[cfg_parser_default]
+	samples = []
+
+	for file_path in map(str, file_paths):
+		with open(file_path, 'rb') as sample_file:
+			raw = sample_file.read()
+
+		kind = 'plist' if file_path.endswith('.plist') else 'xml'
+		samples.append((file_path, kind, raw))
+
+	expected = [sample_digest(reference, kind, sample_read(reference, kind, raw)) for file_path, kind, raw in samples]
+	results = []
+
+	for name, backend in cfg_backends.items():
+		result = {'backend':name, 'available':backend.available()}
+		results.append(result)
+
+		if not result['available']:
+			continue
+
+		timings, mismatches = {'plist':0., 'xml':0.}, []
+
+		for (file_path, kind, raw), digest in zip(samples, expected):
+			start = time.perf_counter()
+			data = sample_read(backend, kind, raw)
+			timings[kind] += time.perf_counter() - start
+			found = sample_digest(backend, kind, data)
+
+			if found != digest:
+				mismatches.append(file_path)
+
+		result.update(identical=not len(mismatches), mismatches=mismatches, plist_ms=timings['plist'] * 1000, xml_ms=timings['xml'] * 1000)
+
+	return results
+
+def sample_read(backend, kind, raw):
+	try:
+		return backend.plist_loads(raw) if kind == 'plist' else backend.xml_parse(raw).getroot()
+	except Exception as error:
+		return error
+
+def sample_digest(backend, kind, data):
+	'''Data read by a backend and written back, comparable across backends. Failures must match too'''
+	if isinstance(data, Exception):
+		return 'Failed: {}: {}'.format(type(data).__name__, data)
+
+	written = io.BytesIO()
+
+	if kind == 'plist':
+		backend.plist_dump(data, written)
+		return repr(data), written.getvalue()
+
+	backend.xml_dump(data, written, False)
+	return ET.tostring(data), written.getvalue()
+
+# - Objects -------------------------------------------------
+class parser_backend(object):
+	'''Reads and writes the plist and XML files of a document: the
+	standard library. Other backends override what they do faster and
+	must give the same data, self_test() checks that.
+	'''
+	name = 'stdlib'
+
+	def available(self):
+		return True
+
+	def plist_loads(self, raw):
+		return plistlib.loads(raw)
+
+	def xml_parse(self, raw):
+		parser = ET.XMLParser()
+		parser.feed(raw)
+		return ET.ElementTree(parser.close())
+
+	def plist_dump(self, data, plist_file):
+		plistlib.dump(data, plist_file)
+
+	def xml_dump(self, root, xml_file, wrapped=True):
+		xml_write(xml_file, root, wrapped)
+
+class etree_backend(parser_backend):
+	'''Plists parsed into a tree by the C ElementTree parser, then read in
+	one pass, noticeably faster than plistlib on big kerning and glyph lists.
+	Anything it is unsure of is left to plistlib, errors included.
+	'''
+	name = 'etree'
+
+	def plist_loads(self, raw):
+		if not plist_is_plain(raw):
+			return plistlib.loads(raw)
+
+		try:
+			root = self.plist_root(raw)
+
+			if root.tag == 'plist':
+				if len(root) != 1:
+					raise ValueError('Expected one value in <plist>')
+				root = root[0]
+
+			return plist_value(root)
+
+		except (ValueError, KeyError, RecursionError, ET.ParseError):
+			return plistlib.loads(raw)
+
+	def plist_root(self, raw):
+		return ET.fromstring(raw)
+
+class iterparse_backend(parser_backend):
+	'''Plists read while they are parsed: every element is dropped once its
+	value is taken, so the XML tree of a big file is never held whole.
+	'''
+	name = 'iterparse'
+
+	def plist_loads(self, raw):
+		if not plist_is_plain(raw):
+			return plistlib.loads(raw)
+
+		try:
+			return self.__stream(raw)
+		except (ValueError, KeyError, IndexError, ET.ParseError):
+			return plistlib.loads(raw)
+
+	@staticmethod
+	def __stream(raw):
+		stack, keys, values = [], [], []
+
+		for event, element in ET.iterparse(io.BytesIO(raw), events=('start', 'end')):
+			tag = element.tag
+
+			if event == 'start':
+				if tag in ('dict', 'array'):
+					stack.append({} if tag == 'dict' else [])
+					keys.append(None)
+				continue
+
+			if tag == 'plist':
+				continue
+
+			if tag == 'key':
+				if not len(stack) or keys[-1] is not None or not isinstance(stack[-1], dict):
+					raise ValueError('Unexpected key')
+
+				keys[-1] = element.text or ''
+				element.clear()
+				continue
+
+			if tag in ('dict', 'array'):
+				value = stack.pop()
+
+				if keys.pop() is not None:
+					raise ValueError('Key without value')
+			else:
+				if len(element):
+					raise ValueError('Unexpected children in <{}>'.format(tag))
+
+				value = plist_leaf_readers[tag](element.text or '')
+
+			element.clear()
+
+			if not len(stack):
+				values.append(value)
+
+			elif isinstance(stack[-1], dict):
+				if keys[-1] is None:
+					raise ValueError('Value without key')
+
+				stack[-1][keys[-1]] = value
+				keys[-1] = None
+
+			else:
+				stack[-1].append(value)
+
+		if len(values) != 1:
+			raise ValueError('Expected one value in <plist>')
+
+		return values[0]
+
+class lxml_backend(etree_backend):
+	'''Plists parsed by lxml, read like the etree backend. XML documents
+	stay with ElementTree, the editor works on its elements.
+	'''
+	name = 'lxml'
+
+	def __init__(self):
+		self.__parser = None
+
+	def available(self):
+		try:
+			import lxml.etree
+			return True
+		except ImportError:
+			return False
+
+	def plist_root(self, raw):
+		from lxml import etree
+
+		if self.__parser is None:
+			self.__parser = etree.XMLParser(remove_comments=True, remove_pis=True, resolve_entities=False, huge_tree=True)
+
+		try:
+			return etree.fromstring(raw, self.__parser)
+		except etree.XMLSyntaxError as error:
+			raise ValueError(str(error))
+
+cfg_backends = dict((backend.name, backend) for backend in (parser_backend(), etree_backend(), iterparse_backend(), lxml_backend()))
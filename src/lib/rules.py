@@ -0,0 +1,486 @@
+# MODULE: ufoRig / lib / rules
+# -----------------------------------------------------------
+# (C) Vassil Kateliev, 2021 		(http://www.kateliev.com)
+# ------------------------------------------------------------
+# https://github.com/kateliev
+
+__version__ = 1.0
+
+# - Dependencies --------------------------------------------
+import os
+import re
+from collections import namedtuple
+
+from . import core
+from .diff import cfg_list_item, element_steps
+
+# - Config ----------------------------
+cfg_kern_prefixes = ('public.kern1.', 'public.kern2.')
+cfg_point_types = ('move', 'line', 'offcurve', 'curve', 'qcurve')
+cfg_glif_formats = ('1', '2')
+cfg_style_map_names = ('regular', 'italic', 'bold', 'bold italic')
+cfg_opentype_categories = ('unassigned', 'base', 'mark', 'ligature', 'component')
+cfg_date_format = re.compile(r'^\d{4}/\d{2}/\d{2} \d{2}:\d{2}:\d{2}$')
+cfg_hex_value = re.compile(r'^[0-9A-Fa-f]{4,6}$')
+
+# -- UFO 3 fontinfo.plist: key: (kind, constraint). Constraints: 'positive', (low, high), tuple of allowed values, or a maximum list length
+cfg_fontinfo_keys = {	'familyName':('str', None), 'styleName':('str', None), 'styleMapFamilyName':('str', None),
+						'styleMapStyleName':('str', cfg_style_map_names), 'versionMajor':('int', None), 'versionMinor':('int', 'positive'),
+						'year':('int', None), 'copyright':('str', None), 'trademark':('str', None), 'note':('str', None),
+						'unitsPerEm':('number', 'positive'), 'descender':('number', None), 'xHeight':('number', None),
+						'capHeight':('number', None), 'ascender':('number', None), 'italicAngle':('number', None),
+						'guidelines':('list_dict', None),
+						'openTypeHeadCreated':('date', None), 'openTypeHeadLowestRecPPEM':('int', 'positive'), 'openTypeHeadFlags':('list_int', None),
+						'openTypeHheaAscender':('int', None), 'openTypeHheaDescender':('int', None), 'openTypeHheaLineGap':('int', None),
+						'openTypeHheaCaretSlopeRise':('int', None), 'openTypeHheaCaretSlopeRun':('int', None), 'openTypeHheaCaretOffset':('int', None),
+						'openTypeNameDesigner':('str', None), 'openTypeNameDesignerURL':('str', None), 'openTypeNameManufacturer':('str', None),
+						'openTypeNameManufacturerURL':('str', None), 'openTypeNameLicense':('str', None), 'openTypeNameLicenseURL':('str', None),
+						'openTypeNameVersion':('str', None), 'openTypeNameUniqueID':('str', None), 'openTypeNameDescription':('str', None),
+						'openTypeNamePreferredFamilyName':('str', None), 'openTypeNamePreferredSubfamilyName':('str', None),
+						'openTypeNameCompatibleFullName':('str', None), 'openTypeNameSampleText':('str', None),
+						'openTypeNameWWSFamilyName':('str', None), 'openTypeNameWWSSubfamilyName':('str', None), 'openTypeNameRecords':('list_dict', None),
+						'openTypeOS2WidthClass':('int', (1, 9)), 'openTypeOS2WeightClass':('int', 'positive'), 'openTypeOS2Selection':('list_int', None),
+						'openTypeOS2VendorID':('str', None), 'openTypeOS2Panose':('list_int', 10), 'openTypeOS2FamilyClass':('list_int', 2),
+						'openTypeOS2UnicodeRanges':('list_int', None), 'openTypeOS2CodePageRanges':('list_int', None),
+						'openTypeOS2TypoAscender':('int', None), 'openTypeOS2TypoDescender':('int', None), 'openTypeOS2TypoLineGap':('int', None),
+						'openTypeOS2WinAscent':('int', 'positive'), 'openTypeOS2WinDescent':('int', 'positive'), 'openTypeOS2Type':('list_int', None),
+						'openTypeOS2SubscriptXSize':('int', None), 'openTypeOS2SubscriptYSize':('int', None), 'openTypeOS2SubscriptXOffset':('int', None),
+						'openTypeOS2SubscriptYOffset':('int', None), 'openTypeOS2SuperscriptXSize':('int', None), 'openTypeOS2SuperscriptYSize':('int', None),
+						'openTypeOS2SuperscriptXOffset':('int', None), 'openTypeOS2SuperscriptYOffset':('int', None),
+						'openTypeOS2StrikeoutSize':('int', None), 'openTypeOS2StrikeoutPosition':('int', None),
+						'openTypeVheaVertTypoAscender':('int', None), 'openTypeVheaVertTypoDescender':('int', None), 'openTypeVheaVertTypoLineGap':('int', None),
+						'openTypeVheaCaretSlopeRise':('int', None), 'openTypeVheaCaretSlopeRun':('int', None), 'openTypeVheaCaretOffset':('int', None),
+						'postscriptFontName':('str', None), 'postscriptFullName':('str', None), 'postscriptSlantAngle':('number', None),
+						'postscriptUniqueID':('int', None), 'postscriptUnderlineThickness':('number', None), 'postscriptUnderlinePosition':('number', None),
+						'postscriptIsFixedPitch':('bool', None), 'postscriptBlueValues':('list_number', 14), 'postscriptOtherBlues':('list_number', 10),
+						'postscriptFamilyBlues':('list_number', 14), 'postscriptFamilyOtherBlues':('list_number', 10),
+						'postscriptStemSnapH':('list_number', 12), 'postscriptStemSnapV':('list_number', 12),
+						'postscriptBlueFuzz':('number', None), 'postscriptBlueShift':('number', None), 'postscriptBlueScale':('number', None),
+						'postscriptForceBold':('bool', None), 'postscriptDefaultWidthX':('number', None), 'postscriptNominalWidthX':('number', None),
+						'postscriptWeightName':('str', None), 'postscriptDefaultCharacter':('str', None), 'postscriptWindowsCharacterSet':('int', (1, 20)),
+						'macintoshFONDFamilyID':('int', None), 'macintoshFONDName':('str', None),
+						'woffMajorVersion':('int', 'positive'), 'woffMinorVersion':('int', 'positive'),
+						'woffMetadataUniqueID':('dict', None), 'woffMetadataVendor':('dict', None), 'woffMetadataCredits':('dict', None),
+						'woffMetadataDescription':('dict', None), 'woffMetadataLicense':('dict', None), 'woffMetadataCopyright':('dict', None),
+						'woffMetadataTrademark':('dict', None), 'woffMetadataLicensee':('dict', None), 'woffMetadataExtensions':('list_dict', None) }
+
+cfg_blue_lists = ('postscriptBlueValues', 'postscriptOtherBlues', 'postscriptFamilyBlues', 'postscriptFamilyOtherBlues')
+
+# - Init ------------------------------
+# NOTE: unit is the file an issue belongs to, relative to the document folder. Re-validating a unit replaces its issues.
+# NOTE: path is a key path as trw_tree_explorer.key_path() makes them, None for files that are not in the tree.
+issue = namedtuple('issue', 'severity unit path message')
+
+# - Helpers -------------------------------------------------
+# NOTE: Nothing here may depend on Qt, rules run in worker processes
+def is_number(value):
+	return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def is_int(value):
+	return isinstance(value, int) and not isinstance(value, bool)
+
+def is_number_text(text):
+	try:
+		float(text)
+	except (TypeError, ValueError):
+		return False
+
+	return True
+
+def type_name(value):
+	return type(value).__name__
+
+def step(key):
+	return (key, 0)
+
+def item_step(index):
+	return (cfg_list_item, index)
+
+# - Rules: plists -------------------------------------------
+def check_fontinfo(unit, data, path):
+	found = []
+	error = lambda key, message, severity='error': found.append(issue(severity, unit, path + (step(key),), message))
+
+	if not isinstance(data, dict):
+		return [issue('error', unit, path, 'fontinfo.plist must be a dict, not {}'.format(type_name(data)))]
+
+	for key, value in data.items():
+		if key not in cfg_fontinfo_keys:
+			error(key, 'Not a UFO 3 fontinfo key', 'warning')
+			continue
+
+		kind, constraint = cfg_fontinfo_keys[key]
+		checks = {	'str':isinstance(value, str), 'int':is_int(value), 'number':is_number(value), 'bool':isinstance(value, bool),
+					'dict':isinstance(value, dict), 'date':isinstance(value, str) and cfg_date_format.match(value) is not None,
+					'list_int':isinstance(value, list) and all(map(is_int, value)),
+					'list_number':isinstance(value, list) and all(map(is_number, value)),
+					'list_dict':isinstance(value, list) and all(isinstance(item, dict) for item in value) }
+
+		if not checks[kind]:
+			expected = {'list_int':'list of integers', 'list_number':'list of numbers', 'list_dict':'list of dicts', 'date':'date as YYYY/MM/DD HH:MM:SS'}.get(kind, kind)
+			error(key, 'Expected {}, found {}'.format(expected, type_name(value)))
+
+		elif constraint == 'positive' and value < 0:
+			error(key, 'Must not be negative')
+
+		elif isinstance(constraint, tuple) and len(constraint) == 2 and is_number(constraint[0]) and not constraint[0] <= value <= constraint[1]:
+			error(key, 'Must be between {} and {}'.format(*constraint))
+
+		elif isinstance(constraint, tuple) and isinstance(constraint[0], str) and value not in constraint:
+			error(key, 'Must be one of: {}'.format(', '.join(constraint)))
+
+		elif is_int(constraint) and kind.startswith('list') and (len(value) > constraint if key.startswith('postscript') else len(value) != constraint):
+			error(key, '{} items, {} {}'.format(len(value), 'at most' if key.startswith('postscript') else 'expected', constraint))
+
+		elif key in cfg_blue_lists and len(value) % 2:
+			error(key, 'Blue zones come in pairs, found an odd count')
+
+	return found
+
+def check_metainfo(unit, data, path):
+	if not isinstance(data, dict):
+		return [issue('error', unit, path, 'metainfo.plist must be a dict')]
+
+	found = []
+
+	if not isinstance(data.get('creator', ''), str):
+		found.append(issue('error', unit, path + (step('creator'),), 'Expected str'))
+
+	if data.get('formatVersion') not in (1, 2, 3):
+		found.append(issue('error', unit, path + (step('formatVersion'),) if 'formatVersion' in data else path, 'formatVersion must be 1, 2 or 3'))
+
+	return found
+
+def check_layercontents(unit, data, path, folder):
+	if not isinstance(data, list):
+		return [issue('error', unit, path, 'layercontents.plist must be a list')]
+
+	found, names, folders = [], set(), set()
+
+	for index, layer in enumerate(data):
+		layer_path = path + (item_step(index),)
+
+		if not isinstance(layer, list) or len(layer) != 2 or not all(isinstance(item, str) for item in layer):
+			found.append(issue('error', unit, layer_path, 'A layer is a list of a name and a folder'))
+			continue
+
+		name, layer_folder = layer
+
+		if name in names:
+			found.append(issue('error', unit, layer_path, 'Duplicate layer name: {}'.format(name)))
+
+		if layer_folder in folders:
+			found.append(issue('error', unit, layer_path, 'Duplicate layer folder: {}'.format(layer_folder)))
+
+		if (name == 'public.default') != (layer_folder == 'glyphs'):
+			found.append(issue('error', unit, layer_path, 'The default layer is public.default in folder glyphs'))
+
+		if folder is not None and not os.path.isdir(os.path.join(folder, layer_folder)):
+			found.append(issue('error', unit, layer_path, 'Layer folder not found: {}'.format(layer_folder)))
+
+		names.add(name)
+		folders.add(layer_folder)
+
+	return found
+
+def check_contents(unit, data, path, folder):
+	'''Glyph layer: names to file names, against the files in the layer folder'''
+	if not isinstance(data, dict):
+		return [issue('error', unit, path, 'contents.plist must be a dict')]
+
+	found, file_names = [], {}
+
+	try:
+		on_disk = set(name for name in os.listdir(folder) if name.endswith('.glif')) if folder is not None else None
+	except OSError:
+		on_disk = set()
+
+	for name, file_name in data.items():
+		glyph_path = path + (step(name),)
+
+		if not isinstance(file_name, str):
+			found.append(issue('error', unit, glyph_path, 'File name must be a str'))
+			continue
+
+		if not file_name.endswith('.glif'):
+			found.append(issue('warning', unit, glyph_path, 'File name does not end with .glif'))
+
+		if file_name.lower() in file_names:
+			found.append(issue('error', unit, glyph_path, 'Same file as {} on a case insensitive system'.format(file_names[file_name.lower()])))
+
+		file_names[file_name.lower()] = name
+
+		if on_disk is not None and file_name not in on_disk:
+			found.append(issue('error', unit, glyph_path, 'File not found: {}'.format(file_name)))
+
+	if on_disk is not None:
+		listed = set(data.values())
+		found += [issue('warning', unit, path, 'Not listed in contents.plist: {}'.format(file_name)) for file_name in sorted(on_disk - listed)]
+
+	return found
+
+def check_groups(unit, data, path, glyph_names):
+	if not isinstance(data, dict):
+		return [issue('error', unit, path, 'groups.plist must be a dict')]
+
+	found, kern_members = [], ({}, {})
+
+	for group, members in data.items():
+		group_path = path + (step(group),)
+
+		if not isinstance(members, list) or not all(isinstance(member, str) for member in members):
+			found.append(issue('error', unit, group_path, 'A group is a list of glyph names'))
+			continue
+
+		for side, prefix in enumerate(cfg_kern_prefixes):
+			if not group.startswith(prefix):
+				continue
+
+			if group == prefix:
+				found.append(issue('error', unit, group_path, 'Kerning group without a name'))
+
+			for index, member in enumerate(members):
+				if member in kern_members[side]:
+					found.append(issue('error', unit, group_path + (item_step(index),), '{} is in {} already, a glyph may be in one {} group only'.format(member, kern_members[side][member], prefix)))
+				else:
+					kern_members[side][member] = group
+
+		if glyph_names is not None:
+			found += [issue('warning', unit, group_path + (item_step(index),), 'Glyph not in the font: {}'.format(member)) for index, member in enumerate(members) if member not in glyph_names]
+
+	return found
+
+def check_kerning(unit, data, path, glyph_names, groups):
+	if not isinstance(data, dict):
+		return [issue('error', unit, path, 'kerning.plist must be a dict')]
+
+	found = []
+
+	def check_side(name, side, side_path):
+		prefix, other = cfg_kern_prefixes[side], cfg_kern_prefixes[1 - side]
+
+		if name.startswith(other):
+			found.append(issue('error', unit, side_path, '{} group used on the {} side'.format(other.rstrip('.'), ('first', 'second')[side])))
+
+		elif name.startswith(prefix):
+			if groups is not None and name not in groups:
+				found.append(issue('error', unit, side_path, 'Group not found: {}'.format(name)))
+
+		elif glyph_names is not None and name not in glyph_names:
+			found.append(issue('warning', unit, side_path, 'Glyph not in the font: {}'.format(name)))
+
+	for first, pairs in data.items():
+		first_path = path + (step(first),)
+		check_side(first, 0, first_path)
+
+		if not isinstance(pairs, dict):
+			found.append(issue('error', unit, first_path, 'Kerning of a first side is a dict'))
+			continue
+
+		for second, value in pairs.items():
+			check_side(second, 1, first_path + (step(second),))
+
+			if not is_number(value):
+				found.append(issue('error', unit, first_path + (step(second),), 'Kerning value must be a number, found {}'.format(type_name(value))))
+
+	return found
+
+def check_lib(unit, data, path):
+	if not isinstance(data, dict):
+		return [issue('error', unit, path, 'lib.plist must be a dict')]
+
+	found = []
+	order = data.get('public.glyphOrder')
+
+	if order is not None:
+		order_path = path + (step('public.glyphOrder'),)
+
+		if not isinstance(order, list) or not all(isinstance(name, str) for name in order):
+			found.append(issue('error', unit, order_path, 'public.glyphOrder is a list of glyph names'))
+
+		elif len(set(order)) != len(order):
+			seen = set()
+
+			for index, name in enumerate(order):
+				if name in seen:
+					found.append(issue('warning', unit, order_path + (item_step(index),), 'Listed twice: {}'.format(name)))
+
+				seen.add(name)
+
+	names = data.get('public.postscriptNames')
+
+	if names is not None and (not isinstance(names, dict) or not all(isinstance(value, str) for value in names.values())):
+		found.append(issue('error', unit, path + (step('public.postscriptNames'),), 'public.postscriptNames maps glyph names to str'))
+
+	categories = data.get('public.openTypeCategories')
+
+	if isinstance(categories, dict):
+		found += [issue('error', unit, path + (step('public.openTypeCategories'), step(name)), 'Not a category: {}'.format(value)) for name, value in categories.items() if value not in cfg_opentype_categories]
+
+	return found
+
+# - Rules: XML ----------------------------------------------
+def walk_elements(root, path):
+	'''(element, key path) of root and all elements below it'''
+	stack = [(root, path)]
+
+	while len(stack):
+		element, element_path = stack.pop()
+		yield element, element_path
+		stack.extend((child, element_path + (child_step,)) for child, child_step in zip(reversed(element), reversed(element_steps(element))))
+
+def check_glif(unit, root, path, name):
+	found = []
+	add = lambda severity, at, message: found.append(issue(severity, unit, at, message))
+
+	if root.tag != 'glyph':
+		return [issue('error', unit, path, 'Root element must be glyph, found {}'.format(root.tag))]
+
+	if root.get('name') != name:
+		add('error', path + (step('name'),) if 'name' in root.attrib else path, 'Glyph name {} does not match contents.plist: {}'.format(root.get('name'), name))
+
+	if root.get('format') not in cfg_glif_formats:
+		add('warning', path, 'Unknown GLIF format: {}'.format(root.get('format')))
+
+	unicodes = set()
+
+	for element, element_path in walk_elements(root, path):
+		attributes = element.attrib
+
+		if element.tag == 'advance':
+			for attribute in ('width', 'height'):
+				if attribute in attributes and not is_number_text(attributes[attribute]):
+					add('error', element_path + (step(attribute),), 'Advance {} must be a number'.format(attribute))
+
+		elif element.tag == 'unicode':
+			hex_value = attributes.get('hex', '')
+
+			if cfg_hex_value.match(hex_value) is None:
+				add('error', element_path, 'Not a hex code point: {}'.format(hex_value))
+
+			elif hex_value.upper() in unicodes:
+				add('warning', element_path, 'Code point listed twice: {}'.format(hex_value))
+
+			unicodes.add(hex_value.upper())
+
+		elif element.tag == 'point':
+			if attributes.get('type', 'offcurve') not in cfg_point_types:
+				add('error', element_path + (step('type'),), 'Not a point type: {}'.format(attributes.get('type')))
+
+			for attribute in ('x', 'y'):
+				if not is_number_text(attributes.get(attribute)):
+					add('error', element_path, 'Point {} must be a number'.format(attribute))
+
+		elif element.tag == 'component':
+			if not len(attributes.get('base', '')):
+				add('error', element_path, 'Component without a base glyph')
+
+			for attribute in ('xScale', 'xyScale', 'yxScale', 'yScale', 'xOffset', 'yOffset'):
+				if attribute in attributes and not is_number_text(attributes[attribute]):
+					add('error', element_path + (step(attribute),), 'Component {} must be a number'.format(attribute))
+
+		elif element.tag in ('anchor', 'guideline'):
+			for attribute in ('x', 'y', 'angle'):
+				if attribute in attributes and not is_number_text(attributes[attribute]):
+					add('error', element_path + (step(attribute),), '{} {} must be a number'.format(element.tag.title(), attribute))
+
+	return found
+
+def check_designspace(unit, root, path, folder):
+	found = []
+	add = lambda severity, at, message: found.append(issue(severity, unit, at, message))
+
+	if root.tag != 'designspace':
+		return [issue('error', unit, path, 'Root element must be designspace, found {}'.format(root.tag))]
+
+	axes = set()
+
+	for element, element_path in walk_elements(root, path):
+		attributes = element.attrib
+
+		if element.tag == 'axis' and 'values' not in attributes:
+			name = attributes.get('name')
+
+			if name is None:
+				add('error', element_path, 'Axis without a name')
+
+			elif name in axes:
+				add('error', element_path, 'Duplicate axis: {}'.format(name))
+
+			axes.add(name)
+
+			if len(attributes.get('tag', '')) != 4:
+				add('error', element_path, 'Axis tag must be 4 characters')
+
+			limits = [attributes.get(attribute) for attribute in ('minimum', 'default', 'maximum')]
+
+			if not all(map(is_number_text, limits)):
+				add('error', element_path, 'Axis minimum, default and maximum must be numbers')
+
+			elif not float(limits[0]) <= float(limits[1]) <= float(limits[2]):
+				add('error', element_path, 'Axis default must be between minimum and maximum')
+
+		elif element.tag == 'axis':
+			axes.add(attributes.get('name'))
+
+	for element, element_path in walk_elements(root, path):
+		attributes = element.attrib
+
+		if element.tag == 'dimension':
+			if attributes.get('name') not in axes:
+				add('error', element_path, 'Location on an undefined axis: {}'.format(attributes.get('name')))
+
+			for attribute in ('xvalue', 'yvalue'):
+				if attribute in attributes and not is_number_text(attributes[attribute]):
+					add('error', element_path + (step(attribute),), 'Dimension {} must be a number'.format(attribute))
+
+		elif element.tag == 'source':
+			if not len(attributes.get('filename', '')):
+				add('error', element_path, 'Source without a filename')
+
+			elif folder is not None and not os.path.isdir(os.path.join(folder, attributes['filename'])):
+				add('warning', element_path + (step('filename'),), 'UFO not found: {}'.format(attributes['filename']))
+
+	return found
+
+# - Tasks ---------------------------------------------------
+def run_task(task):
+	'''Run one validation task in a worker. Files with data None are read from disk'''
+	rule, args = task[0], task[1:]
+
+	if rule == 'glifs':
+		found = []
+
+		for unit, root, path, name, file_path in args[0]:
+			if root is None:
+				if not os.path.exists(file_path):
+					continue	# Reported by check_contents
+
+				try:
+					root = core.xml_load(file_path).getroot()
+				except Exception as error:
+					found.append(issue('error', unit, path[:-1], 'Not readable: {}'.format(error)))
+					continue
+
+			found += check_glif(unit, root, path, name)
+
+		return found
+
+	unit, data, path, file_path = args[:4]
+
+	if data is None:
+		try:
+			data = core.xml_load(file_path).getroot() if rule == 'designspace' else core.plist_load(file_path)
+		except Exception as error:
+			return [issue('error', unit, path, 'Not readable: {}'.format(error))]
+
+	return cfg_rules[rule](unit, data, path, *args[4:])
+
+cfg_rules = {	'fontinfo.plist':check_fontinfo,
+				'metainfo.plist':check_metainfo,
+				'layercontents.plist':check_layercontents,
+				'contents.plist':check_contents,
+				'groups.plist':check_groups,
+				'kerning.plist':check_kerning,
+				'lib.plist':check_lib,
+				'designspace':check_designspace }
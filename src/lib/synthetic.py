@@ -0,0 +1,141 @@
+# MODULE: ufoRig / lib / synthetic
+# -----------------------------------------------------------
+# (C) Vassil Kateliev, 2021 		(http://www.kateliev.com)
+# ------------------------------------------------------------
+# https://github.com/kateliev
+
+__version__ = 1.1
+
+# - Dependencies --------------------------------------------
+import os
+import random
+import plistlib
+import xml.etree.ElementTree as ET
+
+from .func import xml_write
+
+# - Config ----------------------------
+cfg_sizes = {	'glyphs':500,
+				'kerning':2000,
+				'lib_depth':4,
+				'masters':2,
+				'instances':8,
+				'contours':3,
+				'points':8 }
+
+cfg_axis = ('wght', 'Weight', 100, 900)
+
+# - Functions -----------------------------------------------
+# NOTE: Same seed and sizes always give the same files, byte for byte
+def glyph_names(count):
+	return ['glyph{:05d}'.format(i) for i in range(count)]
+
+def lib_tree(depth, rng, width=3):
+	'''Nested lib data, every level mixes scalars, lists and deeper dicts'''
+	node = {	'public.skipExportGlyphs':[],
+				'com.synthetic.flag':rng.random() > .5,
+				'com.synthetic.value':rng.randint(-1000, 1000),
+				'com.synthetic.ratio':round(rng.random(), 6),
+				'com.synthetic.note':'level {}'.format(depth),
+				'com.synthetic.list':[rng.randint(0, 100) for i in range(width * 2)] }
+
+	if depth > 0:
+		for i in range(width):
+			node['com.synthetic.child{}'.format(i)] = lib_tree(depth - 1, rng, width)
+
+	return node
+
+def glif_tree(name, unicode_value, rng, contours, points):
+	root = ET.Element('glyph', name=name, format='2')
+	ET.SubElement(root, 'advance', width=str(rng.randint(200, 1200)))
+	ET.SubElement(root, 'unicode', hex='{:04X}'.format(unicode_value))
+	outline = ET.SubElement(root, 'outline')
+
+	for c in range(contours):
+		contour = ET.SubElement(outline, 'contour')
+
+		for p in range(points):
+			ET.SubElement(contour, 'point', x=str(rng.randint(-200, 1200)), y=str(rng.randint(-300, 900)), type='line' if p % 3 == 0 else 'curve' if p % 3 == 1 else 'offcurve')
+
+	return root
+
+def write_plist(file_path, data):
+	with open(file_path, 'wb') as plist_file:
+		plistlib.dump(data, plist_file)
+
+def write_xml(file_path, root, wrapped=True):
+	with open(file_path, 'wb') as xml_file:
+		xml_write(xml_file, root, wrapped)
+
+def generate_ufo(ufo_path, glyphs=cfg_sizes['glyphs'], kerning=cfg_sizes['kerning'], lib_depth=cfg_sizes['lib_depth'], contours=cfg_sizes['contours'], points=cfg_sizes['points'], seed=0, style='Regular'):
+	'''Write a complete UFO 3 with given number of glyphs and kerning pairs, returns its path'''
+	rng = random.Random(seed)
+	names = glyph_names(glyphs)
+	glyphs_path = os.path.join(ufo_path, 'glyphs')
+	os.makedirs(glyphs_path, exist_ok=True)
+
+	write_plist(os.path.join(ufo_path, 'metainfo.plist'), {'creator':'com.kateliev.ufoRig.synthetic', 'formatVersion':3})
+	write_plist(os.path.join(ufo_path, 'layercontents.plist'), [['public.default', 'glyphs']])
+	write_plist(os.path.join(ufo_path, 'fontinfo.plist'), {	'familyName':'Synthetic',
+															'styleName':style,
+															'unitsPerEm':1000,
+															'ascender':750,
+															'descender':-250,
+															'xHeight':500,
+															'capHeight':700,
+															'versionMajor':1,
+															'versionMinor':0,
+															'openTypeOS2Panose':[2, 0, 5, 3, 0, 0, 0, 0, 0, 0] })
+
+	group_size = max(1, len(names) // 20)
+	groups = dict(('public.kern1.group{}'.format(i), names[i * group_size:(i + 1) * group_size]) for i in range(min(20, len(names))))
+	write_plist(os.path.join(ufo_path, 'groups.plist'), groups)
+
+	pairs = {}
+
+	for i in range(kerning):
+		first, second = rng.choice(names) if len(names) else 'space', rng.choice(names) if len(names) else 'space'
+		pairs.setdefault(first, {})[second] = rng.randint(-150, 50)
+
+	write_plist(os.path.join(ufo_path, 'kerning.plist'), pairs)
+	write_plist(os.path.join(ufo_path, 'lib.plist'), dict(lib_tree(lib_depth, rng), **{'public.glyphOrder':names}))
+
+	contents = {}
+
+	for i, name in enumerate(names):
+		file_name = name + '.glif'
+		contents[name] = file_name
+		write_xml(os.path.join(glyphs_path, file_name), glif_tree(name, 0xE000 + i, rng, contours, points), wrapped=False)
+
+	write_plist(os.path.join(glyphs_path, 'contents.plist'), contents)
+	return ufo_path
+
+def generate_designspace(folder, masters=cfg_sizes['masters'], instances=cfg_sizes['instances'], seed=0, **ufo_sizes):
+	'''Write a designspace with its master UFOs into folder, returns the designspace path'''
+	tag, name, minimum, maximum = cfg_axis
+	os.makedirs(folder, exist_ok=True)
+
+	root = ET.Element('designspace', format='4.1')
+	axes = ET.SubElement(root, 'axes')
+	ET.SubElement(axes, 'axis', tag=tag, name=name, minimum=str(minimum), maximum=str(maximum), default=str(minimum))
+	sources = ET.SubElement(root, 'sources')
+
+	for m in range(masters):
+		location = minimum + (maximum - minimum) * m // max(masters - 1, 1)
+		file_name = 'Synthetic-Master{}.ufo'.format(m)
+		generate_ufo(os.path.join(folder, file_name), seed=seed + m, style='Master{}'.format(m), **ufo_sizes)
+		source = ET.SubElement(sources, 'source', filename=file_name, name='master.{}'.format(m), familyname='Synthetic', stylename='Master{}'.format(m))
+		ET.SubElement(ET.SubElement(source, 'location'), 'dimension', name=name, xvalue=str(location))
+
+	instances_element = ET.SubElement(root, 'instances')
+
+	for i in range(instances):
+		location = minimum + (maximum - minimum) * i // max(instances - 1, 1)
+		instance = ET.SubElement(instances_element, 'instance', name='instance.{}'.format(i), familyname='Synthetic', stylename='Instance{}'.format(i), filename='instances/Synthetic-Instance{}.ufo'.format(i))
+		ET.SubElement(ET.SubElement(instance, 'location'), 'dimension', name=name, xvalue=str(location))
+		ET.SubElement(instance, 'kerning')
+		ET.SubElement(instance, 'info')
+
+	designspace_path = os.path.join(folder, 'Synthetic.designspace')
+	write_xml(designspace_path, root)
+	return designspace_path
@@ -0,0 +1,183 @@
+# MODULE: ufoRig / lib / trace
+# -----------------------------------------------------------
+# (C) Vassil Kateliev, 2021 		(http://www.kateliev.com)
+# ------------------------------------------------------------
+# https://github.com/kateliev
+
+__version__ = 1.1
+
+# - Dependencies --------------------------------------------
+import os
+import json
+import time
+import threading
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+
+# - Config ----------------------------
+cfg_trace_capacity = 20000		# Spans kept, oldest are dropped
+cfg_trace_category = 'ufoRig'
+
+# - Objects -------------------------------------------------
+# NOTE: Nothing here may depend on Qt, spans are also taken in worker processes.
+# NOTE: perf_counter is a system wide monotonic clock, so spans of worker processes line up.
+class span_tracer(object):
+	'''Collects timed spans of named phases with item counts and,
+	when track_memory is set, the peak of traced memory per phase.
+	'''
+	def __init__(self, capacity=cfg_trace_capacity):
+		self.spans = deque(maxlen=capacity)
+		self.enabled = True
+		self.listeners = []
+		self.__local = threading.local()
+		self.__track_memory = False
+
+	# - Memory ----------------------------
+	@property
+	def track_memory(self):
+		return self.__track_memory
+
+	@track_memory.setter
+	def track_memory(self, value):
+		'''tracemalloc slows allocations down noticeably, so it only runs when asked for'''
+		self.__track_memory = bool(value)
+
+		if self.__track_memory and not tracemalloc.is_tracing():
+			tracemalloc.start()
+
+		elif not self.__track_memory and tracemalloc.is_tracing():
+			tracemalloc.stop()
+
+	def __stack(self):
+		if not hasattr(self.__local, 'stack'):
+			self.__local.stack = []
+
+		return self.__local.stack
+
+	# - Spans -----------------------------
+	@contextmanager
+	def span(self, name, **args):
+		'''Time the enclosed block. The yielded record takes an item count: record['items'] = n'''
+		if not self.enabled:
+			yield {}
+			return
+
+		stack = self.__stack()
+		record = {	'name':name,
+					'pid':os.getpid(),
+					'tid':threading.get_ident(),
+					'depth':len(stack),
+					'items':None,
+					'memory':None,
+					'args':args }
+
+		if self.__track_memory and tracemalloc.is_tracing():
+			# - Keep the peak so far of the enclosing span before starting over
+			if len(stack) and stack[-1]['memory'] is not None:
+				stack[-1]['memory'] = max(stack[-1]['memory'], tracemalloc.get_traced_memory()[1])
+
+			tracemalloc.reset_peak()
+			record['memory'] = 0
+
+		stack.append(record)
+		record['start'] = time.perf_counter()
+
+		try:
+			yield record
+
+		finally:
+			record['duration'] = time.perf_counter() - record['start']
+			stack.pop()
+
+			if self.__track_memory and tracemalloc.is_tracing():
+				# - Nested spans reset the peak, they hand theirs up instead
+				record['memory'] = max(record['memory'] or 0, tracemalloc.get_traced_memory()[1])
+
+				if len(stack) and stack[-1]['memory'] is not None:
+					stack[-1]['memory'] = max(stack[-1]['memory'], record['memory'])
+
+			self.add(record)
+
+	def begin(self, name, **args):
+		'''Open a span that ends in another call, like a background load. Finish it with end(record)'''
+		return {'name':name, 'pid':os.getpid(), 'tid':threading.get_ident(), 'depth':0, 'items':None, 'memory':None, 'args':args, 'start':time.perf_counter()}
+
+	def end(self, record, items=None):
+		record['duration'] = time.perf_counter() - record['start']
+
+		if items is not None:
+			record['items'] = items
+
+		self.add(record)
+
+	def add(self, record):
+		if not self.enabled:
+			return
+
+		self.spans.append(record)
+
+		for listener in self.listeners:
+			listener(record)
+
+	def clear(self):
+		self.spans.clear()
+
+	# - Reports ---------------------------
+	def totals(self):
+		'''Per phase name: (count, total seconds, items, peak memory)'''
+		totals = {}
+
+		for record in self.spans:
+			count, duration, items, memory = totals.get(record['name'], (0, 0., 0, None))
+			memory = memory if record['memory'] is None else max(memory or 0, record['memory'])
+			totals[record['name']] = (count + 1, duration + record['duration'], items + (record['items'] or 0), memory)
+
+		return totals
+
+	def chrome_trace(self):
+		'''Spans as a Chrome trace (chrome://tracing, Perfetto) document'''
+		events = []
+
+		for record in self.spans:
+			args = dict(record['args'])
+
+			if record['items'] is not None:
+				args['items'] = record['items']
+
+			if record['memory'] is not None:
+				args['peak_memory'] = record['memory']
+
+			events.append({	'name':record['name'],
+							'cat':cfg_trace_category,
+							'ph':'X',
+							'ts':record['start'] * 1e6,
+							'dur':record['duration'] * 1e6,
+							'pid':record['pid'],
+							'tid':record['tid'],
+							'args':args })
+
+		return {'traceEvents':events, 'displayTimeUnit':'ms'}
+
+	def export(self, file_path):
+		with open(file_path, 'w') as trace_file:
+			json.dump(self.chrome_trace(), trace_file, default=str)
+
+# - Functions -----------------------------------------------
+tracer = span_tracer()
+
+def span(name, **args):
+	return tracer.span(name, **args)
+
+def timed_call(name, func, *args):
+	'''Run func(*args) in a worker process, returns (result, span record) for the parent to add'''
+	worker = span_tracer()
+
+	# - A forked worker inherits tracing of the GUI process, it would only slow parsing down here
+	if tracemalloc.is_tracing():
+		tracemalloc.stop()
+
+	with worker.span(name, file=str(args[0]) if len(args) and isinstance(args[0], (str, os.PathLike)) else '') as record:
+		result = func(*args)
+
+	return result, record
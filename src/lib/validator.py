@@ -0,0 +1,228 @@
+# MODULE: ufoRig / lib / validator
+# -----------------------------------------------------------
+# (C) Vassil Kateliev, 2021 		(http://www.kateliev.com)
+# ------------------------------------------------------------
+# https://github.com/kateliev
+
+__version__ = 1.0
+
+# - Dependencies --------------------------------------------
+import os
+import posixpath
+
+from PyQt5 import QtCore
+from .loader import file_loader
+from .rules import cfg_rules, issue, run_task
+
+# - Config ----------------------------
+cfg_validate_delay = 500 		# ms, quiet time after an edit before its files are validated again
+cfg_glif_chunk = 500 			# GLIF files per task
+cfg_glif_index = 'contents.plist'
+cfg_default_layer = 'glyphs'
+cfg_rule_depends = {	'groups.plist':('kerning.plist',),		# Edited file: files whose rules read it
+						'contents.plist':('groups.plist', 'kerning.plist') }
+
+# - Functions -----------------------------------------------
+def rule_of(node):
+	'''Rule for a file node, None if its files are not validated'''
+	file_name = os.path.basename(node.path or node.key)
+
+	if file_name.endswith('.designspace'):
+		return 'designspace'
+
+	return file_name if file_name in cfg_rules else None
+
+# - Objects -------------------------------------------------
+class document_validator(QtCore.QObject):
+	'''Validates the document of a tree explorer on a process pool: all
+	files at first, later only the files edits touched and the files whose
+	rules depend on them. Unedited files are read from disk by the workers,
+	edited ones are sent as they are in the tree.
+
+	Issues are kept per unit, a file relative to the document folder.
+	Validating a unit again replaces all of its issues.
+	'''
+	issues_changed = QtCore.pyqtSignal()
+
+	def __init__(self, explorer, delay=cfg_validate_delay):
+		super(document_validator, self).__init__()
+
+		# - Init
+		self.explorer = explorer
+		self.issues = {}
+		self.loader = None
+		self.pending = set()
+		self.__contents = {}	# Layer key: glyph names to file names as last validated
+
+		self.tmr_delay = QtCore.QTimer(self)
+		self.tmr_delay.setSingleShot(True)
+		self.tmr_delay.setInterval(delay)
+		self.tmr_delay.timeout.connect(self.run)
+
+		explorer.model_changed.connect(self.__model_changed)
+		self.__model_changed(explorer.model())
+
+	def __model_changed(self, model):
+		model.source_edited.connect(self.__source_edited)
+		model.rowsInserted.connect(self.__rows_inserted)
+		self.validate()
+
+	def __source_edited(self, source):
+		self.pending.add(source)
+		self.tmr_delay.start()
+
+	def __rows_inserted(self, parent, first, last):
+		# - Files reloaded from disk or added later
+		if not parent.isValid():
+			self.pending.update(self.explorer.model().root.children[first:last + 1])
+			self.tmr_delay.start()
+
+	# - Issues ----------------------------
+	def all_issues(self):
+		return [found for unit in sorted(self.issues) for found in self.issues[unit]]
+
+	def counts(self):
+		'''Number of (errors, warnings)'''
+		found = self.all_issues()
+		errors = sum(1 for item in found if item.severity == 'error')
+		return errors, len(found) - errors
+
+	# - Running ---------------------------
+	def validate(self):
+		'''Validate every file'''
+		self.pending.add(None)
+		self.tmr_delay.stop()
+		self.run()
+
+	def cancel(self):
+		self.pending = set()
+		self.tmr_delay.stop()
+
+		if self.loader is not None:
+			self.loader.cancel()
+
+	def run(self):
+		# - One run at a time, what was edited meanwhile goes next
+		if self.loader is not None or not len(self.pending):
+			return
+
+		pending, self.pending = self.pending, set()
+		full = None in pending
+		tasks, task_units = self.tasks(None if full else pending)
+		results = [[] for task in tasks]
+
+		self.loader = file_loader(tasks, run_task, low_priority=True, span_names=('validate', 'check'))
+		self.loader.file_loaded.connect(lambda index, found: results.__setitem__(index, found))
+		self.loader.file_failed.connect(lambda index, error: results.__setitem__(index, [issue('error', task_units[index][0], None, 'Validation failed: {}'.format(error))]))
+		self.loader.finished.connect(lambda loader=self.loader: self.__on_finished(loader, full, task_units, results))
+		self.loader.start()
+
+	def __on_finished(self, loader, full, task_units, results):
+		self.loader = None
+
+		if not loader.cancelled:
+			if full:
+				self.issues = {}
+
+			for units in task_units:
+				for unit in units:
+					self.issues.pop(unit, None)
+
+			for found in results:
+				for item in found:
+					self.issues.setdefault(item.unit, []).append(item)
+
+			self.issues_changed.emit()
+
+		self.run()
+
+	# - Tasks -----------------------------
+	def tasks(self, sources=None):
+		'''Tasks for rules.run_task and the units each covers. All files if sources is None'''
+		model = self.explorer.model()
+		files = dict((node.key, node) for node in model.root.children if rule_of(node) is not None)
+		rules = dict((key, rule_of(node)) for key, node in files.items())
+
+		# - Context for the rules across files
+		default_layer = next((node for key, node in files.items() if rules[key] == cfg_glif_index and posixpath.dirname(key) in (cfg_default_layer, '')), None)
+		glyph_names = self.__export(default_layer)
+		groups = self.__export(next((node for key, node in files.items() if rules[key] == 'groups.plist'), None))
+		glyph_names = set(glyph_names) if isinstance(glyph_names, dict) else None
+		groups = groups if isinstance(groups, dict) else None
+
+		# - What to validate: whole files and single glyphs
+		if sources is None:
+			keys, glyphs = set(files), dict((key, None) for key in files if rules[key] == cfg_glif_index)
+		else:
+			keys, glyphs = set(), {}
+
+			for source in sources:
+				if getattr(source, 'type', None) == 'glif' and source.parent is not None and source.parent.key in files:
+					glyphs.setdefault(source.parent.key, set()).add(source.key)
+
+				elif source is not None and source.key in files and files[source.key] is source:
+					keys.add(source.key)
+					depends = cfg_rule_depends.get(rules[source.key], ()) if source is default_layer or rules[source.key] != cfg_glif_index else ()
+					keys.update(key for key in files if rules[key] in depends)
+
+					# - Glyphs whose entry changed in their layer
+					if rules[source.key] == cfg_glif_index:
+						contents = self.__export(source)
+						known = self.__contents.get(source.key, {})
+
+						if isinstance(contents, dict):
+							glyphs.setdefault(source.key, set()).update(name for name, file_name in contents.items() if known.get(name) != file_name)
+
+		tasks, task_units = [], []
+
+		for key in sorted(keys):
+			node = files[key]
+			rule, path = rules[key], ((key, 0),)
+			unit = os.path.basename(node.path) if rule == 'designspace' and node.path is not None else key
+			folder = os.path.dirname(node.path) if node.path is not None else None
+			data = self.__data(model, node)
+			extra = {	'layercontents.plist':(folder,), 'contents.plist':(folder,), 'designspace':(folder,),
+						'groups.plist':(glyph_names,), 'kerning.plist':(glyph_names, groups) }.get(rule, ())
+
+			tasks.append((rule, unit, data, path, node.path) + extra)
+			task_units.append([unit])
+
+		for key, names in sorted(glyphs.items()):
+			chunks = self.__glif_tasks(model, files[key], names)
+			tasks += [('glifs', chunk) for chunk in chunks]
+			task_units += [[entry[0] for entry in chunk] for chunk in chunks]
+
+		return tasks, task_units
+
+	@staticmethod
+	def __export(node):
+		return node.export() if node is not None else None
+
+	@staticmethod
+	def __data(model, node):
+		'''None lets the worker read the file, edited files are sent from the tree'''
+		if node.path is not None and not model.is_dirty(node) and os.path.exists(node.path):
+			return None
+
+		return node.element if rule_of(node) == 'designspace' else node.export()
+
+	def __glif_tasks(self, model, layer, names=None):
+		'''Chunks of (unit, edited root element or None, key path, glyph name, file path) for given glyphs of a layer'''
+		contents = layer.export()
+
+		if not isinstance(contents, dict) or layer.path is None:
+			return []
+
+		self.__contents[layer.key] = dict(contents)
+		folder, unit_folder = os.path.dirname(layer.path), posixpath.dirname(layer.key)
+		edited = dict((node.key, node) for node in layer.children if node.type == 'glif' and model.is_dirty(node) and node.fetched and len(node.children)) if layer.fetched else {}
+		entries = []
+
+		for name, file_name in contents.items():
+			if names is not None and name not in names or not isinstance(file_name, str):
+				continue
+
+			root = edited[name].children[0].element if name in edited else None
+			entries.append((posixpath.join(unit_folder, file_name), root, ((layer.key, 0), (name, 0), ('glyph', 0)), name, os.path.join(folder, file_name)))
+
+		return [entries[i:i + cfg_glif_chunk] for i in range(0, len(entries), cfg_glif_chunk)]
@@ -0,0 +1,171 @@
+# MODULE: ufoRig / lib / watcher
+# -----------------------------------------------------------
+# (C) Vassil Kateliev, 2021 		(http://www.kateliev.com)
+# ------------------------------------------------------------
+# https://github.com/kateliev
+
+__version__ = 1.0
+
+# - Dependencies --------------------------------------------
+import os
+import fnmatch
+
+from PyQt5 import QtCore
+
+# - Config ----------------------------
+cfg_watch_patterns = ('*.plist', '*.glif', '*.designspace')
+cfg_watch_delay = 400 		# ms, quiet time before a burst of writes is reported
+
+# - Objects -------------------------------------------------
+class file_watcher(QtCore.QObject):
+	'''Watches a folder tree (or single files) and reports changed, added
+	and removed files once writes have settled.
+
+	Folders are watched rather than every file, a UFO can hold thousands of
+	glyphs. On any folder event the folder is rescanned and compared with
+	the last known (mtime, size) of its files.
+	'''
+	changed = QtCore.pyqtSignal(list, list, list)
+
+	def __init__(self, paths, patterns=cfg_watch_patterns, delay=cfg_watch_delay):
+		super(file_watcher, self).__init__()
+
+		# - Init
+		self.patterns = patterns
+		self.files = set()			# Watched single files, their folders are not scanned for others
+		self.file_folders = set()
+		self.snapshot = {}
+		self.pending = set()
+		self.__watched = set()
+
+		self.watcher = QtCore.QFileSystemWatcher(self)
+		self.watcher.directoryChanged.connect(self.__on_event)
+		self.watcher.fileChanged.connect(lambda path: self.__on_event(os.path.dirname(path)))
+
+		self.tmr_settle = QtCore.QTimer(self)
+		self.tmr_settle.setSingleShot(True)
+		self.tmr_settle.setInterval(delay)
+		self.tmr_settle.timeout.connect(self.scan)
+
+		for path in ([paths] if isinstance(paths, str) else paths):
+			self.add(os.path.abspath(path))
+
+	def add(self, path):
+		if os.path.isdir(path):
+			for folder, folders, file_names in os.walk(path):
+				self.__watch_folder(folder)
+				self.snapshot.update(self.__stat_folder(folder))
+		else:
+			self.files.add(path)
+			self.file_folders.add(os.path.dirname(path))
+			self.__watch_folder(os.path.dirname(path))
+			self.snapshot.update(self.__stat_folder(os.path.dirname(path)))
+
+	def track(self, path):
+		'''Also watch a single file below a watched folder, like a glyph that was opened'''
+		path = os.path.abspath(path)
+
+		if path not in self.__watched and os.path.exists(path):
+			self.watcher.addPath(path)
+			self.__watched.add(path)
+
+	def stop(self):
+		self.tmr_settle.stop()
+
+		if len(self.__watched):
+			self.watcher.removePaths(list(self.__watched))
+			self.__watched = set()
+
+	def ignore(self, paths):
+		'''Take the current state of paths as known, for files written by ufoRig itself'''
+		for path in map(os.path.abspath, paths):
+			stat = self.__stat(path)
+
+			if stat is not None:
+				self.snapshot[path] = stat
+
+	# - Internals -------------------------
+	def __watch_folder(self, folder):
+		# - Files are watched too: rewrites in place do not touch the folder on every platform.
+		# - Qt drops a file watch once the file is replaced, so it is added again on every scan
+		watched = set(self.watcher.directories() + self.watcher.files())
+		wanted = [folder] + [path for path in self.__stat_folder(folder) if not path.endswith('.glif') or path in self.__watched]
+		new_paths = [path for path in wanted if path not in watched]
+
+		if len(new_paths):
+			self.watcher.addPaths(new_paths)
+
+		self.__watched.update(wanted)
+
+	def __wanted(self, path):
+		if os.path.dirname(path) in self.file_folders:
+			return path in self.files
+
+		return any(fnmatch.fnmatch(os.path.basename(path), pattern) for pattern in self.patterns)
+
+	@staticmethod
+	def __stat(path):
+		try:
+			stat = os.stat(path)
+		except OSError:
+			return None
+
+		return (stat.st_mtime_ns, stat.st_size)
+
+	def __stat_folder(self, folder):
+		found = {}
+
+		try:
+			entries = list(os.scandir(folder))
+		except OSError:
+			return found
+
+		for entry in entries:
+			if entry.is_file() and self.__wanted(entry.path):
+				try:
+					stat = entry.stat()
+				except OSError:
+					continue
+
+				found[entry.path] = (stat.st_mtime_ns, stat.st_size)
+
+		return found
+
+	def __on_event(self, folder):
+		self.pending.add(folder)
+		self.tmr_settle.start()
+
+	def scan(self):
+		'''Compare pending folders with the snapshot and report the differences'''
+		modified, added, removed = [], [], []
+		pending, self.pending = self.pending, set()
+
+		for folder in sorted(pending):
+			current = self.__stat_folder(folder)
+			known = dict((path, stat) for path, stat in self.snapshot.items() if os.path.dirname(path) == folder)
+
+			for path, stat in current.items():
+				if path not in known:
+					added.append(path)
+				elif known[path] != stat:
+					modified.append(path)
+
+			removed += [path for path in known if path not in current]
+
+			for path in removed:
+				self.snapshot.pop(path, None)
+
+			self.snapshot.update(current)
+
+			# - New sub folders (a new layer) are watched from now on, replaced files watched again
+			if os.path.isdir(folder):
+				self.__watch_folder(folder)
+
+				if not len(self.files):
+					for entry in os.scandir(folder):
+						if entry.is_dir() and entry.path not in self.__watched:
+							self.add(entry.path)
+							added += [path for path in self.snapshot if path.startswith(entry.path + os.sep)]
+
+		if len(modified) or len(added) or len(removed):
+			self.changed.emit(sorted(modified), sorted(added), sorted(removed))
@@ -4,25 +4,59 @@
 # ------------------------------------------------------------
 # https://github.com/kateliev
 
-__version__ = 1.13
+__version__ = 1.31
 
 # - Dependencies --------------------------------------------
+import os
+import re
+import copy
+import zlib
+import bisect
+import pickle
+import pathlib
 import plistlib
 import xml.etree.ElementTree as ET
+from contextlib import contextmanager
 
 from PyQt5 import QtCore, QtGui, QtWidgets
-from .func import xml_pretty_print
-from .objects import data_collector
+from . import core
+from .cache import xml_pack, xml_unpack
+from .watcher import file_watcher
+from .models import cfg_glif_index, plist_model, plist_node, xml_model, xml_node, xml_attrib_node, glif_layer_node, metrics_model, search_index, text_finder, text_preview
+from .metrics import glif_metrics, glyph_metrics, metrics_table
+from .loader import file_loader
+from .diff import cfg_list_item, diff_documents, value_text
+from .trace import span, tracer
+from .validator import document_validator
 
 # - Config ----------------------------
 cfg_trw_columns_class = ['Tag/Key', 'Data/Value', 'Type']
 cfg_data_types = ['tag', 'attribute', 'str', 'int', 'float', 'bool', 'tuple', 'list', 'dict']
+cfg_plist_types = ['str', 'int', 'float', 'bool', 'bytes', 'datetime', 'list', 'dict']
+cfg_xml_types = ['tag', 'attribute']
+cfg_search_columns = {'Any':(0, 1, 2), 'Key':(0,), 'Value':(1,), 'Type':(2,)}
+cfg_search_delay = 250 		# ms
+cfg_search_expand_limit = 50 	# matches
+cfg_search_index_delay = 1000 	# ms, quiet time after loading or an edit before the search index is brought up to date
+cfg_replace_columns = {'Key and Value':(0, 1), 'Key':(0,), 'Value':(1,)}
+cfg_replace_any_type = 'Any type'
+cfg_replace_chunk = 250 		# Unparsed GLIF files per background search task
+cfg_diagnostics_columns = ['Phase', 'Count', 'Total ms', 'Last ms', 'Items', 'Peak memory']
+cfg_diagnostics_delay = 300 	# ms
+cfg_unload_compression = 1		# zlib level of unloaded documents, speed matters more than size
+cfg_compare_columns = ['Change', 'Path', 'Left', 'Right']
+cfg_issues_columns = ['Severity', 'File', 'Location', 'Message']
+cfg_issues_shown = 5000 		# rows, the counts still cover every issue
+cfg_metrics_headers = ['Name', 'Unicode', 'Advance', 'Contours', 'Points', 'Anchors']
+cfg_metrics_chunk = 500 		# GLIF files per background task
+cfg_metrics_delay = 250 		# ms, table refresh while glyphs are measured or edited
 
 # - Helper functions ----------------------------------------
 def set_font(widget, style):
 	font = widget.font()
 	font.setItalic('i' in style)
 	font.setBold('b' in style)
+	font.setUnderline('u' in style)
 	return font
 
 def set_color(qt_color_name, alpha=255):
@@ -39,18 +73,21 @@ def string_plural(count, text='items', remove=1):
 
 # - Widgets -------------------------------------------------
 # -- Shared
-class trw_tree_explorer(QtWidgets.QTreeWidget):
+class trw_tree_explorer(QtWidgets.QTreeView):
+	'''Model based tree view. Nodes are built lazily by the model as branches are expanded'''
+	data_types = cfg_data_types
+	model_changed = QtCore.pyqtSignal(object)
+
 	def __init__(self, status_hook):
 		super(trw_tree_explorer, self).__init__()
 		
 		# - Init
 		self.status_hook = status_hook
-		self.itemClicked.connect(self.set_status)
+		self.clicked.connect(self.set_status)
+		self.expanded.connect(lambda index: self.model().fetch(self.model().node(index)))
+		self.expanded.connect(self.__filter_expanded)
 		self.setSelectionMode(QtWidgets.QAbstractItemView.ExtendedSelection)
-
-		# - String
-		self.__info_parent = 'Info: Tag <{}> with {} / {}'
-		self.__info_child =  'Info: Attribute "{}" of <{}>'
+		self.setUniformRowHeights(True)
 
 		# - Drag and drop
 		self.setDragEnabled(True)
@@ -63,15 +100,28 @@ class trw_tree_explorer(QtWidgets.QTreeWidget):
 		# -- Fonts
 		self.font_bold = set_font(self, 'b')
 		self.font_italic = set_font(self, 'i')
+		self.font_underline = set_font(self, 'u')
 		self.brush_gray = set_color('Gray')
+		self.brush_link = set_color('RoyalBlue')
+		self.brush_missing = set_color('IndianRed')
 
 		# -- Icons
-		self.folder_attrib_name = 'attributes'
 		self.icon_child = self.style().standardIcon(QtWidgets.QStyle.SP_FileIcon)
-		
-		self.folder_children_name = 'children'
 		self.icon_parent = self.style().standardIcon(QtWidgets.QStyle.SP_DirIcon)	
 
+		self.styles = {	'font_meta':self.font_italic, 
+						'brush_meta':self.brush_gray,
+						'icon_parent':self.icon_parent,
+						'icon_child':self.icon_child,
+						'font_link':self.font_underline,
+						'brush_link':self.brush_link,
+						'brush_missing':self.brush_missing,
+						'brush_added':set_brush('LimeGreen', 60),
+						'brush_removed':set_brush('IndianRed', 60),
+						'brush_changed':set_brush('Gold', 80),
+						'brush_within':set_brush('Gold', 30),
+						'brush_outlier':set_brush('Orange', 70)}
+
 		# - Menus
 		self.menu_context = QtWidgets.QMenu(self)
 		self.menu_context.setTitle('Actions')
@@ -85,7 +135,10 @@ class trw_tree_explorer(QtWidgets.QTreeWidget):
 		act_item_remove = QtWidgets.QAction('Remove', self)
 		act_item_duplicate = QtWidgets.QAction('Duplicate', self)
 		act_item_eject = QtWidgets.QAction('Eject', self)
+		act_item_edit_text = QtWidgets.QAction('Edit Full Text', self)
 		
+		self.menu_context.addAction(act_item_edit_text)
+		self.menu_context.addSeparator()
 		self.menu_context.addAction(act_add_parent)
 		self.menu_context.addAction(act_add_child)
 		self.menu_context.addSeparator()
@@ -101,163 +154,509 @@ class trw_tree_explorer(QtWidgets.QTreeWidget):
 		act_item_duplicate.triggered.connect(lambda: self._item_duplicate())
 		act_item_eject.triggered.connect(lambda: self._item_eject())
 		act_item_remove.triggered.connect(lambda: self._item_remove())
+		act_item_edit_text.triggered.connect(lambda: self._item_edit_text(self.currentIndex()))
 
-		for data_type in cfg_data_types:
+		for data_type in self.data_types:
 			act_new = QtWidgets.QAction(data_type, self)
 			self.menu_type.addAction(act_new)
 			act_new.triggered.connect(lambda checked, data=data_type: self._item_type(data))
 
+	# - Helpers ----------------------------
+	def selected_nodes(self, top_only=True):
+		'''Selected nodes in view order. With top_only, nodes whose ancestor is also selected are skipped'''
+		model = self.model()
+		nodes, seen = [], set()
+
+		# - Read the selection ranges directly, selectedRows() is quadratic in the selected row count
+		for selection_range in self.selectionModel().selection():
+			parent = model.node(selection_range.parent())
+
+			for row in range(selection_range.top(), selection_range.bottom() + 1):
+				node = parent.children[row]
+
+				if id(node) not in seen:
+					seen.add(id(node))
+					nodes.append(node)
+
+		nodes.sort(key=self.__row_path)
+
+		if top_only:
+			selection = set(map(id, nodes))
+			nodes = [node for node in nodes if not self.__has_ancestor(node, selection)]
+
+		return nodes
+
+	def __row_path(self, node):
+		path = []
+
+		while node.parent is not None:
+			path.append(node.row())
+			node = node.parent
+
+		return path[::-1]
+
+	def __has_ancestor(self, node, selection):
+		parent = node.parent
+
+		while parent is not None:
+			if id(parent) in selection:
+				return True
+			parent = parent.parent
+
+		return False
+
+	def _new_node(self, is_parent):
+		return None
+
+	def set_model(self, model, headers):
+		self.setModel(model)
+		self.search_index = None
+		self.__filter_hidden = []
+		self.__filter_visible = {}
+		self.__filter_pending = {}
+		model.node_unloading.connect(self.collapse)
+		model.error_raised.connect(lambda message: self.status_hook.showMessage('Error: {}'.format(message)))
+		model.source_edited.connect(self.search_invalidate)
+
+		with span('resize_columns') as record:
+			record['items'] = len(headers)
+
+			for c in range(len(headers)):
+				self.resizeColumnToContents(c)
+
+		self.model_changed.emit(model)
+
+	# - Search ----------------------------
+	def search_invalidate(self, source):
+		'''Only the edited file is indexed again, the rest of the index stays'''
+		if self.search_index is not None:
+			self.search_index.invalidate(source)
+
+	def search_prepare(self):
+		'''Build the search index, or index the edited files again, ahead of the next search'''
+		if self.search_index is None:
+			self.search_index = search_index(self.model().root)
+		else:
+			self.search_index.refresh()
+
+	def filter_clear(self):
+		model = self.model()
+
+		for parent, children in self.__filter_hidden:
+			if model.attached(parent):
+				parent_index = model.index_of(parent)
+
+				for child in children:
+					if child.parent is parent and model.attached(child):
+						self.setRowHidden(child.row(), parent_index, False)
+
+		self.__filter_hidden = []
+		self.__filter_visible = {}
+		self.__filter_pending = {}
+
+	def __filter_children(self, parent):
+		'''Hide the children of parent that lead to no match'''
+		model = self.model()
+		parent_index = model.index_of(parent)
+		hidden = [child for child in parent.children if id(child) not in self.__filter_visible]
+
+		for child in hidden:
+			self.setRowHidden(child.row(), parent_index, True)
+
+		self.__filter_hidden.append((parent, hidden))
+
+	def __filter_expanded(self, index):
+		parent = self.__filter_pending.pop(id(self.model().node(index)), None)
+
+		if parent is not None:
+			self.__filter_children(parent)
+
+	def filter_tree(self, text, columns=(0, 1, 2)):
+		'''Show only rows matching text in given columns, with their ancestors. Returns the match count'''
+		model = self.model()
+		self.setUpdatesEnabled(False)
+		self.filter_clear()
+
+		if not len(text):
+			self.setUpdatesEnabled(True)
+			return 0
+
+		self.search_prepare()
+		match_paths = self.search_index.match(text, columns)
+
+		# - Build the matched branches and collect them with all their ancestors
+		for path in match_paths:
+			node = model.root
+
+			for row in path:
+				model.fetch(node)
+				node = node.children[row]
+				self.__filter_visible[id(node)] = node
+
+		for path in match_paths[:cfg_search_expand_limit]:
+			node = model.node_at(path).parent
+
+			while node is not model.root and not self.isExpanded(model.index_of(node)):
+				self.expand(model.index_of(node))
+				node = node.parent
+
+		# - Hide non matching siblings now where they can be seen, the rest once expanded
+		parents = dict((id(node.parent), node.parent) for node in self.__filter_visible.values())
+
+		for parent in parents.values():
+			if parent is model.root or self.isExpanded(model.index_of(parent)):
+				self.__filter_children(parent)
+			else:
+				self.__filter_pending[id(parent)] = parent
+
+		self.setUpdatesEnabled(True)
+		return len(match_paths)
+
+	# - View state ------------------------
+	def key_path(self, node):
+		'''Path of (key, n-th sibling with that key) pairs, stays valid when a node is rebuilt from disk'''
+		path = []
+
+		while node is not self.model().root:
+			same_key = [child for child in node.parent.children if child.key == node.key]
+			path.append((node.key, next(i for i, child in enumerate(same_key) if child is node)))
+			node = node.parent
+
+		return tuple(reversed(path))
+
+	def node_at_key_path(self, path):
+		model = self.model()
+		node = model.root
+
+		for key, nth in path:
+			model.fetch(node)
+			same_key = [child for child in node.children if child.key == key]
+
+			if nth >= len(same_key):
+				return None
+
+			node = same_key[nth]
+
+		return node
+
+	def nodes_at_key_paths(self, paths):
+		'''node_at_key_path for many paths at once, the children of each parent are indexed by key once'''
+		model = self.model()
+		by_parent, nodes = {}, []
+
+		for path in paths:
+			node = model.root
+
+			for key, nth in path:
+				model.fetch(node)
+
+				if id(node) not in by_parent:
+					by_key = by_parent[id(node)] = {}
+
+					for child in node.children:
+						by_key.setdefault(child.key, []).append(child)
+
+				same_key = by_parent[id(node)].get(key, [])
+
+				if nth >= len(same_key):
+					node = None
+					break
+
+				node = same_key[nth]
+
+			nodes.append(node)
+
+		return nodes
+
+	def view_state(self):
+		'''Expanded branches, selection, current row and scroll position, by key paths'''
+		model = self.model()
+		expanded, stack = [], list(model.root.children)
+
+		while len(stack):
+			node = stack.pop()
+
+			if node.fetched and len(node.children) and self.isExpanded(model.index_of(node)):
+				expanded.append(self.key_path(node))
+				stack.extend(node.children)
+
+		current = self.currentIndex()
+
+		return {	'expanded':expanded,
+					'selected':[self.key_path(node) for node in self.selected_nodes(False)],
+					'current':self.key_path(model.node(current)) if current.isValid() else None,
+					'scroll':(self.horizontalScrollBar().value(), self.verticalScrollBar().value()) }
+
+	def restore_view_state(self, state):
+		model = self.model()
+		selection = QtCore.QItemSelection()
+
+		for path in sorted(state['expanded'], key=len):
+			node = self.node_at_key_path(path)
+
+			if node is not None:
+				self.expand(model.index_of(node))
+
+		if state['current'] is not None:
+			node = self.node_at_key_path(state['current'])
+
+			if node is not None:
+				self.selectionModel().setCurrentIndex(model.index_of(node), QtCore.QItemSelectionModel.NoUpdate)
+
+		for path in state['selected']:
+			node = self.node_at_key_path(path)
+
+			if node is not None:
+				selection.select(model.index_of(node, 0), model.index_of(node, len(model.headers) - 1))
+
+		self.selectionModel().select(selection, QtCore.QItemSelectionModel.ClearAndSelect)
+		self.horizontalScrollBar().setValue(state['scroll'][0])
+		self.verticalScrollBar().setValue(state['scroll'][1])
+
+	# - Bulk edits -------------------------
+	@contextmanager
+	def bulk_edit(self, label):
+		'''One undo step with repaints held until the end. The selection is
+		dropped first: Qt moves every selected index on each row change.
+		'''
+		model = self.model()
+		self.selectionModel().clear()
+		self.setUpdatesEnabled(False)
+
+		try:
+			with model.history_group(label):
+				yield model
+
+		finally:
+			self.setUpdatesEnabled(True)
+
+	def select_nodes(self, nodes):
+		'''Select whole rows of nodes, adjacent rows as one range'''
+		model = self.model()
+		selection = QtCore.QItemSelection()
+		groups = {}
+
+		for node in nodes:
+			if model.attached(node):
+				groups.setdefault(id(node.parent), (node.parent, []))[1].append(node.row())
+
+		for parent, rows in groups.values():
+			rows.sort()
+			first = rows[0]
+
+			for position, row in enumerate(rows):
+				if position == len(rows) - 1 or rows[position + 1] != row + 1:
+					selection.append(QtCore.QItemSelectionRange(model.index_of(parent.children[first], 0), model.index_of(parent.children[row], len(model.headers) - 1)))
+
+					if position < len(rows) - 1:
+						first = rows[position + 1]
+
+		self.selectionModel().select(selection, QtCore.QItemSelectionModel.ClearAndSelect)
+
 	# - Internals --------------------------
 	def _item_type(self, data_type):
-		root = self.invisibleRootItem()
-		
-		for item in self.selectedItems():
-			item.setText(2, data_type)
+		nodes = self.selected_nodes(False)
+
+		with self.bulk_edit('Set Type') as model:
+			model.set_nodes_type(nodes, data_type)
+
+		self.select_nodes(nodes)
 
 	def _item_remove(self):
-		root = self.invisibleRootItem()
-		
-		for item in self.selectedItems():
-			(item.parent() or root).removeChild(item)
+		nodes = self.selected_nodes()
+
+		with self.bulk_edit('Remove') as model:
+			model.remove_nodes(nodes)
 
 	def _item_add(self, data=None, is_parent=False):
-		defualt_text = 'New Tag' if is_parent else 'New Attribute'
-		new_item_data = [defualt_text] if data is None else data
-		new_item = QtWidgets.QTreeWidgetItem(new_item_data)
-		new_item.setFont(2, self.font_italic)
-		new_item.setForeground(2, self.brush_gray)
-		
-		if is_parent:	
-			new_item.setIcon(0, self.icon_parent)
-			new_item.setFlags(new_item.flags() | QtCore.Qt.ItemIsEditable)
-		else:
-			new_item.setFlags(new_item.flags() & ~QtCore.Qt.ItemIsDropEnabled | QtCore.Qt.ItemIsEditable)
-			new_item.setIcon(0, self.icon_child)
+		selection = self.selected_nodes()
+		new_node = self._new_node(is_parent)
 
-		parent = self.selectedItems()[0].parent()
-		parent.addChild(new_item)
+		if not len(selection) or new_node is None or not selection[0].parent.is_container():
+			return
+
+		parent = selection[0].parent
+		self.model().insert_nodes(parent, len(parent.children), [new_node])
 
 	def _item_duplicate(self):
-		for item in self.selectedItems():
-			item.parent().addChild(item.clone())
+		nodes = self.selected_nodes()
+
+		with self.bulk_edit('Duplicate') as model:
+			clones = model.duplicate_nodes(nodes)
+
+		self.select_nodes(clones)
 		
 	def _item_eject(self):
-		root = self.invisibleRootItem()
+		model = self.model()
 		
-		for item in reversed(self.selectedItems()):
-			old_parent = item.parent()
-			
-			if old_parent is not None:
-				new_parent = old_parent.parent()
-				ix = old_parent.indexOfChild(item)
-				item_without_parent = old_parent.takeChild(ix)
-				root.addChild(item_without_parent)
+		with model.history_group('Eject'):
+			for node in reversed(self.selected_nodes()):
+				old_parent = node.parent
+				
+				if old_parent is not model.root and old_parent.parent.is_container():
+					new_parent = old_parent.parent
+					model.move_node(node, new_parent, old_parent.row() + 1)
 	
+	def _item_edit_text(self, index):
+		'''Edit the whole value of a row in a text editor, for values too long for their cell'''
+		if not index.isValid():
+			return
+
+		model = self.model()
+		node = model.node(index)
+		index = model.index_of(node, 1)
+
+		if not model.flags(index) & QtCore.Qt.ItemIsEditable or node.is_container() and not len(node.text(1)):
+			return
+
+		dlg_editor = dlg_text_editor(node.text(1), '{} ({})'.format(node.text(0), node.text(2)), self)
+
+		if dlg_editor.exec_() == QtWidgets.QDialog.Accepted and dlg_editor.text() != node.text(1):
+			model.setData(index, dlg_editor.text())
+
 	# - Event Handlers ----------------------
+	def edit(self, index, trigger=None, event=None):
+		# - Values shown cut are edited in full apart, an inline editor would get all of it
+		if trigger is None:
+			return super(trw_tree_explorer, self).edit(index)
+
+		if index.isValid() and index.column() == 1 and self.model().node(index).preview_text(1)[1]:
+			if trigger in (self.DoubleClicked, self.EditKeyPressed) and self.editTriggers() & trigger:
+				self._item_edit_text(index)
+
+			return False
+
+		return super(trw_tree_explorer, self).edit(index, trigger, event)
+
 	def contextMenuEvent(self, event):
 		self.menu_context.popup(QtGui.QCursor.pos())
 
-	@QtCore.pyqtSlot(QtWidgets.QTreeWidgetItem, int)
-	def set_status(self, item, col):
-		status_message = ''
+	def dropEvent(self, event):
+		model = self.model()
+		target_index = self.indexAt(event.pos())
+		target = model.node(target_index)
+		position = self.dropIndicatorPosition()
 
-		try:
-			if item.childCount() and item.text(2) != 'attribute':
-				tags, attributes = 0, 0
+		if position == self.OnItem and target.is_container():
+			new_parent, row = target, target.child_count()
+		elif position in (self.AboveItem, self.BelowItem) and target_index.isValid():
+			new_parent, row = target.parent, target.row() + int(position == self.BelowItem)
+		else:
+			new_parent, row = model.root, len(model.root.children)
 
-				for c in range(item.childCount()):
-					if item.child(c).childCount():
-						tags += 1
-					else:
-						attributes += 1
+		nodes = self.selected_nodes()
+		selection = set(map(id, nodes))
 
-				status_message = self.__info_parent.format(item.text(0), string_plural(tags), string_plural(attributes, 'attributes'))
-			else:
-				status_message = self.__info_child.format(item.text(0), item.parent().text(0))
-			
-		except AttributeError:
-			status_message = 'Info: ...'
+		if not new_parent.is_container() or id(new_parent) in selection or self.__has_ancestor(new_parent, selection):
+			event.ignore()
+			return
 
-		self.status_hook.showMessage(status_message)
+		with model.history_group('Move'):
+			for node in nodes:
+				model.move_node(node, new_parent, row)
+				row = node.row() + 1
 
+		# - Tell the drag source the move was already done
+		event.setDropAction(QtCore.Qt.CopyAction)
+		event.accept()
+
+	@QtCore.pyqtSlot(QtCore.QModelIndex)
+	def set_status(self, index):
+		self.status_hook.showMessage('Info: ...')
 
 # -- XML -----------------------------------
 class trw_xml_explorer(trw_tree_explorer):
-	''' XML parsing and exporting tree widget'''
+	''' XML parsing and exporting tree view'''
+	data_types = cfg_xml_types
 
-	# - Getter/Setter -----------------------
-	def __tree_walker_set(self, node, parent):
-		# - Set Tag	
-		new_item_text = node.text.strip().strip('\n') if node.text is not None else ''
-		new_item = QtWidgets.QTreeWidgetItem(parent, [node.tag, new_item_text, 'tag'])
-		new_item.setFlags(new_item.flags() | QtCore.Qt.ItemIsEditable)
-		new_item.setFont(2, self.font_italic)
-		new_item.setForeground(2, self.brush_gray)
-		
-		# - Set Icon
-		if len(list(node)) or len(node.attrib):	
-			new_item.setIcon(0, self.icon_parent)
-		else:
-			new_item.setIcon(0, self.icon_child)
-
-		# - Set Attribute
-		for pair in node.attrib.items():
-			new_attribute = QtWidgets.QTreeWidgetItem(new_item, [pair[0], pair[1], 'attribute'])
-			new_attribute.setFlags(new_item.flags() & ~QtCore.Qt.ItemIsDropEnabled | QtCore.Qt.ItemIsEditable)
-			new_attribute.setIcon(0, self.icon_child)
-			new_attribute.setFont(2, self.font_italic)
-			new_attribute.setForeground(2, self.brush_gray)
-
-		# - Set Children
-		if len(node):
-			for child in node:
-				self.__tree_walker_set(child, new_item)
-
-	def __tree_walker_get(self, node, parent):
-		if node.childCount() or 'attribute' not in str(node.text(2)):
-			new_element = ET.Element(node.text(0))
-
-			if len(node.text(1)):
-				new_element.text = node.text(1)
-			
-			for c in range(node.childCount()):
-				self.__tree_walker_get(node.child(c), new_element)
+	link_activated = QtCore.pyqtSignal(str)
 
-			parent.append(new_element)
-		else:
-			parent.set(node.text(0), node.text(1))
+	def __init__(self, status_hook):
+		super(trw_xml_explorer, self).__init__(status_hook)
 
-	def set_tree(self, data, headers):
-		self.blockSignals(True)
-		self.clear()
-		self.setHeaderLabels(headers)
+		# - String
+		self.__info_parent = 'Info: Tag <{}> with {} / {}'
+		self.__info_child =  'Info: Attribute "{}" of <{}>'
+		self.__info_link = 'Link: {} (Open Linked UFO from the context menu)'
+
+		# - Links
+		self.act_link_open = QtWidgets.QAction('Open Linked UFO', self)
+		self.act_link_open.triggered.connect(self.link_open)
+		self.menu_context.insertAction(self.menu_context.actions()[0], self.act_link_open)
+		self.menu_context.insertSeparator(self.menu_context.actions()[1])
+		self.menu_context.aboutToShow.connect(lambda: self.act_link_open.setEnabled(self.current_link() is not None))
+
+	# - Links -------------------------------
+	def current_link(self):
+		'''UFO path of the current row if it is a source or instance file name'''
+		index = self.currentIndex()
+
+		if not index.isValid():
+			return None
+
+		return self.model().link_of(self.model().node(index))
+
+	def link_open(self):
+		link = self.current_link()
+
+		if link is None:
+			return
+
+		if not os.path.isdir(link):
+			self.status_hook.showMessage('Linked UFO not found: {}'.format(link))
+			return
+
+		self.link_activated.emit(link)
+
+	# - Internals
+	def _new_node(self, is_parent):
+		if is_parent:
+			return xml_node(ET.Element('New Tag'))
+
+		return xml_attrib_node('New Attribute', '')
+
+	@QtCore.pyqtSlot(QtCore.QModelIndex)
+	def set_status(self, index):
+		status_message = ''
+		model = self.model()
+		node = model.node(index)
+
+		try:
+			if model.link_of(node) is not None:
+				status_message = self.__info_link.format(model.link_of(node))
+
+			elif node.type == 'tag' and node.has_children():
+				model.fetch(node)
+				tags = sum(child.type == 'tag' for child in node.children)
+				attributes = len(node.children) - tags
+				status_message = self.__info_parent.format(node.key, string_plural(tags), string_plural(attributes, 'attributes'))
+			else:
+				status_message = self.__info_child.format(node.key, node.parent.key)
 			
-		# - Insert 
-		if data is not None and isinstance(data, type(ET.ElementTree(None))):
-			data_root = data.getroot()
-			self.__tree_walker_set(data_root, self)
+		except AttributeError:
+			status_message = 'Info: ...'
 
-		# - Format
-		self.expandAll()
-		for c in range(self.columnCount()):
-			self.resizeColumnToContents(c)	
-		self.collapseAll()
+		self.status_hook.showMessage(status_message)
 
-		# - Set
-		self.blockSignals(False)
+	# - Getter/Setter -----------------------
+	def set_tree(self, data, headers, file_path=None):
+		if data is not None and not isinstance(data, ET.ElementTree):
+			data = None
+
+		with span('populate') as record:
+			model = xml_model(data, headers, self.styles, file_path)
+			record['items'] = sum(node.child_count() for node in model.root.children)
+
+		self.set_model(model, headers)
 
 	def get_tree(self):
-		root = self.invisibleRootItem().child(0)
-		new_element = ET.Element(None)
-		
-		self.__tree_walker_get(root, new_element)
-		xml_pretty_print(new_element)
-		
-		root_element = ET.ElementTree(new_element)
-		return root_element
+		with span('export'):
+			return self.model().root.children[0].element
 
 class trw_plist_explorer(trw_tree_explorer):
-	''' pList parsing and exporting tree widget'''
+	''' pList parsing and exporting tree view'''
+	data_types = cfg_plist_types
+
 	def __init__(self, status_hook):
 		super(trw_plist_explorer, self).__init__(status_hook)
 
@@ -266,133 +665,1194 @@ class trw_plist_explorer(trw_tree_explorer):
 		self.__info_child =  'Info: Child "{}" of <{}>'
 
 	# - Internals
-	@QtCore.pyqtSlot(QtWidgets.QTreeWidgetItem, int)
-	def set_status(self, item, col):
+	def _new_node(self, is_parent):
+		if is_parent:
+			return plist_node('New Parent', {})
+
+		return plist_node('New Child', '')
+
+	@QtCore.pyqtSlot(QtCore.QModelIndex)
+	def set_status(self, index):
 		status_message = ''
+		node = self.model().node(index)
+
 		try:
-			if item.childCount() and (item.text(2) == 'dict' or item.text(2) == 'list'):
-				children = item.childCount()
-				status_message = self.__info_parent.format(item.text(0), string_plural(children, 'children', 3))
+			if node.is_container() and node.child_count():
+				children = node.child_count()
+				status_message = self.__info_parent.format(node.key, string_plural(children, 'children', 3))
 			else:
-				status_message = self.__info_child.format(item.text(0), item.parent().text(0))
+				status_message = self.__info_child.format(node.key, node.parent.key)
 		except AttributeError:
 			status_message = 'Info: ...'
 			
 		self.status_hook.showMessage(status_message)	
 	
 	# - Getter/Setter -----------------------
-	def __tree_walker_set(self, node, parent):
-		if isinstance(node, tuple):
-			node_text, node_data = str(node[0]), node[1]
-			node_data_text = str(node_data)
-			node_type = str(type(node[1]).__name__)
-
-			new_item = QtWidgets.QTreeWidgetItem(parent, [node_text, node_data_text, node_type])
-			new_item.setFlags(new_item.flags() | QtCore.Qt.ItemIsEditable)
-			new_item.setForeground(2, self.brush_gray)
-			new_item.setFont(2, self.font_italic)
-			new_item.setIcon(0, self.icon_child)
-
-			if isinstance(node_data, (list, dict)):
-				new_item.setIcon(0, self.icon_parent)
-				new_item.setText(1,'')
-				self.__tree_walker_set(node_data, new_item)
-
-		elif isinstance(node, list):
-			for item in node:
-				self.__tree_walker_set(item, parent)
-		
-		elif isinstance(node, dict):
-			parent.setText(2,'dict')
-			for item in node.items():
-				self.__tree_walker_set(item, parent)
-		else:
-			node_type = str(type(node).__name__)
-			new_item = QtWidgets.QTreeWidgetItem(parent, ['List Item', str(node), node_type])
-			new_item.setFlags(new_item.flags() | QtCore.Qt.ItemIsEditable)
-			new_item.setIcon(0, self.icon_child)
-			new_item.setForeground(0, self.brush_gray)
-			new_item.setFont(0, self.font_italic)
-			new_item.setForeground(2, self.brush_gray)
-			new_item.setFont(2, self.font_italic)
-		
-	def __tree_walker_get(self, node):
-		node_name, node_value, node_type = node.text(0), node.text(1), node.text(2)
-		if node_type == 'dict' and 'List Item' in node_name: node_name = None
-		new_element = data_collector(node_name, node_value, node_type)
-
-		if node.childCount():
-			for c in range(node.childCount()):
-				sub_element = self.__tree_walker_get(node.child(c))
-				new_element.append(sub_element)
-		
-		return new_element.export(evaluate=True)
-
 	def set_tree(self, data, headers):
-		self.blockSignals(True)
-		self.clear()
-		self.setHeaderLabels(headers)
-			
-		# - Insert 
-		self.__tree_walker_set(data, self)
+		with span('populate') as record:
+			model = plist_model(data, headers, self.styles)
+			record['items'] = len(model.root.children)
 
-		# - Format
-		self.expandAll()
-		for c in range(self.columnCount()):
-			self.resizeColumnToContents(c)	
-		self.collapseAll()
+		self.set_model(model, headers)
 
 	def set_tree_multy(self, data, headers):
-		self.blockSignals(True)
-		self.clear()
-		self.setHeaderLabels(headers)
-			
-		# - Insert 
-		self.__tree_walker_set(data, self)
+		self.set_tree(data, headers)
 
-		# - Format
-		self.expandAll()
-		for c in range(self.columnCount()):
-			self.resizeColumnToContents(c)	
-		self.collapseAll()
+	def get_tree(self):
+		with span('export'):
+			return self.model().export()[0]
 
-		# - Set
-		self.blockSignals(False)
+class wgt_search_bar(QtWidgets.QWidget):
+	'''Search as you type filter for a tree explorer'''
+	def __init__(self, explorer, status_hook):
+		super(wgt_search_bar, self).__init__()
 
-	def get_tree(self):
-		root = self.invisibleRootItem().child(0)
-		return self.__tree_walker_get(root)
+		# - Init
+		self.explorer = explorer
+		self.status_hook = status_hook
 
-class wgt_designspace_manager(QtWidgets.QWidget):
-	def __init__(self, data_tree, status_hook):
-		super(wgt_designspace_manager, self).__init__()
+		# - Widgets
+		self.edt_search = QtWidgets.QLineEdit()
+		self.edt_search.setPlaceholderText('Search...')
+		self.edt_search.setClearButtonEnabled(True)
+
+		self.cmb_column = QtWidgets.QComboBox()
+		self.cmb_column.addItems(cfg_search_columns.keys())
+
+		# - Debounce typing
+		self.tmr_delay = QtCore.QTimer(self)
+		self.tmr_delay.setSingleShot(True)
+		self.tmr_delay.setInterval(cfg_search_delay)
+		self.tmr_delay.timeout.connect(self.search)
+
+		self.edt_search.textChanged.connect(lambda text: self.tmr_delay.start())
+		self.cmb_column.currentIndexChanged.connect(lambda index: self.tmr_delay.start())
+
+		# - Index while idle, so typing does not wait for it after loading or editing
+		self.tmr_index = QtCore.QTimer(self)
+		self.tmr_index.setSingleShot(True)
+		self.tmr_index.setInterval(cfg_search_index_delay)
+		self.tmr_index.timeout.connect(self.prepare)
+
+		explorer.model().source_edited.connect(lambda source: self.tmr_index.start())
+		explorer.model_changed.connect(lambda model: model.source_edited.connect(lambda source: self.tmr_index.start()))
+		explorer.model_changed.connect(lambda model: self.tmr_index.start())
+		self.tmr_index.start()
+
+		# - Layout
+		lay_main = QtWidgets.QHBoxLayout()
+		lay_main.setContentsMargins(0, 0, 0, 0)
+		lay_main.addWidget(self.edt_search)
+		lay_main.addWidget(self.cmb_column)
+		self.setLayout(lay_main)
+
+	def showEvent(self, event):
+		super(wgt_search_bar, self).showEvent(event)
+		self.tmr_index.start()
+
+	def prepare(self):
+		# - Hidden tabs are indexed once shown
+		index = self.explorer.search_index
+
+		if self.isVisible() and (index is None or index.stale):
+			with span('search_index') as record:
+				self.explorer.search_prepare()
+				record['items'] = len(self.explorer.search_index)
+
+	def search(self):
+		text = self.edt_search.text()
+		matches = self.explorer.filter_tree(text, cfg_search_columns[self.cmb_column.currentText()])
+
+		if len(text):
+			self.status_hook.showMessage('Search: {} for "{}"'.format(string_plural(matches, 'matches', 2), text))
+
+class wgt_replace_bar(QtWidgets.QWidget):
+	'''Find and replace over keys and values of every file in a tab.
+	The match count is shown as you type, Replace All applies it as one undo step.
+	Glyphs not opened in the tree are searched in the background, Replace All
+	waits for them.
+	'''
+	def __init__(self, explorer, status_hook):
+		super(wgt_replace_bar, self).__init__()
+
+		# - Init
+		self.explorer = explorer
+		self.status_hook = status_hook
+		self.finder = None
+		self.loader = None
+
+		# - Widgets
+		self.edt_find = QtWidgets.QLineEdit()
+		self.edt_find.setPlaceholderText('Find...')
+		self.edt_replace = QtWidgets.QLineEdit()
+		self.edt_replace.setPlaceholderText('Replace with...')
+
+		self.chk_regex = QtWidgets.QCheckBox('Regex')
+		self.chk_case = QtWidgets.QCheckBox('Case')
+
+		self.cmb_column = QtWidgets.QComboBox()
+		self.cmb_column.addItems(cfg_replace_columns.keys())
+		self.cmb_type = QtWidgets.QComboBox()
+		self.cmb_type.addItems([cfg_replace_any_type] + explorer.data_types)
+
+		self.lbl_matches = QtWidgets.QLabel()
+		self.btn_replace = QtWidgets.QPushButton('Replace All')
+		self.btn_replace.setEnabled(False)
+		self.btn_replace.clicked.connect(self.replace)
+
+		# - Debounce typing, drop matches once the tree is edited
+		self.tmr_delay = QtCore.QTimer(self)
+		self.tmr_delay.setSingleShot(True)
+		self.tmr_delay.setInterval(cfg_search_delay)
+		self.tmr_delay.timeout.connect(self.preview)
+
+		self.edt_find.textChanged.connect(lambda text: self.tmr_delay.start())
+		self.chk_regex.toggled.connect(lambda checked: self.tmr_delay.start())
+		self.chk_case.toggled.connect(lambda checked: self.tmr_delay.start())
+		self.cmb_column.currentIndexChanged.connect(lambda index: self.tmr_delay.start())
+		self.cmb_type.currentIndexChanged.connect(lambda index: self.tmr_delay.start())
+		explorer.model().edited.connect(self.reset)
+		explorer.model_changed.connect(lambda model: model.edited.connect(self.reset))
+
+		# - Layout
+		lay_main = QtWidgets.QHBoxLayout()
+		lay_main.setContentsMargins(0, 0, 0, 0)
+		lay_main.addWidget(self.edt_find)
+		lay_main.addWidget(self.edt_replace)
+		lay_main.addWidget(self.chk_regex)
+		lay_main.addWidget(self.chk_case)
+		lay_main.addWidget(self.cmb_column)
+		lay_main.addWidget(self.cmb_type)
+		lay_main.addWidget(self.lbl_matches)
+		lay_main.addWidget(self.btn_replace)
+		self.setLayout(lay_main)
+
+	def pattern(self):
+		'''Compiled pattern of the find field, None if empty. Raises re.error on a bad regex'''
+		text = self.edt_find.text()
+
+		if not len(text):
+			return None
+
+		return re.compile(text if self.chk_regex.isChecked() else re.escape(text), 0 if self.chk_case.isChecked() else re.IGNORECASE)
+
+	def reset(self):
+		self.cancel()
+		self.finder = None
+
+		if self.isVisible() and len(self.edt_find.text()):
+			self.tmr_delay.start()
+
+	def cancel(self):
+		loader, self.loader = self.loader, None
+
+		if loader is not None:
+			loader.cancel()
+
+	def preview(self):
+		'''Collect the matches and show their count, glyphs not parsed yet in the background'''
+		self.cancel()
+		self.finder = None
+		self.btn_replace.setEnabled(False)
+
+		try:
+			pattern = self.pattern()
+		except re.error as error:
+			self.lbl_matches.setText('Bad pattern: {}'.format(error))
+			return
+
+		if pattern is None:
+			self.lbl_matches.clear()
+			return
+
+		data_type = self.cmb_type.currentText()
+		data_types = None if data_type == cfg_replace_any_type else (data_type,)
+
+		with span('find', pattern=pattern.pattern) as record:
+			finder = self.finder = text_finder(self.explorer.model().root, pattern, cfg_replace_columns[self.cmb_column.currentText()], data_types)
+			record['items'] = len(finder)
+
+		if len(finder.unparsed):
+			tasks = [(pattern, finder.columns, data_types, finder.unparsed[start:start + cfg_replace_chunk]) for start in range(0, len(finder.unparsed), cfg_replace_chunk)]
+			self.loader = file_loader(tasks, core.glif_matches, span_names=('find', 'glyphs'))
+			self.loader.file_loaded.connect(lambda index, found: finder.add(found))
+			self.loader.progress.connect(lambda done, total: self.show_count(finder, done * cfg_replace_chunk))
+			self.loader.finished.connect(lambda loader=self.loader: self.__searched(loader))
+			self.loader.start()
+
+		self.show_count(finder)
+
+	def __searched(self, loader):
+		if loader is self.loader:
+			self.loader = None
+			self.show_count(self.finder)
+
+	def show_count(self, finder, searched=0):
+		'''Match count, Replace All only once every glyph is searched'''
+		text = '{} in {}'.format(string_plural(finder.occurrences(), 'matches', 2), string_plural(finder.rows(), 'rows'))
+
+		if self.loader is not None:
+			text += ', searching glyphs {}/{}'.format(min(searched, len(finder.unparsed)), len(finder.unparsed))
+
+		self.lbl_matches.setText(text)
+		self.btn_replace.setEnabled(self.loader is None and len(finder) > 0)
+
+	def replace(self):
+		if self.finder is None:
+			self.preview()
+
+		if self.finder is None or self.loader is not None or not len(self.finder):
+			return
+
+		finder = self.finder
+
+		try:
+			with span('replace') as record, self.explorer.bulk_edit('Replace') as model:
+				replaced, failed = model.replace_matches(finder, self.edt_replace.text(), self.chk_regex.isChecked())
+				record['items'] = replaced
+
+		except re.error as error:
+			self.status_hook.showMessage('Bad replacement: {}'.format(error))
+			return
+
+		message = 'Replaced: {}'.format(string_plural(replaced, 'values', 1))
+
+		if failed:
+			message += ', skipped {} that did not fit their type'.format(failed)
+
+		self.status_hook.showMessage(message)
+		self.preview()
+
+class wgt_glyph_table(QtWidgets.QWidget):
+	'''Glyph metrics of a layer in a sortable table, measured in the
+	background when first shown. Edited glyphs are measured again, a
+	changed glyph list rebuilds the table.
+	'''
+	def __init__(self, explorer):
+		super(wgt_glyph_table, self).__init__()
+
+		# - Init
+		self.explorer = explorer
+		self.layer = None
+		self.loader = None
+		self.stale = True
+		self.rows = {}		# Glyph name: table row
+
+		self.tmr_refresh = QtCore.QTimer(self)
+		self.tmr_refresh.setSingleShot(True)
+		self.tmr_refresh.setInterval(cfg_metrics_delay)
+		self.tmr_refresh.timeout.connect(self.refresh)
+
+		self.tmr_reload = QtCore.QTimer(self)
+		self.tmr_reload.setSingleShot(True)
+		self.tmr_reload.setInterval(cfg_metrics_delay)
+		self.tmr_reload.timeout.connect(self.load)
+
+		# - Widgets
+		self.cmb_layer = QtWidgets.QComboBox()
+		self.cmb_layer.activated.connect(lambda index: self.load())
+
+		self.edt_filter = QtWidgets.QLineEdit()
+		self.edt_filter.setPlaceholderText('Filter by name or U+0041')
+		self.edt_filter.setClearButtonEnabled(True)
+		self.edt_filter.textChanged.connect(lambda text: self.tmr_refresh.start())
+
+		self.chk_outliers = QtWidgets.QCheckBox('Outliers only')
+		self.chk_outliers.setToolTip('Glyphs with an advance far from the rest of the layer')
+		self.chk_outliers.toggled.connect(lambda checked: self.refresh())
+
+		self.model = metrics_model(metrics_table([]), cfg_metrics_headers, explorer.styles)
+		self.tab_metrics = QtWidgets.QTableView()
+		self.tab_metrics.setModel(self.model)
+		self.tab_metrics.setSortingEnabled(True)
+		self.tab_metrics.sortByColumn(0, QtCore.Qt.AscendingOrder)
+		self.tab_metrics.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+		self.tab_metrics.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+		self.tab_metrics.setAlternatingRowColors(True)
+		self.tab_metrics.verticalHeader().hide()
+		self.tab_metrics.verticalHeader().setDefaultSectionSize(self.tab_metrics.fontMetrics().height() + 4)
+		self.tab_metrics.clicked.connect(self.reveal)
+		self.tab_metrics.activated.connect(self.reveal)
+
+		self.lbl_stats = QtWidgets.QLabel()
+		self.lbl_stats.setWordWrap(True)
+
+		# - Layout
+		lay_filter = QtWidgets.QHBoxLayout()
+		lay_filter.addWidget(self.cmb_layer)
+		lay_filter.addWidget(self.edt_filter)
+		lay_filter.addWidget(self.chk_outliers)
+
+		lay_main = QtWidgets.QVBoxLayout()
+		lay_main.setContentsMargins(0, 0, 0, 0)
+		lay_main.addLayout(lay_filter)
+		lay_main.addWidget(self.tab_metrics)
+		lay_main.addWidget(self.lbl_stats)
+		self.setLayout(lay_main)
+
+		explorer.model_changed.connect(self.__model_changed)
+		explorer.model().source_edited.connect(self.__source_edited)
+
+	def __model_changed(self, model):
+		model.source_edited.connect(self.__source_edited)
+		self.stale = True
+
+		if self.isVisible():
+			self.load()
+		else:
+			self.cancel()
+			self.layer, self.rows = None, {}
+			self.model.set_table(metrics_table([]))
+
+	def __source_edited(self, source):
+		if self.layer is None:
+			return
+
+		if source is None or source is self.layer:
+			# - Glyphs added, removed or renamed
+			self.tmr_reload.start()
+
+		elif getattr(source, 'type', None) == 'glif' and source.parent is self.layer and source.key in self.rows:
+			self.__measure(source)
+			self.tmr_refresh.start()
+
+	def showEvent(self, event):
+		super(wgt_glyph_table, self).showEvent(event)
+
+		if self.stale:
+			self.load()
+
+	# - Measuring -------------------------
+	def layers(self):
+		return [node for node in self.explorer.model().root.children if isinstance(node, glif_layer_node)]
+
+	def load(self):
+		'''Measure every glyph of the chosen layer in the background'''
+		self.cancel()
+		self.stale = False
+		layers = self.layers()
+		current = self.cmb_layer.currentText()
+
+		self.cmb_layer.clear()
+		self.cmb_layer.addItems([layer.key for layer in layers])
+		self.cmb_layer.setVisible(len(layers) > 1)
+		self.cmb_layer.setCurrentIndex(max(self.cmb_layer.findText(current), 0))
+
+		self.layer = layers[self.cmb_layer.currentIndex()] if len(layers) else None
+		contents = self.layer.export() if self.layer is not None else None
+		contents = contents if isinstance(contents, dict) and self.layer.path is not None else {}
+		names = [name for name, file_name in contents.items() if isinstance(file_name, str)]
+		table = metrics_table(names)
+		self.rows = dict((name, row) for row, name in enumerate(names))
+		self.model.set_table(table)
+		self.refresh()
+
+		if not len(names):
+			return
+
+		folder = os.path.dirname(self.layer.path)
+		tasks = [[(name, os.path.join(folder, contents[name])) for name in names[start:start + cfg_metrics_chunk]] for start in range(0, len(names), cfg_metrics_chunk)]
+
+		self.loader = file_loader(tasks, glyph_metrics, low_priority=True, span_names=('metrics', 'measure'))
+		self.loader.file_loaded.connect(lambda index, found: self.__measured(table, index * cfg_metrics_chunk, found))
+		self.loader.finished.connect(lambda loader=self.loader: self.__finished(loader))
+		self.loader.start()
+
+	def __measured(self, table, start, found):
+		if table is not self.model.table:
+			return
+
+		table.fill(start, found)
+
+		# - Unsaved edits win over the files
+		if self.layer.fetched:
+			for node in self.layer.children[start:start + len(found)]:
+				if self.explorer.model().is_dirty(node) and node.key in self.rows:
+					self.__measure(node)
+
+		if not self.tmr_refresh.isActive():
+			self.tmr_refresh.start()
+
+	def __measure(self, node):
+		'''Measure a glyph from the tree, if it is open there'''
+		if node.fetched and len(node.children):
+			self.model.table.set_row(self.rows[node.key], glif_metrics(node.children[0].element))
+
+	def __finished(self, loader):
+		if loader is self.loader:
+			self.loader = None
+			self.refresh()
+
+	def cancel(self):
+		self.tmr_reload.stop()
+
+		if self.loader is not None:
+			self.loader.cancel()
+			self.loader = None
+
+	# - View ------------------------------
+	def refresh(self):
+		self.model.set_filter(self.edt_filter.text(), self.chk_outliers.isChecked())
+		stats = self.model.table.stats()
+		text = '{} of {} glyphs measured'.format(stats['filled'], stats['glyphs']) if stats['filled'] < stats['glyphs'] else '{} glyphs'.format(stats['glyphs'])
+
+		if stats['count']:
+			text += ', advance min {min:g}, max {max:g}, mean {mean:.1f}, median {median:g}, std {std:.1f}, {outliers} outliers'.format(**stats)
+
+		if len(self.model.rows) != stats['glyphs']:
+			text += ', {} shown'.format(len(self.model.rows))
+
+		self.lbl_stats.setText(text)
+
+	def reveal(self, index):
+		'''Select the glyph of a table row in the tree'''
+		if not index.isValid() or self.layer is None:
+			return
+
+		name = self.model.table.names[self.model.table_row(index)]
+		node = self.explorer.node_at_key_path(((self.layer.key, 0), (name, 0)))
+
+		if node is not None:
+			tree_index = self.explorer.model().index_of(node)
+			self.explorer.scrollTo(tree_index)
+			self.explorer.setCurrentIndex(tree_index)
+
+class wgt_tab_manager(QtWidgets.QWidget):
+	'''Base of the document tabs. A tab that is not shown can be unloaded:
+	its document is packed into a compressed pickle and the tree dropped,
+	restore() rebuilds it with the view as it was. The undo history of an
+	unloaded document is not kept, so only documents without unsaved
+	edits are unloaded.
+	'''
+	dirty_changed = QtCore.pyqtSignal(bool)
+
+	def __init__(self, status_hook):
+		super(wgt_tab_manager, self).__init__()
+
+		# - Init
+		self.status_hook = status_hook
+		self.watcher = None
+		self.loader = None
+		self.validator = None
+		self.packed = None
+		self.__packed_state = None
+		self.__pending_changes = []
+		self.__estimate = None
+
+	def set_explorer(self, explorer):
+		self.trw_explorer = explorer
+		explorer.model_changed.connect(self.__model_changed)
+
+	def __model_changed(self, model):
+		self.__estimate = None
+		model.dirty_changed.connect(self.dirty_changed)
+
+		for signal in (model.rowsInserted, model.rowsRemoved, model.layoutChanged, model.modelReset):
+			signal.connect(self.__drop_estimate)
+
+	def __drop_estimate(self, *args):
+		self.__estimate = None
+
+	# - Memory ----------------------------
+	def memory_estimate(self):
+		'''Approximate bytes held by the document, cached until its rows change'''
+		if self.packed is not None:
+			return len(self.packed)
+
+		if self.__estimate is None:
+			self.__estimate = self.trw_explorer.model().memory_estimate()
+
+		return self.__estimate
+
+	def can_unload(self):
+		return self.packed is None and not len(self.trw_explorer.model().dirty)
+
+	def unload(self):
+		'''Pack the document and drop its tree'''
+		if not self.can_unload():
+			return False
+
+		with span('tab_unload') as record:
+			self.__packed_state = self.trw_explorer.view_state()
+			self.packed = zlib.compress(pickle.dumps(self._pack(self.trw_explorer.model()), pickle.HIGHEST_PROTOCOL), cfg_unload_compression)
+			self._unpack(None)
+			record['items'] = len(self.packed)
+
+		return True
+
+	def restore(self):
+		'''Rebuild an unloaded document, then apply what changed on disk meanwhile'''
+		if self.packed is None:
+			return False
+
+		with span('tab_restore') as record:
+			data = pickle.loads(zlib.decompress(self.packed))
+			self.packed = None
+			self._unpack(data)
+			self.trw_explorer.restore_view_state(self.__packed_state)
+			self.__packed_state = None
+			record['items'] = len(self.trw_explorer.model().root.children)
+
+		if len(self.wgt_search.edt_search.text()):
+			self.wgt_search.search()
+
+		pending, self.__pending_changes = self.__pending_changes, []
+
+		for modified, added, removed in pending:
+			self.reload_files(modified, added, removed)
+
+		return True
+
+	def _pack(self, model):
+		'''Picklable form of the document'''
+		return None
+
+	def _unpack(self, data):
+		'''Set the tree from _pack() data, an empty tree for None'''
+		pass
+
+	# - Validation ------------------------
+	def validate(self):
+		'''Validate the whole document, and from now on again after every edit'''
+		if self.validator is None:
+			self.validator = document_validator(self.trw_explorer)
+		else:
+			self.validator.validate()
+
+		return self.validator
+
+	# - File watching ---------------------
+	def files_changed(self, modified, added, removed):
+		'''Changes reported by the watcher, kept for later while unloaded'''
+		if self.packed is not None:
+			self.__pending_changes.append((modified, added, removed))
+			return
+
+		self.reload_files(modified, added, removed)
+
+	def reload_files(self, modified, added, removed):
+		pass
+
+	def saved(self, paths):
+		if self.watcher is not None:
+			self.watcher.ignore(paths)
+
+	def close_document(self):
+		'''Stop everything that refers to the document before the tab is deleted'''
+		if self.watcher is not None:
+			self.watcher.stop()
+			self.watcher.changed.disconnect()
+			self.watcher.deleteLater()
+			self.watcher = None
+
+		if self.validator is not None:
+			self.validator.cancel()
+			self.validator = None
+
+		self.packed = None
+		self.__pending_changes = []
+
+class wgt_designspace_manager(wgt_tab_manager):
+	link_activated = QtCore.pyqtSignal(str)
+
+	def __init__(self, data_tree, status_hook, file_path=None):
+		super(wgt_designspace_manager, self).__init__(status_hook)
 		
 		# - Init
 		self.file_type = '.designspace'
 
 		# - Widgets
 		# -- Trees
-		self.trw_explorer = trw_xml_explorer(status_hook)
-		self.trw_explorer.set_tree(data_tree, cfg_trw_columns_class)
+		self.set_explorer(trw_xml_explorer(status_hook))
+		self.trw_explorer.set_tree(data_tree, cfg_trw_columns_class, file_path)
+		self.trw_explorer.link_activated.connect(self.link_activated)
+		self.wgt_search = wgt_search_bar(self.trw_explorer, status_hook)
+		self.wgt_replace = wgt_replace_bar(self.trw_explorer, status_hook)
+		self.wgt_replace.hide()
 
 		# - Layout
 		lay_main = QtWidgets.QVBoxLayout()
+		lay_main.addWidget(self.wgt_search)
+		lay_main.addWidget(self.wgt_replace)
 		lay_main.addWidget(self.trw_explorer)
 		self.setLayout(lay_main)
 
-class wgt_plist_manager(QtWidgets.QWidget):
+	def links(self):
+		'''Existing UFOs the designspace refers to, masters first'''
+		return [path for path in self.trw_explorer.model().links() if os.path.isdir(path)]
+
+	def document(self):
+		'''The designspace as one (key, root element, path) entry, a copy that later edits do not reach'''
+		root_node = self.trw_explorer.model().root.children[0]
+		return [(root_node.key, copy.deepcopy(root_node.element), root_node.path)]
+
+	# - Unloading -------------------------
+	def _pack(self, model):
+		root_node = model.root.children[0]
+		return (xml_pack(ET.ElementTree(root_node.element)), root_node.path)
+
+	def _unpack(self, data):
+		if data is None:
+			self.trw_explorer.set_tree(None, cfg_trw_columns_class)
+		else:
+			self.trw_explorer.set_tree(xml_unpack(data[0]), cfg_trw_columns_class, data[1])
+
+	# - File watching ---------------------
+	def watch(self, path):
+		self.watcher = file_watcher(path)
+		self.watcher.changed.connect(self.files_changed)
+
+	def reload_files(self, modified, added, removed):
+		model = self.trw_explorer.model()
+		root_node = model.root.children[0]
+
+		if len(removed):
+			self.status_hook.showMessage('Removed from disk: {}'.format(root_node.path))
+			return
+
+		if model.has_dirty_within(root_node):
+			self.status_hook.showMessage('Changed on disk, kept your unsaved edits: {}'.format(root_node.path))
+			return
+
+		state = self.trw_explorer.view_state()
+
+		try:
+			root = core.xml_load(root_node.path).getroot()
+		except Exception as error:
+			# - Maybe still being written: keep the tree, the next change tries again
+			self.status_hook.showMessage('Could not reload {}: {}'.format(root_node.path, error))
+			return
+
+		with span('reload') as record:
+			new_node = xml_node(root)
+			new_node.path = root_node.path
+			model.replace_node(root_node, new_node)
+			record['items'] = 1
+
+		self.trw_explorer.restore_view_state(state)
+		self.status_hook.showMessage('Reloaded: {}'.format(root_node.path))
+
+class wgt_plist_manager(wgt_tab_manager):
 	def __init__(self, data_tree, status_hook):
-		super(wgt_plist_manager, self).__init__()
+		super(wgt_plist_manager, self).__init__(status_hook)
 		
 		# - Init
 		self.file_type = '.plist'
+		self.folder = None
+		self.__file_order = []
 
 		# - Widgets
 		# -- Trees
-		self.trw_explorer = trw_plist_explorer(status_hook)
+		self.set_explorer(trw_plist_explorer(status_hook))
 		self.trw_explorer.set_tree(data_tree, cfg_trw_columns_class)
+		self.wgt_search = wgt_search_bar(self.trw_explorer, status_hook)
+		self.wgt_replace = wgt_replace_bar(self.trw_explorer, status_hook)
+		self.wgt_replace.hide()
+
+		# -- Glyph table
+		self.wgt_glyphs = wgt_glyph_table(self.trw_explorer)
+		self.wgt_glyphs.hide()
 
 		# - Layout
+		spl_main = QtWidgets.QSplitter(QtCore.Qt.Horizontal)
+		spl_main.addWidget(self.trw_explorer)
+		spl_main.addWidget(self.wgt_glyphs)
+
 		lay_main = QtWidgets.QVBoxLayout()
-		lay_main.addWidget(self.trw_explorer)
-		self.setLayout(lay_main)
\ No newline at end of file
+		lay_main.addWidget(self.wgt_search)
+		lay_main.addWidget(self.wgt_replace)
+		lay_main.addWidget(spl_main)
+		self.setLayout(lay_main)
+
+	def show_glyph_table(self, visible):
+		self.wgt_glyphs.setVisible(visible)
+
+	def add_file(self, order, file_name, file_data, file_path=None):
+		'''Add a parsed file as it arrives, kept in the order the files were requested'''
+		row = bisect.bisect(self.__file_order, order)
+		self.__file_order.insert(row, order)
+		
+		model = self.trw_explorer.model()
+		model.insert_nodes(model.root, row, [model.new_file_node(file_name, file_data, file_path)], undoable=False)
+		self.trw_explorer.resizeColumnToContents(0)
+
+	def document(self):
+		'''The files as (key, plist data, path) entries'''
+		return self._pack(self.trw_explorer.model())
+
+	# - Unloading -------------------------
+	def _pack(self, model):
+		return [(node.key, node.export(), node.path) for node in model.root.children]
+
+	def _unpack(self, data):
+		self.trw_explorer.set_tree(data if data is not None else [], cfg_trw_columns_class)
+
+	def close_document(self):
+		self.wgt_glyphs.cancel()
+		self.wgt_replace.cancel()
+		super(wgt_plist_manager, self).close_document()
+
+	# - File watching ---------------------
+	def watch(self, path):
+		'''Follow changes on disk of a loaded folder, or of a single file'''
+		self.folder = path if os.path.isdir(path) else None
+		self.watcher = file_watcher(path)
+		self.watcher.changed.connect(self.files_changed)
+		self.trw_explorer.expanded.connect(self.__track_glyph)
+
+	def __track_glyph(self, index):
+		'''Glyph files are watched once opened, watching all of them would run out of handles'''
+		node = self.trw_explorer.model().node(index)
+
+		if getattr(node, 'type', None) == 'glif' and self.watcher is not None:
+			self.watcher.track(node.path)
+
+	@staticmethod
+	def __load(path, failed):
+		'''Parsed plist, None if it can not be read yet (still being written): the node is kept and the next change tries again'''
+		try:
+			return core.plist_load(path)
+		except Exception as error:
+			failed.append((path, error))
+			return None
+
+	def reload_files(self, modified, added, removed):
+		'''Reparse only the changed files and splice them in, keeping the view as it was'''
+		model = self.trw_explorer.model()
+		file_nodes = dict((os.path.abspath(node.path), node) for node in model.root.children if node.path is not None)
+		state = self.trw_explorer.view_state()
+		reloaded, kept, failed = [], [], []
+
+		with span('reload') as record:
+			# - Whole files: plists, glyph layer contents included
+			for path in modified:
+				node = file_nodes.get(path)
+
+				if node is None:
+					continue
+
+				if model.has_dirty_within(node):
+					kept.append(path)
+					continue
+
+				data = self.__load(node.path, failed)
+
+				if data is not None:
+					model.replace_node(node, model.new_file_node(node.key, data, node.path))
+					reloaded.append(path)
+
+			for path in removed:
+				node = file_nodes.get(path)
+
+				if node is not None and not model.has_dirty_within(node):
+					self.__file_order.pop(node.row())
+					model.remove_nodes([node], undoable=False)
+					reloaded.append(path)
+
+			if self.folder is not None:
+				# - Modified but not loaded: added earlier while it could not be read
+				for path in added + [path for path in modified if path not in file_nodes]:
+					if path.endswith('.plist') and path not in file_nodes:
+						data = self.__load(path, failed)
+
+						if data is None:
+							continue
+
+						file_name = pathlib.Path(path).relative_to(self.folder).as_posix()
+						row = bisect.bisect([node.key for node in model.root.children], file_name)
+						self.__file_order.insert(row, self.__file_order[row - 1] if row else -1)
+						model.insert_nodes(model.root, row, [model.new_file_node(file_name, data, path)], undoable=False)
+						reloaded.append(path)
+
+			# - Single glyphs: only the loaded ones are dropped, they are parsed again on expand
+			glif_nodes = {}
+
+			for layer in model.root.children:
+				if layer.path is not None and layer.fetched and os.path.basename(layer.path) == cfg_glif_index:
+					glif_nodes.update((os.path.abspath(node.path), node) for node in layer.children if node.type == 'glif')
+
+			for path in modified:
+				node = glif_nodes.get(path)
+
+				if node is None or not node.fetched:
+					continue
+
+				if model.is_dirty(node):
+					kept.append(path)
+				else:
+					model.unload(node)
+					reloaded.append(path)
+
+			record['items'] = len(reloaded)
+
+		self.trw_explorer.restore_view_state(state)
+
+		if len(failed):
+			self.status_hook.showMessage('Could not reload {}'.format(', '.join('{}: {}'.format(os.path.basename(path), error) for path, error in failed)))
+		elif len(kept):
+			self.status_hook.showMessage('Changed on disk, kept your unsaved edits: {}'.format(', '.join(map(os.path.basename, kept))))
+		elif len(reloaded):
+			self.status_hook.showMessage('Reloaded: {}'.format(', '.join(map(os.path.basename, reloaded))))
+
+class wgt_compare_manager(wgt_tab_manager):
+	'''Two documents side by side, read only. Their differences are marked
+	in both trees and listed below, a listed change is shown in both.
+	'''
+	def __init__(self, left, right, captions, document_type, status_hook):
+		super(wgt_compare_manager, self).__init__(status_hook)
+
+		# - Init
+		self.file_type = '.compare'
+		self.document_type = document_type
+		self.entries = []
+
+		# - Widgets
+		# -- Trees
+		explorer_class = trw_xml_explorer if document_type == '.designspace' else trw_plist_explorer
+		self.trw_left = explorer_class(status_hook)
+		self.trw_right = explorer_class(status_hook)
+		self.set_explorer(self.trw_left)
+
+		lay_trees = QtWidgets.QHBoxLayout()
+		lay_trees.setContentsMargins(0, 0, 0, 0)
+
+		for explorer, document, caption in ((self.trw_left, left, captions[0]), (self.trw_right, right, captions[1])):
+			explorer.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+			explorer.setDragDropMode(QtWidgets.QAbstractItemView.NoDragDrop)
+			explorer.setContextMenuPolicy(QtCore.Qt.NoContextMenu)
+
+			if document_type == '.designspace':
+				key, element, path = document[0]
+				explorer.set_tree(ET.ElementTree(element), cfg_trw_columns_class, path)
+			else:
+				explorer.set_tree(document, cfg_trw_columns_class)
+
+			lay_side = QtWidgets.QVBoxLayout()
+			lay_side.addWidget(QtWidgets.QLabel(caption))
+			lay_side.addWidget(explorer)
+			lay_trees.addLayout(lay_side)
+
+		# -- Changes
+		self.trw_changes = QtWidgets.QTreeWidget()
+		self.trw_changes.setHeaderLabels(cfg_compare_columns)
+		self.trw_changes.setRootIsDecorated(False)
+		self.trw_changes.setUniformRowHeights(True)
+		self.trw_changes.setAlternatingRowColors(True)
+		self.trw_changes.currentItemChanged.connect(lambda item, previous: self.reveal(item))
+
+		# - Layout
+		wgt_trees = QtWidgets.QWidget()
+		wgt_trees.setLayout(lay_trees)
+		spl_main = QtWidgets.QSplitter(QtCore.Qt.Vertical)
+		spl_main.addWidget(wgt_trees)
+		spl_main.addWidget(self.trw_changes)
+		spl_main.setStretchFactor(0, 3)
+
+		lay_main = QtWidgets.QVBoxLayout()
+		lay_main.addWidget(spl_main)
+		self.setLayout(lay_main)
+
+		# - Set
+		self.compare(left, right)
+
+	def compare(self, left, right):
+		with span('diff') as record:
+			self.entries = diff_documents(left, right)
+			record['items'] = len(self.entries)
+
+		with span('diff_marks') as record:
+			for explorer, paths in ((self.trw_left, [entry.left_path for entry in self.entries]), (self.trw_right, [entry.right_path for entry in self.entries])):
+				model = explorer.model()
+				nodes = explorer.nodes_at_key_paths([path for path in paths if path is not None])
+				kinds = [entry.kind for entry, path in zip(self.entries, paths) if path is not None]
+				marks = {}
+
+				for node, kind in zip(nodes, kinds):
+					if node is None:
+						continue
+
+					marks[node] = kind
+					parent = node.parent
+
+					while parent is not model.root and parent not in marks:
+						marks[parent] = 'within'
+						parent = parent.parent
+
+				model.marks = marks
+				explorer.viewport().update()
+
+			record['items'] = len(self.trw_left.model().marks) + len(self.trw_right.model().marks)
+
+		self.trw_changes.clear()
+		items = []
+
+		for number, entry in enumerate(self.entries):
+			item = QtWidgets.QTreeWidgetItem([entry.kind, self.path_text(entry.left_path or entry.right_path), text_preview(value_text(entry.left))[0], text_preview(value_text(entry.right))[0]])
+			item.setData(0, QtCore.Qt.UserRole, number)
+			item.setBackground(0, self.trw_left.styles['brush_' + entry.kind])
+			items.append(item)
+
+		self.trw_changes.addTopLevelItems(items)
+
+		for c in range(len(cfg_compare_columns)):
+			self.trw_changes.resizeColumnToContents(c)
+
+	@staticmethod
+	def path_text(path):
+		return ' / '.join('[{}]'.format(nth) if key == cfg_list_item else key if not nth else '{}[{}]'.format(key, nth) for key, nth in path)
+
+	def reveal(self, item):
+		'''Show a listed change in both trees, an added or removed row by its parent on the other side'''
+		if item is None:
+			return
+
+		entry = self.entries[item.data(0, QtCore.Qt.UserRole)]
+
+		for explorer, path, other_path in ((self.trw_left, entry.left_path, entry.right_path), (self.trw_right, entry.right_path, entry.left_path)):
+			node = explorer.node_at_key_path(path if path is not None else other_path[:-1])
+
+			if node is None or node is explorer.model().root:
+				explorer.clearSelection()
+				continue
+
+			index = explorer.model().index_of(node)
+			explorer.scrollTo(index)
+			explorer.setCurrentIndex(index)
+
+	# - Memory ----------------------------
+	def memory_estimate(self):
+		return self.trw_left.model().memory_estimate() + self.trw_right.model().memory_estimate()
+
+	def can_unload(self):
+		return False
+
+# -- Dialogs
+class dlg_text_editor(QtWidgets.QDialog):
+	'''Plain text editor for a single long value'''
+	def __init__(self, text, caption, parent=None):
+		super(dlg_text_editor, self).__init__(parent)
+
+		# - Widgets
+		self.edt_text = QtWidgets.QPlainTextEdit()
+		self.edt_text.setLineWrapMode(QtWidgets.QPlainTextEdit.WidgetWidth)
+		self.edt_text.setPlainText(text)
+
+		self.lbl_info = QtWidgets.QLabel()
+		self.edt_text.textChanged.connect(lambda: self.lbl_info.setText(string_plural(len(self.edt_text.toPlainText()), 'characters')))
+		self.edt_text.textChanged.emit()
+
+		btn_box = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.Ok | QtWidgets.QDialogButtonBox.Cancel)
+		btn_box.accepted.connect(self.accept)
+		btn_box.rejected.connect(self.reject)
+
+		# - Layout
+		lay_main = QtWidgets.QVBoxLayout()
+		lay_main.addWidget(self.edt_text)
+		lay_main.addWidget(self.lbl_info)
+		lay_main.addWidget(btn_box)
+		self.setLayout(lay_main)
+
+		# - Set
+		self.setWindowTitle('Edit: {}'.format(caption))
+		self.resize(640, 480)
+
+	def text(self):
+		return self.edt_text.toPlainText()
+
+class wgt_status_progress(QtWidgets.QWidget):
+	'''Status bar progress with a cancel button, hidden while idle'''
+	cancelled = QtCore.pyqtSignal()
+
+	def __init__(self):
+		super(wgt_status_progress, self).__init__()
+
+		# - Widgets
+		self.prg_progress = QtWidgets.QProgressBar()
+		self.prg_progress.setMaximumWidth(200)
+		self.prg_progress.setFormat('%v / %m')
+		
+		self.btn_cancel = QtWidgets.QPushButton('Cancel')
+		self.btn_cancel.clicked.connect(self.cancelled.emit)
+
+		# - Layout
+		lay_main = QtWidgets.QHBoxLayout()
+		lay_main.setContentsMargins(0, 0, 0, 0)
+		lay_main.addWidget(self.prg_progress)
+		lay_main.addWidget(self.btn_cancel)
+		self.setLayout(lay_main)
+		self.hide()
+
+	def set_progress(self, done, total):
+		self.prg_progress.setMaximum(total)
+		self.prg_progress.setValue(done)
+		self.setVisible(done < total)
+
+class wgt_diagnostics(QtWidgets.QWidget):
+	'''Totals of the traced phases, with trace export for bug reports'''
+	summary_changed = QtCore.pyqtSignal(str)
+
+	def __init__(self):
+		super(wgt_diagnostics, self).__init__()
+
+		# - Init
+		self.last = {}
+		self.tmr_refresh = QtCore.QTimer(self)
+		self.tmr_refresh.setSingleShot(True)
+		self.tmr_refresh.setInterval(cfg_diagnostics_delay)
+		self.tmr_refresh.timeout.connect(self.refresh)
+		tracer.listeners.append(self.__on_span)
+
+		# - Widgets
+		self.trw_phases = QtWidgets.QTreeWidget()
+		self.trw_phases.setHeaderLabels(cfg_diagnostics_columns)
+		self.trw_phases.setRootIsDecorated(False)
+		self.trw_phases.setAlternatingRowColors(True)
+
+		self.chk_memory = QtWidgets.QCheckBox('Track memory')
+		self.chk_memory.setToolTip('Measure peak memory per phase. Slows everything down while on')
+		self.chk_memory.toggled.connect(lambda checked: setattr(tracer, 'track_memory', checked))
+
+		self.btn_clear = QtWidgets.QPushButton('Clear')
+		self.btn_export = QtWidgets.QPushButton('Export Trace')
+		self.btn_clear.clicked.connect(self.clear)
+		self.btn_export.clicked.connect(self.export)
+
+		# - Layout
+		lay_buttons = QtWidgets.QHBoxLayout()
+		lay_buttons.addWidget(self.chk_memory)
+		lay_buttons.addStretch()
+		lay_buttons.addWidget(self.btn_clear)
+		lay_buttons.addWidget(self.btn_export)
+
+		lay_main = QtWidgets.QVBoxLayout()
+		lay_main.addWidget(self.trw_phases)
+		lay_main.addLayout(lay_buttons)
+		self.setLayout(lay_main)
+
+	def __on_span(self, record):
+		self.last[record['name']] = record['duration']
+
+		if record['depth'] == 0 and record['name'] != 'parse':
+			items = '' if record['items'] is None else ', {}'.format(string_plural(record['items']))
+			self.summary_changed.emit('{}: {:.0f} ms{}'.format(record['name'], record['duration'] * 1000, items))
+
+		if not self.tmr_refresh.isActive():
+			self.tmr_refresh.start()
+
+	def refresh(self):
+		self.trw_phases.clear()
+
+		for name, (count, duration, items, memory) in sorted(tracer.totals().items()):
+			memory_text = '' if memory is None else '{:.1f} MB'.format(memory / 1024. ** 2)
+			row = QtWidgets.QTreeWidgetItem([name, str(count), '{:.1f}'.format(duration * 1000), '{:.1f}'.format(self.last.get(name, 0) * 1000), str(items), memory_text])
+
+			for c in range(1, len(cfg_diagnostics_columns)):
+				row.setTextAlignment(c, QtCore.Qt.AlignRight)
+
+			self.trw_phases.addTopLevelItem(row)
+
+		for c in range(len(cfg_diagnostics_columns)):
+			self.trw_phases.resizeColumnToContents(c)
+
+	def clear(self):
+		tracer.clear()
+		self.last = {}
+		self.refresh()
+
+	def export(self):
+		export_file = QtWidgets.QFileDialog.getSaveFileName(self, 'Export Trace', 'ufoRig-trace.json', 'Chrome Trace (*.json)')
+
+		if len(export_file[0]):
+			tracer.export(export_file[0])
+			self.summary_changed.emit('Trace exported: {}'.format(export_file[0]))
+
+class wgt_issues(QtWidgets.QWidget):
+	'''Issues found by the validator of a tab, a click shows the offending row'''
+	def __init__(self):
+		super(wgt_issues, self).__init__()
+
+		# - Init
+		self.tab = None
+		self.validator = None
+		self.issues = []
+
+		# - Widgets
+		self.trw_issues = QtWidgets.QTreeWidget()
+		self.trw_issues.setHeaderLabels(cfg_issues_columns)
+		self.trw_issues.setRootIsDecorated(False)
+		self.trw_issues.setAlternatingRowColors(True)
+		self.trw_issues.setUniformRowHeights(True)
+		self.trw_issues.itemClicked.connect(self.reveal)
+		self.trw_issues.itemActivated.connect(self.reveal)
+
+		self.lbl_summary = QtWidgets.QLabel()
+		self.btn_validate = QtWidgets.QPushButton('Validate')
+		self.btn_validate.clicked.connect(lambda: self.tab.validate() if self.tab is not None else None)
+
+		# - Layout
+		lay_buttons = QtWidgets.QHBoxLayout()
+		lay_buttons.addWidget(self.lbl_summary)
+		lay_buttons.addStretch()
+		lay_buttons.addWidget(self.btn_validate)
+
+		lay_main = QtWidgets.QVBoxLayout()
+		lay_main.addWidget(self.trw_issues)
+		lay_main.addLayout(lay_buttons)
+		self.setLayout(lay_main)
+
+	def set_tab(self, tab):
+		'''Show the issues of a tab, None or a tab that is not validated shows none'''
+		if self.validator is not None:
+			self.validator.issues_changed.disconnect(self.refresh)
+
+		self.tab = tab
+		self.validator = getattr(tab, 'validator', None)
+
+		if self.validator is not None:
+			self.validator.issues_changed.connect(self.refresh)
+
+		self.btn_validate.setEnabled(self.validator is not None)
+		self.refresh()
+
+	def refresh(self):
+		self.trw_issues.clear()
+
+		if self.validator is None:
+			self.lbl_summary.setText('Not validated')
+			return
+
+		found = self.validator.all_issues()
+		errors, warnings = self.validator.counts()
+		rows = []
+
+		for index, item in enumerate(found[:cfg_issues_shown]):
+			location = '/'.join(str(key) for key, nth in item.path[1:]) if item.path is not None else ''
+			row = QtWidgets.QTreeWidgetItem([item.severity.title(), item.unit, location, item.message])
+			row.setData(0, QtCore.Qt.UserRole, index)
+			rows.append(row)
+
+		self.trw_issues.addTopLevelItems(rows)
+		self.issues = found
+		summary = '{} errors, {} warnings'.format(errors, warnings)
+		self.lbl_summary.setText(summary if len(found) <= cfg_issues_shown else '{}, first {} shown'.format(summary, cfg_issues_shown))
+
+		for c in range(len(cfg_issues_columns) - 1):
+			self.trw_issues.resizeColumnToContents(c)
+
+	def reveal(self, row):
+		'''Select the row of an issue, or the nearest row above it that still exists'''
+		if row is None or self.tab is None or self.tab.packed is not None:
+			return
+
+		item = self.issues[row.data(0, QtCore.Qt.UserRole)]
+		explorer = self.tab.trw_explorer
+		path = item.path if item.path is not None else ((item.unit, 0),)
+
+		for end in range(len(path), 0, -1):
+			node = explorer.node_at_key_path(path[:end])
+
+			if node is not None:
+				index = explorer.model().index_of(node)
+				explorer.scrollTo(index)
+				explorer.setCurrentIndex(index)
+				return
@@ -10,18 +10,26 @@
 import os
 import sys
 import pathlib
-import json
-import plistlib
-import xml.etree.ElementTree as ET
 
-from lib import widgets
+from lib import widgets, core
+from lib.loader import file_loader, ufo_preloader
+from lib.trace import span
 from PyQt5 import QtCore, QtGui, QtWidgets
 
 # - Init ----------------------------------------------------
-app_name, app_version = 'ufoRig', '1.38'
+app_name, app_version = 'ufoRig', '1.67'
 
 # - Config --------------------------------------------------
 cfg_file_open_formats = 'UFO Designspace (*.designspace);; UFO Plist (*.plist);; UFO (*.ufo);;'
+cfg_tab_memory_budget = 512 * 1024 ** 2		# Bytes, approximate. Inactive tabs over it are unloaded, least recently used first
+cfg_tab_memory_env = 'UFORIG_TAB_BUDGET'	# Budget override in MB
+
+# - Functions -----------------------------------------------
+def tab_memory_budget():
+	try:
+		return int(float(os.environ[cfg_tab_memory_env]) * 1024 ** 2)
+	except (KeyError, ValueError):
+		return cfg_tab_memory_budget
 
 # - Dialogs and Main -----------------------------------------	
 class main_ufoRig(QtWidgets.QMainWindow):
@@ -35,11 +43,41 @@ class main_ufoRig(QtWidgets.QMainWindow):
 		# -- Status bar
 		self.status_bar = QtWidgets.QStatusBar()
 		self.setStatusBar(self.status_bar)
+
+		self.wgt_progress = widgets.wgt_status_progress()
+		self.wgt_progress.cancelled.connect(self.loaders_cancel)
+		self.status_bar.addPermanentWidget(self.wgt_progress)
+		self.loaders = []
+
+		self.preloader = ufo_preloader()
+		self.preloader.ufo_ready.connect(lambda ufo_path: self.status_bar.showMessage('Ready to open: {}'.format(ufo_path)))
+
+		self.lbl_trace = QtWidgets.QLabel()
+		self.status_bar.addPermanentWidget(self.lbl_trace)
+
+		# -- Diagnostics dock
+		self.wgt_diagnostics = widgets.wgt_diagnostics()
+		self.wgt_diagnostics.summary_changed.connect(self.lbl_trace.setText)
+		self.dck_diagnostics = QtWidgets.QDockWidget('Diagnostics', self)
+		self.dck_diagnostics.setWidget(self.wgt_diagnostics)
+		self.addDockWidget(QtCore.Qt.BottomDockWidgetArea, self.dck_diagnostics)
+		self.dck_diagnostics.hide()
+
+		# -- Issues dock
+		self.wgt_issues = widgets.wgt_issues()
+		self.dck_issues = QtWidgets.QDockWidget('Issues', self)
+		self.dck_issues.setWidget(self.wgt_issues)
+		self.addDockWidget(QtCore.Qt.BottomDockWidgetArea, self.dck_issues)
+		self.tabifyDockWidget(self.dck_diagnostics, self.dck_issues)
+		self.dck_issues.hide()
 		
 		# -- Tab widget
 		self.wgt_tabs = QtWidgets.QTabWidget()
 		self.wgt_tabs.setTabsClosable(True)
-		self.wgt_tabs.tabCloseRequested.connect(lambda index: self.wgt_tabs.removeTab(index))
+		self.wgt_tabs.tabCloseRequested.connect(self.tab_close)
+		self.wgt_tabs.currentChanged.connect(self.tab_changed)
+		self.tab_order = []		# Least recently shown first
+		self.tab_budget = tab_memory_budget()
 		
 		# -- Central Widget
 		self.setCentralWidget(self.wgt_tabs)
@@ -51,16 +89,57 @@ class main_ufoRig(QtWidgets.QMainWindow):
 		act_data_open_file = QtWidgets.QAction('Open', self)
 		act_data_open_folder = QtWidgets.QAction('Open UFO', self)
 		act_data_save_file = QtWidgets.QAction('Save', self)
+		act_data_save_file_as = QtWidgets.QAction('Save As', self)
+		act_data_compare = QtWidgets.QAction('Compare With...', self)
+		act_data_save_file.setShortcut(QtGui.QKeySequence.Save)
 		act_data_open_file.triggered.connect(self.file_open)
 		act_data_open_folder.triggered.connect(self.folder_open)
 		act_data_save_file.triggered.connect(self.file_save)
+		act_data_save_file_as.triggered.connect(self.file_save_as)
+		act_data_compare.triggered.connect(self.file_compare)
 		
 		self.menu_file.addAction(act_data_open_file)
 		self.menu_file.addAction(act_data_open_folder)
 		self.menu_file.addAction(act_data_save_file)
+		self.menu_file.addAction(act_data_save_file_as)
+		self.menu_file.addSeparator()
+		self.menu_file.addAction(act_data_compare)
+
+		self.menu_edit = QtWidgets.QMenu('Edit', self)
+		act_edit_undo = QtWidgets.QAction('Undo', self)
+		act_edit_redo = QtWidgets.QAction('Redo', self)
+		act_edit_undo.setShortcut(QtGui.QKeySequence.Undo)
+		act_edit_redo.setShortcut(QtGui.QKeySequence.Redo)
+		act_edit_undo.triggered.connect(lambda: self.edit_history(True))
+		act_edit_redo.triggered.connect(lambda: self.edit_history(False))
+		act_edit_replace = QtWidgets.QAction('Find and Replace', self)
+		act_edit_replace.setShortcut(QtGui.QKeySequence.Replace)
+		act_edit_replace.triggered.connect(self.edit_replace)
+
+		self.menu_edit.addAction(act_edit_undo)
+		self.menu_edit.addAction(act_edit_redo)
+		self.menu_edit.addSeparator()
+		self.menu_edit.addAction(act_edit_replace)
 	
 		# -- Set Menu
 		self.menuBar().addMenu(self.menu_file)
+		self.menuBar().addMenu(self.menu_edit)
+
+		self.menu_view = QtWidgets.QMenu('View', self)
+		act_view_diagnostics = self.dck_diagnostics.toggleViewAction()
+		act_view_issues = self.dck_issues.toggleViewAction()
+		self.act_view_glyphs = QtWidgets.QAction('Glyph Table', self)
+		self.act_view_glyphs.setCheckable(True)
+		self.act_view_glyphs.setShortcut(QtGui.QKeySequence('Ctrl+Shift+G'))
+		self.act_view_glyphs.toggled.connect(self.view_glyphs)
+		act_view_trace = QtWidgets.QAction('Export Trace', self)
+		act_view_trace.triggered.connect(self.wgt_diagnostics.export)
+
+		self.menu_view.addAction(self.act_view_glyphs)
+		self.menu_view.addAction(act_view_issues)
+		self.menu_view.addAction(act_view_diagnostics)
+		self.menu_view.addAction(act_view_trace)
+		self.menuBar().addMenu(self.menu_view)
 
 		# - Set
 		self.setWindowTitle('%s %s' %(app_name, app_version))
@@ -72,29 +151,162 @@ class main_ufoRig(QtWidgets.QMainWindow):
 		for dock in all_docks[1:]:
 			self.tabifyDockWidget(all_docks[0], dock)
 
+	# - Tabs ----------------------------------------------
+	def tab_add(self, curr_tab, tab_caption):
+		curr_tab.dirty_changed.connect(lambda dirty: self.tab_mark_dirty(curr_tab, dirty))
+		self.wgt_tabs.addTab(curr_tab, tab_caption)
+		self.wgt_tabs.setCurrentWidget(curr_tab)
+
+	def tab_close(self, index):
+		'''Close a tab for good, asking first if it has unsaved edits'''
+		curr_tab = self.wgt_tabs.widget(index)
+
+		if curr_tab.packed is None and len(curr_tab.trw_explorer.model().dirty):
+			answer = QtWidgets.QMessageBox.question(self, 'Close', 'Save changes to {}?'.format(self.wgt_tabs.tabText(index).rstrip('*')), QtWidgets.QMessageBox.Save | QtWidgets.QMessageBox.Discard | QtWidgets.QMessageBox.Cancel, QtWidgets.QMessageBox.Save)
+
+			if answer == QtWidgets.QMessageBox.Cancel:
+				return
+
+			if answer == QtWidgets.QMessageBox.Save:
+				self.tab_save(curr_tab)
+
+		if curr_tab.loader in self.loaders:
+			curr_tab.loader.cancel()
+
+		curr_tab.close_document()
+
+		if curr_tab in self.tab_order:
+			self.tab_order.remove(curr_tab)
+
+		self.wgt_tabs.removeTab(index)
+		curr_tab.deleteLater()
+
+	def tab_changed(self, index):
+		'''Rebuild the shown tab if it was unloaded, then keep all tabs within budget'''
+		curr_tab = self.wgt_tabs.widget(index)
+
+		self.wgt_issues.set_tab(curr_tab)
+		self.act_view_glyphs.setEnabled(hasattr(curr_tab, 'wgt_glyphs'))
+		self.act_view_glyphs.setChecked(hasattr(curr_tab, 'wgt_glyphs') and curr_tab.wgt_glyphs.isVisibleTo(curr_tab))
+
+		if curr_tab is None:
+			return
+
+		if curr_tab in self.tab_order:
+			self.tab_order.remove(curr_tab)
+
+		self.tab_order.append(curr_tab)
+
+		if curr_tab.restore():
+			self.status_bar.showMessage('Restored: {}'.format(self.wgt_tabs.tabText(index)))
+
+		self.tabs_trim()
+
+	def tabs_trim(self):
+		'''Unload the least recently shown tabs while all tabs together are over budget'''
+		total = sum(curr_tab.memory_estimate() for curr_tab in self.tab_order)
+		unloaded = []
+
+		for curr_tab in self.tab_order[:-1]:
+			if total <= self.tab_budget:
+				break
+
+			if curr_tab is self.wgt_tabs.currentWidget() or curr_tab.loader in self.loaders:
+				continue
+
+			size = curr_tab.memory_estimate()
+
+			if curr_tab.unload():
+				total -= size - curr_tab.memory_estimate()
+				unloaded.append(self.wgt_tabs.tabText(self.wgt_tabs.indexOf(curr_tab)))
+
+		if len(unloaded):
+			self.status_bar.showMessage('Unloaded inactive: {}'.format(', '.join(unloaded)))
+
+	def tab_mark_dirty(self, curr_tab, dirty):
+		index = self.wgt_tabs.indexOf(curr_tab)
+
+		if index >= 0:
+			tab_caption = self.wgt_tabs.tabText(index).rstrip('*')
+			self.wgt_tabs.setTabText(index, tab_caption + '*' if dirty else tab_caption)
+
+	def view_glyphs(self, visible):
+		'''Show or hide the glyph table of the current UFO tab'''
+		curr_tab = self.wgt_tabs.currentWidget()
+
+		if hasattr(curr_tab, 'wgt_glyphs'):
+			curr_tab.show_glyph_table(visible)
+
+	def tab_validate(self, curr_tab):
+		'''Validate a document in the background, its issues are listed while its tab is shown'''
+		curr_tab.validate()
+
+		if curr_tab is self.wgt_tabs.currentWidget():
+			self.wgt_issues.set_tab(curr_tab)
+
+	# - Edit ----------------------------------------------
+	def edit_history(self, undo):
+		curr_tab = self.wgt_tabs.currentWidget()
+
+		if curr_tab is None:
+			return
+
+		model = curr_tab.trw_explorer.model()
+		label = model.history.undo_label() if undo else model.history.redo_label()
+
+		if (model.undo() if undo else model.redo()):
+			self.status_bar.showMessage('{}: {}'.format('Undo' if undo else 'Redo', label))
+		else:
+			self.status_bar.showMessage('Nothing to {}'.format('undo' if undo else 'redo'))
+
+	def edit_replace(self):
+		curr_tab = self.wgt_tabs.currentWidget()
+
+		if not hasattr(curr_tab, 'wgt_replace'):
+			return
+
+		curr_tab.wgt_replace.setVisible(not curr_tab.wgt_replace.isVisible())
+
+		if curr_tab.wgt_replace.isVisible():
+			curr_tab.wgt_replace.edt_find.setFocus()
+
 	# - File IO ---------------------------------------------
 	# -- Classes Reader
 	def file_save(self):
+		curr_tab = self.wgt_tabs.currentWidget()
+
+		if curr_tab is not None:
+			self.tab_save(curr_tab)
+
+	def tab_save(self, curr_tab):
+		'''Write only the edited files of a tab back to where they were loaded from'''
+		saved_files = curr_tab.trw_explorer.model().save_dirty()
+		curr_tab.saved(saved_files)
+		self.status_bar.showMessage('Saved: {}'.format(', '.join(saved_files) if len(saved_files) else 'Nothing changed'))
+
+	def file_save_as(self):
 		curr_path = pathlib.Path(__file__).parent.absolute()
 	
 		# - Get data from current active tab
-		curr_tab = self.wgt_tabs.widget(self.wgt_tabs.currentIndex())
+		curr_tab = self.wgt_tabs.currentWidget()
+		export_file = ('', None)
+
+		if curr_tab is None:
+			return
 
 		if curr_tab.file_type == '.designspace':
 			export_file = QtWidgets.QFileDialog.getSaveFileName(self, 'Save file', str(curr_path), 'UFO Designspace (*.designspace)')
-			curr_data = curr_tab.trw_explorer.get_tree()
 
 			if len(export_file[0]):
-				with open(export_file[0], 'wb') as exportFile:
-					curr_data.write(exportFile, encoding='utf-8', xml_declaration=True)
+				core.xml_save(export_file[0], curr_tab.trw_explorer.get_tree())
+				curr_tab.saved([export_file[0]])
 
 		elif curr_tab.file_type == '.plist':
 			export_file = QtWidgets.QFileDialog.getSaveFileName(self, 'Save file', str(curr_path), 'UFO (*.plist)')
-			curr_data = curr_tab.trw_explorer.get_tree()
 			
 			if len(export_file[0]):
-				with open(export_file[0], 'wb') as exportFile:
-					plistlib.dump(curr_data[1], exportFile)
+				core.plist_save(export_file[0], curr_tab.trw_explorer.get_tree()[1])
+				curr_tab.saved([export_file[0]])
 		
 		self.status_bar.showMessage('File Saved: {}'.format(export_file[0]))
 				
@@ -104,42 +316,139 @@ class main_ufoRig(QtWidgets.QMainWindow):
 			
 		if len(import_file[0]):
 			if '.designspace' in import_file[0]:
-				file_tree = ET.parse(import_file[0])
+				file_tree = core.designspace_load(import_file[0])
 				tab_caption = os.path.split(import_file[0])[1]
-				self.wgt_tabs.addTab(widgets.wgt_designspace_manager(file_tree, self.status_bar), tab_caption)
+				curr_tab = widgets.wgt_designspace_manager(file_tree, self.status_bar, import_file[0])
+				curr_tab.link_activated.connect(self.ufo_open)
+				self.tab_add(curr_tab, tab_caption)
+				curr_tab.watch(import_file[0])
+				self.tab_validate(curr_tab)
+				self.preloader.request(curr_tab.links())
 
 			if '.plist' in import_file[0]:
-				with open(import_file[0], 'rb') as plist_file:
-					file_tree = plistlib.load(plist_file)
+				file_tree = core.plist_load(import_file[0])
 				tab_caption = os.path.split(import_file[0])[1]
-				self.wgt_tabs.addTab(widgets.wgt_plist_manager((tab_caption, file_tree), self.status_bar), tab_caption)
+				curr_tab = widgets.wgt_plist_manager((tab_caption, file_tree, import_file[0]), self.status_bar)
+				self.tab_add(curr_tab, tab_caption)
+				curr_tab.watch(import_file[0])
+				self.tab_validate(curr_tab)
 
 		self.status_bar.showMessage('File Loaded: {}'.format(import_file[0]))
 
+	def file_compare(self):
+		'''Compare the current tab with another open document of the same kind, in a new tab'''
+		curr_tab = self.wgt_tabs.currentWidget()
+
+		if curr_tab is None or curr_tab.file_type == '.compare':
+			return
+
+		others = [self.wgt_tabs.widget(index) for index in range(self.wgt_tabs.count()) if self.wgt_tabs.widget(index) is not curr_tab and self.wgt_tabs.widget(index).file_type == curr_tab.file_type]
+
+		if not len(others):
+			self.status_bar.showMessage('Nothing to compare with: open another {} file or UFO'.format(curr_tab.file_type))
+			return
+
+		captions = ['{}: {}'.format(self.wgt_tabs.indexOf(other) + 1, self.wgt_tabs.tabText(self.wgt_tabs.indexOf(other)).rstrip('*')) for other in others]
+		curr_caption = self.wgt_tabs.tabText(self.wgt_tabs.currentIndex()).rstrip('*')
+		caption, accepted = QtWidgets.QInputDialog.getItem(self, 'Compare', 'Compare {} with:'.format(curr_caption), captions, 0, False)
+
+		if not accepted:
+			return
+
+		other = others[captions.index(caption)]
+		other.restore()
+		other_caption = caption.split(': ', 1)[1]
+
+		compare_tab = widgets.wgt_compare_manager(curr_tab.document(), other.document(), (curr_caption, other_caption), curr_tab.file_type, self.status_bar)
+		self.tab_add(compare_tab, '{} | {}'.format(curr_caption, other_caption))
+		self.status_bar.showMessage('Compared: {} differences'.format(len(compare_tab.entries)))
+
 	def folder_open(self):
 		curr_path = pathlib.Path(__file__).parent.absolute()
 		import_folder = QtWidgets.QFileDialog.getExistingDirectory(self, 'Open UFO', str(curr_path))
-		collect_ufo_plist = list(pathlib.Path(import_folder).rglob('*.plist'))
+		
+		if len(import_folder):
+			self.ufo_open(import_folder)
+
+	def ufo_open(self, import_folder):
+		'''Open a UFO folder in a new tab: at once if it was preloaded, else parsed in the background.
+		A UFO that is open already is only brought to front.
+		'''
+		import_folder = os.path.abspath(import_folder)
+		tab_caption = os.path.split(import_folder)[1]
+
+		for index in range(self.wgt_tabs.count()):
+			if getattr(self.wgt_tabs.widget(index), 'folder', None) == import_folder:
+				self.wgt_tabs.setCurrentIndex(index)
+				return
+
+		file_entries = self.preloader.take(import_folder)
+
+		if file_entries is not None:
+			curr_tab = widgets.wgt_plist_manager(file_entries, self.status_bar)
+			self.tab_add(curr_tab, tab_caption)
+			curr_tab.watch(import_folder)
+			self.tab_validate(curr_tab)
+			self.status_bar.showMessage('Loaded: {}'.format(import_folder))
+			return
+
+		with span('discover', folder=import_folder) as record:
+			collect_ufo_plist = core.collect_files(import_folder)
+			record['items'] = len(collect_ufo_plist)
 		
 		if len(collect_ufo_plist):
-			tab_caption = os.path.split(import_folder)[1]
-			data_tree = []
+			file_names = [import_file.relative_to(import_folder).as_posix() for import_file in collect_ufo_plist]
 			
-			for import_file in collect_ufo_plist:
-				with open(import_file, 'rb') as plist_file:
-					file_tree = plistlib.load(plist_file)
+			# - Tab is shown right away and filled as files are parsed
+			curr_tab = widgets.wgt_plist_manager([], self.status_bar)
+			curr_tab.folder = import_folder
+			self.tab_add(curr_tab, tab_caption)
+
+			loader = file_loader(collect_ufo_plist)
+			curr_tab.loader = loader
+			loader.file_loaded.connect(lambda index, file_tree: curr_tab.add_file(index, file_names[index], file_tree, str(collect_ufo_plist[index])))
+			loader.file_failed.connect(lambda index, error: self.status_bar.showMessage('Error loading: {} ({})'.format(file_names[index], error)))
+			loader.finished.connect(lambda: self.loaders_done(loader, import_folder))
+			loader.finished.connect(lambda: curr_tab.watch(import_folder) if not loader.cancelled else None)
+			loader.finished.connect(lambda: self.tab_validate(curr_tab) if not loader.cancelled else None)
+			self.loaders_start(loader)
+
+		self.status_bar.showMessage('Loading: {}'.format(import_folder))
+
+	# - Background loading ------------------------
+	def loaders_start(self, loader):
+		self.loaders.append(loader)
+		loader.progress.connect(self.loaders_progress)
+		loader.start()
+		self.loaders_progress()
+
+	def loaders_done(self, loader, source):
+		if loader in self.loaders:
+			self.loaders.remove(loader)
+
+		self.loaders_progress()
+		self.status_bar.showMessage('{}: {}'.format('Canceled' if loader.cancelled else 'Loaded', source))
+		self.tabs_trim()
 
-				data_tree.append((import_file.name, file_tree))
+	def loaders_progress(self, *args):
+		done = sum(loader.done for loader in self.loaders)
+		total = sum(len(loader.file_list) for loader in self.loaders)
+		self.wgt_progress.set_progress(done, total)
 
-			if len(data_tree):
-				self.wgt_tabs.addTab(widgets.wgt_plist_manager(data_tree, self.status_bar), tab_caption)
+	def loaders_cancel(self):
+		for loader in list(self.loaders):
+			loader.cancel()
 
-		self.status_bar.showMessage('Loaded: {}'.format(import_folder))
+	def closeEvent(self, event):
+		self.loaders_cancel()
+		self.preloader.cancel()
+		super(main_ufoRig, self).closeEvent(event)
 
 # - Run -----------------------------
-main_app = QtWidgets.QApplication(sys.argv)
-main_dialog = main_ufoRig()
-main_dialog.show()
-main_app.exec_()
+if __name__ == '__main__':
+	main_app = QtWidgets.QApplication(sys.argv)
+	main_dialog = main_ufoRig()
+	main_dialog.show()
+	main_app.exec_()
 
 
@@ -0,0 +1,217 @@
+# SCRIPT: ufoRig Benchmarks
+# DESCRIPTION: Times load, populate, save and search costs of ufoRig
+# DESCRIPTION: on synthetic UFOs and designspaces of configurable size
+# -----------------------------------------------------------
+# (C) Vassil Kateliev, 2021 		(http://www.kateliev.com)
+# ------------------------------------------------------------
+# https://github.com/kateliev
+
+# - Dependencies ---------------------------------------------
+import os
+import sys
+import copy
+import json
+import time
+import shutil
+import argparse
+import platform
+import plistlib
+import tempfile
+import statistics
+
+from lib import core, parsers, synthetic
+from lib.cache import parse_cache
+from lib.func import xml_pretty_print, xml_string
+from lib.objects import dictextractor, dictindex
+
+try:
+	from lib.models import plist_model, xml_model, search_index
+
+except ImportError:
+	# - Headless machine without PyQt5: model benchmarks are skipped
+	plist_model = xml_model = search_index = None
+
+# - Init ----------------------------------------------------
+app_name, app_version = 'ufoRig Benchmarks', '1.01'
+
+# - Config --------------------------------------------------
+cfg_repeats = 5
+cfg_threshold = 0.25	# Allowed slowdown of the median against the baseline
+cfg_noise_floor = 0.001	# Seconds, slowdowns smaller than this are timer noise
+cfg_trw_headers = ['Key', 'Value', 'Type']
+
+# - Functions -----------------------------------------------
+def walk_all(model, node):
+	'''Build every branch of a model, like expanding the whole tree. Glyphs are not opened'''
+	stack, count = [node], 0
+
+	while len(stack):
+		node = stack.pop()
+		count += 1
+
+		if getattr(node, 'type', None) != 'glif':
+			model.fetch(node)
+			stack.extend(node.children)
+
+	return count
+
+def time_case(setup, run, repeats):
+	'''Time run(*setup()) repeats times, setup is not timed. Returns timings in seconds'''
+	timings = []
+
+	for i in range(repeats):
+		args = setup()
+		start = time.perf_counter()
+		run(*args)
+		timings.append(time.perf_counter() - start)
+
+	return timings
+
+# - Suite ---------------------------------------------------
+def build_cases(ufo_path, designspace_path, out_folder):
+	'''Benchmark cases as name: (setup, run). Every setup returns the run arguments'''
+	plist_files = core.collect_files(ufo_path)
+	glif_files = sorted(os.path.join(ufo_path, 'glyphs', name) for name in os.listdir(os.path.join(ufo_path, 'glyphs')) if name.endswith('.glif'))
+	entries = [(plist_file.relative_to(ufo_path).as_posix(), core.plist_load(plist_file, False), str(plist_file)) for plist_file in plist_files]
+	lib_data = dict((name, data) for name, data, path in entries)
+	designspace_root = core.xml_load(designspace_path, False).getroot()
+	cache = parse_cache(os.path.join(out_folder, 'cache'))
+	none = lambda: ()
+	warm = lambda run: (run(), ())[1]
+	cached_plists = lambda: [cache.load(str(plist_file), 'plist', plistlib.loads) for plist_file in plist_files]
+	cached_glifs = lambda: [cache.load(glif_file, 'xml', core.xml_parse) for glif_file in glif_files]
+	plist_raws = [core.read_bytes(plist_file) for plist_file in plist_files]
+
+	cases = {	'parse.plist':(none, lambda: [core.plist_load(plist_file, False) for plist_file in plist_files]),
+				'parse.glif':(none, lambda: [core.xml_load(glif_file, False) for glif_file in glif_files]),
+				'parse.designspace':(none, lambda: core.xml_load(designspace_path, False)),
+				'cache.plist':(lambda: warm(cached_plists), cached_plists),
+				'cache.glif':(lambda: warm(cached_glifs), cached_glifs),
+				'xml.pretty_print':(lambda: (copy.deepcopy(designspace_root),), xml_pretty_print),
+				'xml.pretty_print.glif':(lambda: ([core.xml_load(glif_file, False).getroot() for glif_file in glif_files[:200]],), lambda roots: [xml_pretty_print(root) for root in roots]),
+				'xml.serialize':(none, lambda: xml_string(designspace_root)),
+				'xml.serialize.glif':(lambda: ([core.xml_load(glif_file, False).getroot() for glif_file in glif_files[:200]],), lambda roots: [xml_string(root, wrapped=False) for root in roots]),
+				'save.designspace':(none, lambda: core.xml_save(os.path.join(out_folder, 'out.designspace'), designspace_root)),
+				'query.extract':(none, lambda: list(dictextractor.extract(lib_data, 'com.synthetic.value'))),
+				'query.find':(none, lambda: list(dictextractor.find(lib_data, 'com.synthetic.note'))),
+				'query.where':(none, lambda: list(dictextractor.where(lib_data, -100))),
+				'query.contains':(none, lambda: dictextractor.contains(lib_data, 'nothing.like.this')),
+				'index.build':(none, lambda: dictindex(lib_data)),
+				'index.find':(lambda: (dictindex(lib_data),), lambda index: list(index.find('com.synthetic.note'))) }
+
+	# - Every installed parser backend on the same plists
+	for name, backend in parsers.cfg_backends.items():
+		if backend.available():
+			cases['parser.{}.plist'.format(name)] = (none, lambda backend=backend: [backend.plist_loads(raw) for raw in plist_raws])
+
+	if plist_model is not None:
+		def populate(model):
+			walk_all(model, model.root)
+			return model
+
+		def populated():
+			return (populate(plist_model(copy.deepcopy(entries), cfg_trw_headers)),)
+
+		def save_all(model):
+			for file_node in model.root.children:
+				core.plist_save(os.path.join(out_folder, file_node.key.replace('/', '_')), file_node.export())
+
+		cases.update({	'populate.plist':(lambda: (copy.deepcopy(entries),), lambda data: populate(plist_model(data, cfg_trw_headers))),
+						'populate.designspace':(lambda: (core.xml_load(designspace_path, False),), lambda tree: populate(xml_model(tree, cfg_trw_headers))),
+						'save.plist':(populated, save_all),
+						'search.build':(populated, lambda model: search_index(model.root)),
+						'search.match':(lambda: (search_index(populated()[0].root),), lambda index: index.match('synthetic')) })
+
+	return cases
+
+def run_suite(args):
+	work_folder = tempfile.mkdtemp(prefix='ufoRig_bench_')
+	sizes = dict(glyphs=args.glyphs, kerning=args.kerning, lib_depth=args.lib_depth)
+	designspace_path = synthetic.generate_designspace(work_folder, masters=args.masters, instances=args.instances, seed=args.seed, **sizes)
+	ufo_path = os.path.join(work_folder, 'Synthetic-Master0.ufo')
+	out_folder = os.path.join(work_folder, 'out')
+	os.makedirs(out_folder)
+
+	results = {}
+
+	for name, (setup, run) in sorted(build_cases(ufo_path, designspace_path, out_folder).items()):
+		if args.filter and not any(token in name for token in args.filter):
+			continue
+
+		timings = time_case(setup, run, args.repeats)
+		results[name] = {	'min':min(timings),
+							'median':statistics.median(timings),
+							'mean':statistics.mean(timings),
+							'repeats':len(timings) }
+
+		print('{:<28}{:>12.2f} ms'.format(name, results[name]['median'] * 1000), file=sys.stderr)
+
+	if not args.keep:
+		shutil.rmtree(work_folder)
+	else:
+		print('Generated files kept in: {}'.format(work_folder), file=sys.stderr)
+
+	return {	'meta':{	'tool':'{} {}'.format(app_name, app_version),
+							'python':platform.python_version(),
+							'platform':platform.platform(),
+							'time':time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+							'sizes':dict(sizes, masters=args.masters, instances=args.instances, seed=args.seed) },
+				'results':results }
+
+def compare(report, baseline, threshold=cfg_threshold):
+	'''Median ratios against a baseline report, returns (ratios, regressed case names)'''
+	ratios, regressed = {}, []
+
+	if baseline['meta'].get('sizes') != report['meta'].get('sizes'):
+		print('Warning: baseline was taken with other sizes: {}'.format(baseline['meta'].get('sizes')), file=sys.stderr)
+
+	for name, result in report['results'].items():
+		if name not in baseline['results']:
+			continue
+
+		ratio = result['median'] / max(baseline['results'][name]['median'], 1e-9)
+		ratios[name] = ratio
+
+		if ratio > 1. + threshold and result['median'] - baseline['results'][name]['median'] > cfg_noise_floor:
+			regressed.append(name)
+
+		print('{:<28}{:>8.2f}x{}'.format(name, ratio, '  REGRESSION' if name in regressed else ''), file=sys.stderr)
+
+	return ratios, regressed
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(prog='ufoRig_bench', description='{} {}'.format(app_name, app_version))
+	parser.add_argument('--glyphs', type=int, default=synthetic.cfg_sizes['glyphs'])
+	parser.add_argument('--kerning', type=int, default=synthetic.cfg_sizes['kerning'], help='Kerning pairs')
+	parser.add_argument('--lib-depth', type=int, default=synthetic.cfg_sizes['lib_depth'])
+	parser.add_argument('--masters', type=int, default=synthetic.cfg_sizes['masters'])
+	parser.add_argument('--instances', type=int, default=synthetic.cfg_sizes['instances'])
+	parser.add_argument('--seed', type=int, default=0)
+	parser.add_argument('-r', '--repeats', type=int, default=cfg_repeats)
+	parser.add_argument('-k', '--filter', nargs='*', default=None, help='Run only cases containing any of these')
+	parser.add_argument('-o', '--output', default=None, help='Write the JSON report here, default: stdout')
+	parser.add_argument('-b', '--baseline', default=None, help='Compare against this JSON report, exit 1 on regressions')
+	parser.add_argument('-t', '--threshold', type=float, default=cfg_threshold, help='Allowed median slowdown, 0.25 = 25%%')
+	parser.add_argument('--keep', action='store_true', help='Keep the generated files')
+	args = parser.parse_args(argv)
+
+	report = run_suite(args)
+	regressed = []
+
+	if args.baseline is not None:
+		with open(args.baseline) as baseline_file:
+			ratios, regressed = compare(report, json.load(baseline_file), args.threshold)
+
+		report['baseline'] = {'path':args.baseline, 'threshold':args.threshold, 'ratios':ratios, 'regressed':regressed}
+
+	if args.output is not None:
+		with open(args.output, 'w') as report_file:
+			json.dump(report, report_file, indent=2)
+	else:
+		print(json.dumps(report, indent=2))
+
+	return 1 if len(regressed) else 0
+
+# - Run -----------------------------
+if __name__ == '__main__':
+	sys.exit(main())
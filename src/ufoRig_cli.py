@@ -0,0 +1,118 @@
+# SCRIPT: ufoRig CLI
+# DESCRIPTION: Headless batch front end of ufoRig: dump, query,
+# DESCRIPTION: set and re-save values across many UFOs and designspaces
+# -----------------------------------------------------------
+# (C) Vassil Kateliev, 2021 		(http://www.kateliev.com)
+# ------------------------------------------------------------
+# https://github.com/kateliev
+
+# - Dependencies ---------------------------------------------
+import os
+import sys
+import shutil
+import tempfile
+import argparse
+
+from lib import core, parsers, synthetic
+
+# - Init ----------------------------------------------------
+app_name, app_version = 'ufoRig CLI', '1.01'
+
+# - Config --------------------------------------------------
+cfg_queries = ('extract', 'find', 'where', 'contains', 'xpath')
+cfg_test_patterns = ('*.plist', '*.glif', '*.designspace')
+
+# - Functions -----------------------------------------------
+def build_parser():
+	parser = argparse.ArgumentParser(prog='ufoRig_cli', description='{} {}'.format(app_name, app_version))
+	parser.add_argument('-w', '--workers', type=int, default=None, help='Worker processes, default: one per CPU')
+	parser.add_argument('--indent', type=int, default=None, help='Pretty print JSON output')
+	parser.add_argument('-p', '--parser', default=None, choices=sorted(parsers.cfg_backends) + ['auto'], help='Parser backend, default: ${} or {}'.format(parsers.cfg_parser_env, parsers.cfg_parser_default))
+	commands = parser.add_subparsers(dest='command', required=True)
+
+	# -- Dump
+	cmd_dump = commands.add_parser('dump', help='Print documents as JSON')
+	cmd_dump.add_argument('targets', nargs='+', help='.ufo folders, .plist or .designspace files, or folders containing them')
+
+	# -- Query
+	cmd_query = commands.add_parser('query', help='Run a dictextractor query (xpath on designspaces)')
+	cmd_query.add_argument('query', choices=cfg_queries)
+	cmd_query.add_argument('search', help='Key, value or ElementTree path to search for')
+	cmd_query.add_argument('targets', nargs='+')
+	cmd_query.add_argument('-k', '--key', default=None, help='where: only match values under this key')
+	cmd_query.add_argument('-t', '--type', default=None, help='where: parse search value as this type')
+
+	# -- Set
+	cmd_set = commands.add_parser('set', help='Set values and save the changed files')
+	cmd_set.add_argument('targets', nargs='+')
+	cmd_set.add_argument('-v', '--value', nargs=2, action='append', required=True, metavar=('ADDRESS', 'TEXT'), help='e.g. fontinfo.plist/versionMinor 3')
+	cmd_set.add_argument('-t', '--type', default=None, help='Parse values as this type, default: type of the current value')
+	cmd_set.add_argument('-n', '--dry-run', action='store_true', help='Do not write anything')
+
+	# -- Save
+	cmd_save = commands.add_parser('save', help='Re-save documents in ufoRig formatting')
+	cmd_save.add_argument('targets', nargs='+')
+
+	# -- Parsers
+	cmd_parsers = commands.add_parser('parsers', help='Check that every parser backend reads the same data, and time them')
+	cmd_parsers.add_argument('targets', nargs='*', help='Documents to test on, default: a generated UFO and designspace')
+
+	return parser
+
+def test_parsers(targets):
+	'''Self test of the parser backends, one JSON line per backend. Fails if any differs from the stdlib'''
+	work_folder = None
+
+	if not len(targets):
+		work_folder = tempfile.mkdtemp(prefix='ufoRig_parsers_')
+		synthetic.generate_designspace(work_folder)
+		targets = [work_folder]
+
+	file_paths = []
+
+	for target in core.collect_targets(targets):
+		file_paths += core.collect_files(target, cfg_test_patterns) if os.path.isdir(target) else [target]
+
+	try:
+		results = parsers.self_test(file_paths)
+	finally:
+		if work_folder is not None:
+			shutil.rmtree(work_folder)
+
+	for result in results:
+		print(core.json_dumps(result))
+
+	return 1 if any(not result.get('identical', True) for result in results) else 0
+
+def main(argv=None):
+	args = build_parser().parse_args(argv)
+	options = {}
+
+	if args.parser is not None:
+		try:
+			parsers.set_backend(args.parser)
+		except ValueError as error:
+			print(error, file=sys.stderr)
+			return 2
+
+	if args.command == 'parsers':
+		return test_parsers(args.targets)
+
+	if args.command == 'query':
+		options = {'query':args.query, 'search':args.search, 'key':args.key, 'type':args.type}
+
+	elif args.command == 'set':
+		options = {'values':args.value, 'type':args.type, 'dry_run':args.dry_run}
+
+	failed = 0
+
+	# - One JSON line per document, in the order given
+	for result in core.batch_run(core.collect_targets(args.targets), args.command, options, args.workers):
+		failed += not result['ok']
+		print(core.json_dumps(result, indent=args.indent))
+
+	return 1 if failed else 0
+
+# - Run -----------------------------
+if __name__ == '__main__':
+	sys.exit(main())